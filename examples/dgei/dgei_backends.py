@@ -0,0 +1,54 @@
+# Benchmark of numeric backends evaluating a large discrete grid exact inference
+# log-likelihood of 1-dimensional gaussian data. Unavailable backends (i.e.
+# numexpr or numba not installed) fall back to NumPy.
+
+import time
+import warnings
+import numpy as np
+import sympy
+import probayes as pb
+
+# Settings
+rand_size = 60
+rand_mean = 50.
+rand_stdv = 10.
+mu_lims = (40, 60)
+sigma_lims = (5, 20.)
+resolution = {'mu': 256, 'sigma': 384}
+repeats = 5
+
+# Generate data
+data = np.random.normal(loc=rand_mean, scale=rand_stdv, size=rand_size)
+
+# Declare RVs and iconic log-likelihood
+mu = pb.RV('mu', vtype=float, vset=mu_lims)
+sigma = pb.RV('sigma', vtype=float, vset=sigma_lims)
+x = pb.RV('x', vtype=float, vset={-pb.OO, pb.OO})
+logp = -(x[:] - mu[:])**2 / (2 * sigma[:]**2) - sympy.log(sigma[:]) \
+       - sympy.log(2 * sympy.pi) / 2
+
+# Grid values
+values = {'x': data.reshape([rand_size, 1, 1]),
+          'mu': np.linspace(*mu_lims, resolution['mu']).reshape([1, -1, 1]),
+          'sigma': np.linspace(*sigma_lims,
+                               resolution['sigma']).reshape([1, 1, -1])}
+
+# Benchmark backends
+reference = None
+for backend in ['numpy', 'numexpr', 'numba']:
+  with warnings.catch_warnings():
+    warnings.simplefilter('ignore', RuntimeWarning)
+    resolved = pb.get_backend(backend)
+    model = pb.RF(x, mu, sigma)
+    model.set_prob(logp, pscale='log', backend=backend)
+  prob = model.eval_prob(values) # includes any jit compilation
+  start = time.perf_counter()
+  for _ in range(repeats):
+    prob = model.eval_prob(values)
+  duration = (time.perf_counter() - start) / repeats
+  if reference is None:
+    reference = prob
+  assert np.allclose(prob, reference), \
+      "Backend {} output inconsistent with NumPy".format(backend)
+  print("Backend {} (using {}): {:.4f} s for {} grid".format(
+        backend, resolved, duration, prob.shape))
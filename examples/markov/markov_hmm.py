@@ -0,0 +1,52 @@
+""" Example of a hidden Markov model of a discrete Markov chain conditioned by
+a transition matrix emitting noisy gaussian observations. The hidden states
+are inferred exactly by forward-backward smoothing and the Viterbi path.
+"""
+import probayes as pb
+import numpy as np
+from pylab import *; ion()
+
+# Prob convention: successor dimension (row) > predecessor dimension (col)
+tran = np.array(
+                [.90, .05, .05,
+                 .05, .90, .05,
+                 .05, .05, .90],
+               ).reshape([3,3])
+n_steps = 200
+obs_stdv = 0.8
+
+# Hidden state and emission RVs
+x = pb.RV('x', range(3))
+x.set_tran(tran)
+y = pb.RV('y', vtype=float, vset=[-np.inf, np.inf])
+yx = y | x
+yx.set_prob(lambda y, x: np.exp(-0.5 * ((y - x) / obs_stdv)**2) / \
+                         (obs_stdv * np.sqrt(2. * np.pi)))
+
+# Simulation
+succ = np.empty(n_steps, dtype=int)
+pred = 0
+print('Simulating...')
+for i in range(n_steps):
+  succ[i] = x.step(pred, {0}).vals["x'"]
+  pred = succ[i]
+obs = succ + obs_stdv * np.random.normal(size=n_steps)
+print('...done')
+
+# Inference
+hmm = pb.HMM(x, yx)
+post, log_evid = hmm.forward_backward({'y': obs})
+path, log_prob = hmm.viterbi({'y': obs})
+mean = np.array([np.sum(dist.prob * hmm.vals) for dist in post])
+print("Log-evidence: {}, Viterbi accuracy: {}".format(
+      log_evid, np.mean(path == succ)))
+
+# Plot
+figure()
+plot(obs, 'k.', label='Observations')
+plot(succ, 'b', label='Hidden states')
+plot(mean, 'r', label='Posterior mean')
+plot(path, 'g--', label='Viterbi path')
+xlabel('Step')
+ylabel('State')
+legend()
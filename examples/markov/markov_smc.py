@@ -0,0 +1,55 @@
+""" Example of particle filtering a gaussian random walk observed with noise,
+comparing sequential Monte Carlo filtering with the exact Kalman filter.
+"""
+import probayes as pb
+import numpy as np
+import scipy.stats
+from pylab import *; ion()
+
+n_steps = 100
+n_particles = 100000
+tran_var = 0.2
+obs_var = 1.0
+
+# Simulation
+hidden = np.cumsum(np.random.normal(scale=np.sqrt(tran_var), size=n_steps))
+obs = hidden + np.random.normal(scale=np.sqrt(obs_var), size=n_steps)
+
+# Random walk process and observation likelihood
+x = pb.RV('x', [-50., 50.], prob=scipy.stats.norm)
+process = pb.SP(pb.RF(x))
+process.set_tran(np.array([[tran_var]]))
+y = pb.RV('y', [-50., 50.])
+yx = y | x
+yx.set_prob(lambda y, x: scipy.stats.norm.logpdf(y, loc=x,
+                                                 scale=np.sqrt(obs_var)),
+            pscale='log')
+
+# Particle filter
+smc = pb.SMC(process, yx, size=n_particles)
+dists, log_evid = smc.filter({'y': obs})
+mean = np.array([dist.expectation()['x'] for dist in dists])
+
+# Kalman filter
+kalman = np.empty(n_steps, dtype=float)
+k_mean, k_var, k_evid = 0., 1., 0.
+for i in range(n_steps):
+  if i:
+    k_var += tran_var
+  k_evid += scipy.stats.norm.logpdf(obs[i], k_mean, np.sqrt(k_var + obs_var))
+  gain = k_var / (k_var + obs_var)
+  k_mean += gain * (obs[i] - k_mean)
+  k_var *= 1. - gain
+  kalman[i] = k_mean
+print("Log-evidence: SMC={}, Kalman={}, resampled {}/{} steps".format(
+      log_evid, k_evid, sum(smc.resampled), n_steps))
+
+# Plot
+figure()
+plot(obs, 'k.', label='Observations')
+plot(hidden, 'b', label='Hidden states')
+plot(kalman, 'g', label='Kalman filter')
+plot(mean, 'r--', label='Particle filter')
+xlabel('Step')
+ylabel('State')
+legend()
@@ -0,0 +1,59 @@
+# Example of mean-field variational inference of 1-dimensional gaussian data
+# over discrete grids, comparing with discrete grid exact inference.
+
+import numpy as np
+import scipy.stats
+import probayes as pb
+from pylab import *; ion()
+
+# Settings
+rand_size = 60
+rand_mean = 50.
+rand_stdv = 10.
+mu_lims = (40, 60)
+sigma_lims = (5, 20.)
+resolution = {'mu': {128}, 'sigma': {192}}
+
+# Generate data
+data = np.random.normal(loc=rand_mean, scale=rand_stdv, size=rand_size)
+
+# Declare RVs and model
+mu = pb.RV('mu', vtype=float, vset=mu_lims)
+sigma = pb.RV('sigma', vtype=float, vset=sigma_lims)
+x = pb.RV('x', vtype=float, vset={-np.inf, np.inf})
+model = pb.SD(pb.RF(x), pb.RF(mu, sigma))
+model.set_prob(scipy.stats.norm.logpdf,
+               order={'x':0, 'mu':'loc', 'sigma':'scale'},
+               pscale='log')
+
+# Mean-field approximation
+mf = pb.MeanField(model, values={'x': data, **resolution}, iid=True)
+dists, elbo = mf.fit()
+print("Mean-field: mu={}, sigma={} after {} sweeps".format(
+      dists['mu'].expectation()['mu'], dists['sigma'].expectation()['sigma'],
+      len(elbo)))
+
+# Discrete grid exact inference over the full joint grid of the same model
+joint = model({'x': data, **resolution}, iid=True)
+mu_vals, sigma_vals = np.ravel(joint.vals['mu']), np.ravel(joint.vals['sigma'])
+post = np.exp(joint.prob - np.max(joint.prob))
+post = post / np.sum(post)
+exact = {'mu': np.sum(post, axis=1), 'sigma': np.sum(post, axis=0)}
+print("Exact: mu={}, sigma={}".format(np.sum(exact['mu'] * mu_vals),
+                                      np.sum(exact['sigma'] * sigma_vals)))
+
+# Plot marginals and ELBO trace
+figure()
+subplot(1, 3, 1)
+plot(mf.vals['mu'], dists['mu'].prob, label='Mean-field')
+plot(mu_vals, exact['mu'], '--', label='Exact')
+xlabel(r'$\mu$')
+legend()
+subplot(1, 3, 2)
+plot(mf.vals['sigma'], dists['sigma'].prob)
+plot(sigma_vals, exact['sigma'], '--')
+xlabel(r'$\sigma$')
+subplot(1, 3, 3)
+plot(elbo, '.-')
+xlabel('Sweep')
+ylabel('ELBO')
@@ -0,0 +1,29 @@
+"""
+Example of explicit Naive Bayes classification where:
+p(z | x, y) = p(z) * p(x | z) * p(y | z) / p(x, y)
+- assumes features x (boolean) and y (gaussian) are conditionally independent
+"""
+import numpy as np
+import probayes as pb
+
+# Simulation settings
+sim_size = 1000000 # Number of observations to simulate
+
+# Simulate data
+z_obs = np.random.choice([False, True], size=sim_size, p=[0.7, 0.3])
+x_obs = np.random.uniform(size=sim_size) < 0.2 + 0.5*z_obs
+y_obs = np.random.normal(loc=2.*z_obs, scale=1.+z_obs)
+
+# Naive Bayes
+x = pb.RV('x', vtype=bool)
+y = pb.RV('y', vtype=float)
+z = pb.RV('z', vtype=bool)
+nb = pb.NaiveBayes(z, x, y)
+nb.fit({'z': z_obs, 'x': x_obs, 'y': y_obs})
+p_z_xy = nb.predict({'x': x_obs, 'y': y_obs}, pscale=1.)
+p_z_false = nb.predict({'x': False, 'y': 0.}, pscale=1.)
+p_z_true = nb.predict({'x': True, 'y': 2.}, pscale=1.)
+accuracy = np.mean(np.argmax(p_z_xy.prob, axis=1) == z_obs)
+print(p_z_false)
+print(p_z_true)
+print("Classification accuracy: {:.3f}".format(accuracy))
@@ -1,26 +1,77 @@
 # flake8: noqa
+"""
+Public attributes are imported lazily on first access (PEP 562) so that
+`import probayes` does not import SymPy, SciPy, or NetworkX until a feature
+requiring them is used.
+"""
 __version__ = '0.0.3.X'
-from probayes.constants import NEARLY_POSITIVE_ZERO, \
-                               NEARLY_POSITIVE_INF, \
-                               NEARLY_NEGATIVE_INF, \
-                               LOG_NEARLY_POSITIVE_INF, \
-                               COMPLEX_ZERO
-from probayes.vtypes import OO
-from probayes.named_dict import NamedDict
-from probayes.icon import Icon
-from probayes.expr import Expr
-from probayes.variable import Variable, variables
-from probayes.prob import Prob
-from probayes.rv import RV, RVs
-from probayes.field import Field
-from probayes.rf import RF
-from probayes.sd import SD
-from probayes.sp import SP
-from probayes.cf import CF
-from probayes.manifold import Manifold
-from probayes.dist import Dist
-from probayes.dist_utils import product, summate, iterdict
-from probayes.distribution import Distribution
-from probayes.likelihoods import bool_perm_freq
-from probayes.expression import Expression
-from probayes.sympy_prob import SympyProb
+import importlib
+import importlib.util
+
+#-------------------------------------------------------------------------------
+LAZY_ATTRS = { # Public attributes keyed by name with values of module names
+    'NEARLY_POSITIVE_ZERO': 'constants',
+    'NEARLY_POSITIVE_INF': 'constants',
+    'NEARLY_NEGATIVE_INF': 'constants',
+    'LOG_NEARLY_POSITIVE_INF': 'constants',
+    'COMPLEX_ZERO': 'constants',
+    'OO': 'vtypes',
+    'get_rng': 'rng',
+    'set_rng': 'rng',
+    'rng_context': 'rng',
+    'spawn_rngs': 'rng',
+    'NamedDict': 'named_dict',
+    'Icon': 'icon',
+    'set_expr_cache': 'expr_cache',
+    'clear_expr_cache': 'expr_cache',
+    'expr_cache_stats': 'expr_cache',
+    'set_backend': 'expr_backends',
+    'get_backend': 'expr_backends',
+    'available_backends': 'expr_backends',
+    'Expr': 'expr',
+    'Variable': 'variable',
+    'variables': 'variable',
+    'Prob': 'prob',
+    'RV': 'rv',
+    'RVs': 'rv',
+    'Field': 'field',
+    'RF': 'rf',
+    'SD': 'sd',
+    'SP': 'sp',
+    'CF': 'cf',
+    'NaiveBayes': 'naive_bayes',
+    'MeanField': 'mean_field',
+    'LoopyBP': 'loopy_bp',
+    'HMM': 'hmm',
+    'SMC': 'smc',
+    'Manifold': 'manifold',
+    'Dist': 'dist',
+    'product': 'dist_utils',
+    'summate': 'dist_utils',
+    'iterdict': 'dist_utils',
+    'Distribution': 'distribution',
+    'bool_perm_freq': 'likelihoods',
+    'Expression': 'expression',
+    'SympyProb': 'sympy_prob',
+             }
+__all__ = list(LAZY_ATTRS.keys())
+
+#-------------------------------------------------------------------------------
+def __getattr__(name):
+  """ Imports public attributes and submodules on first access """
+  if name in LAZY_ATTRS:
+    module = importlib.import_module(__name__ + '.' + LAZY_ATTRS[name])
+    attr = getattr(module, name)
+    globals().update({name: attr})
+    return attr
+  if not name.startswith('_') and \
+      importlib.util.find_spec(__name__ + '.' + name) is not None:
+    return importlib.import_module(__name__ + '.' + name)
+  raise AttributeError("module '{}' has no attribute '{}'".format(
+                       __name__, name))
+
+#-------------------------------------------------------------------------------
+def __dir__():
+  return sorted(set(globals().keys()).union(__all__))
+
+#-------------------------------------------------------------------------------
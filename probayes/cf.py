@@ -4,6 +4,7 @@ dependence of an about output RF with respect to an input RF or the
 by the dependence of a subgroup of RVs with respect to the others. 
 '''
 import collections
+import functools
 from probayes.rv import RV
 from probayes.func import Func
 
@@ -51,7 +52,6 @@ class CF (Func):
 
   # Private
   __inpdict = None
-  __unknown = None
 
 #-------------------------------------------------------------------------------
   @property
@@ -97,7 +97,6 @@ class CF (Func):
     if self.__inpdict:
       if isinstance(inp, (tuple, list)):
         inp = {key: '' for key in inp}
-    self.__unknown = None
 
     # Handle inp is a random field first
     if not self.__inpdict and inp is not None:
@@ -205,16 +204,12 @@ class CF (Func):
      return super().__getitem__(spec)
    assert self.__inpdict, \
        "Input spec as a string only supported with a OrderedDict inp"
-   self.__unknown = spec
-   return self._call
+   return functools.partial(self._call_unknown, spec)
 
 #-------------------------------------------------------------------------------
-  def _call(self, *args, **kwds):
-    if self.__unknown is None:
-      return super()._call(*args, **kwds)
+  def _call_unknown(self, unknown, *args, **kwds):
     kwds = dict(kwds)
-    kwds.update({'unknown': self.__unknown})
-    self.__unknown = None
-    return super()._call(*args, **kwds)
+    kwds.update({'unknown': unknown})
+    return self._call(*args, **kwds)
 
 #-------------------------------------------------------------------------------
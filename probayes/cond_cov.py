@@ -1,67 +1,141 @@
 """
-A covariance-matrix-based conditional sampling class.
+A covariance-matrix-based conditional sampling class. Conditional means and
+variances are obtained from a single precision matrix computed via Cholesky
+factorisation. For precision matrix P, the conditional distribution of the ith
+variable given all others is normal with variance 1/P[i, i] and mean:
+
+mean[i] - sum_{j != i} P[i, j] * (x[j] - mean[j]) / P[i, i]
 """
 import numpy as np
-import scipy.stats
+import scipy.special
 from probayes.vtypes import isunitsetint, uniform
+from probayes.rng import get_rng
 
 #-------------------------------------------------------------------------------
 class CondCov:
 
   # Protected
-  _mean = None # Means 
+  _mean = None # Means
   _cov = None  # Covariance matrix
   _n = None    # len(means)
-  _scom = None # Schur complements
+  _prec = None # Precision matrix
   _stdv = None # Conditional standard deviations
-  _coef = None # Regression coefficients
-  _lims = None  # Recentered limits (Nx2 array)
-  _cdfs = None  # cdf-limits
+  _coef = None # Regression coefficients (NxN array with zero diagonal)
+  _lims = None # Limits (Nx2 array)
 
 #-------------------------------------------------------------------------------
   def __init__(self, mean, cov, lims):
-    self._mean = np.atleast_1d(mean)
-    self._cov = np.atleast_2d(cov)
-    self._inv = np.linalg.inv(self._cov)
-    self._lims = np.atleast_2d(lims) - np.expand_dims(self._mean, -1)
+    self._mean = np.atleast_1d(np.asarray(mean, dtype=float))
+    self._cov = np.atleast_2d(np.asarray(cov, dtype=float))
+    self._lims = np.atleast_2d(np.asarray(lims, dtype=float))
     self._n = len(self._mean)
-    assert len(self._cov) == self._n, \
+    assert self._cov.shape == (self._n, self._n), \
         "Means and covariance matrix incommensurate"
-    self._stdv = np.empty(self._n, dtype=float)
-    self._coef = [None] * self._n
-    for i in range(self._n):
-      ll  = np.delete(self._cov[:, i].reshape([self._n, 1]), (i), axis=0)
-      ru  = np.delete(self._cov[i, :].reshape([1, self._n]), (i), axis=1)
-      cov = np.delete(np.delete(self._cov, (i), axis=1), (i), axis=0)
-      self._coef[i] = ru.dot(np.linalg.inv(cov))
-      self._stdv[i] = np.sqrt(self._cov[i, i] - float(self._coef[i].dot(ll)))
-    self._cdfs = np.array([scipy.stats.norm.cdf(lim, loc=0., scale=self._stdv[i]) \
-                          for i, lim in enumerate(self._lims)])
+    assert self._lims.shape == (self._n, 2), \
+        "Limits must be an Nx2 array, not shape {}".format(self._lims.shape)
+    import scipy.linalg # deferred since only required here
+    chol = scipy.linalg.cholesky(self._cov, lower=True)
+    chol_inv = scipy.linalg.solve_triangular(chol, np.eye(self._n), lower=True)
+    self._prec = chol_inv.T.dot(chol_inv)
+    diag = np.diag(self._prec)
+    self._stdv = 1. / np.sqrt(diag)
+    self._coef = -self._prec / np.expand_dims(diag, -1)
+    np.fill_diagonal(self._coef, 0.)
+
+#-------------------------------------------------------------------------------
+  @property
+  def prec(self):
+    return self._prec
+
+  @property
+  def stdv(self):
+    return self._stdv
+
+#-------------------------------------------------------------------------------
+  def cond_mean(self, idx, *args):
+    """ Returns the conditional mean of variable idx given values args in order
+    of mean (args[idx] is ignored), which may be broadcastable arrays. """
+    args = list(args)
+    args[idx] = self._mean[idx]
+    dmu = self._stack(args) - self._mean
+    return self._mean[idx] + dmu.dot(self._coef[idx])
+
+#-------------------------------------------------------------------------------
+  def _stack(self, args):
+    """ Stacks broadcastable values args along a last axis of size N """
+    try: # scalars or commensurate arrays
+      return np.moveaxis(np.array(args, dtype=float), 0, -1)
+    except ValueError:
+      pass
+    shape = np.broadcast_shapes(*[np.shape(arg) for arg in args])
+    stack = np.empty(shape + (self._n,), dtype=float)
+    for i, arg in enumerate(args):
+      stack[..., i] = arg
+    return stack
+
+#-------------------------------------------------------------------------------
+  def _draw(self, idx, mean, unif, cond_pdf=False):
+    """ Maps uniform variates unif to truncated conditional normal values """
+    stdv = self._stdv[idx]
+    cdf_lo = scipy.special.ndtr((self._lims[idx, 0] - mean) / stdv)
+    cdf_hi = scipy.special.ndtr((self._lims[idx, 1] - mean) / stdv)
+    z = scipy.special.ndtri(cdf_lo + (cdf_hi - cdf_lo) * unif)
+    vals = mean + stdv * z
+    if not cond_pdf:
+      return vals
+    return vals, np.exp(-0.5 * z**2) / (stdv * np.sqrt(2. * np.pi))
 
 #-------------------------------------------------------------------------------
   def interp(self, *args, cond_pdf=False):
-    # args in order of mean - one must be a unitsetint
+    """ Samples the truncated conditional normal of one variable.
+
+    :param args: values in order of mean, one of which must be a unitsetint
+                 denoting the variable to sample and number of samples (see
+                 vtypes.uniform). Other values may be arrays of many states, in
+                 which case samples are drawn for each state.
+    :param cond_pdf: boolean flag to also return conditional densities.
+
+    :return: sampled values (and conditional densities if cond_pdf is True)
+             with shape of the broadcast states followed by number of samples.
+    """
     idx = None
-    dmu = np.empty((self._n, 1), dtype=float)
-    vals = [arg for arg in args]
     for i, arg in enumerate(args):
-      if isunitsetint(arg):
+      if isinstance(arg, set) and isunitsetint(arg):
         if idx is None:
           idx = i
         else:
           raise ValueError("Only one argument can be interpolated at a time")
-      else:
-        dmu[i] = arg - self._mean[i]
     assert idx is not None, "No variable specified for interpolation"
-    dmu = np.delete(dmu, (idx), axis=0)
-    lims = self._cdfs[idx]
+    mean = self.cond_mean(idx, *args)
     number = list(args[idx])[0]
-    cdf = uniform(lims[0], lims[1], number)
-    mean = self._mean[idx] + float(self._coef[idx].dot(dmu))
-    stdv = self._stdv[idx]
-    vals = scipy.stats.norm.ppf(cdf, loc=mean, scale=stdv)
-    if not cond_pdf:
-      return vals
-    return vals, scipy.stats.norm.pdf(vals, loc=mean, scale=stdv)
+    shape = np.shape(mean)
+    if number or not shape:
+      unif = uniform(0., 1., number)
+      if shape and np.ndim(unif):
+        mean = np.expand_dims(mean, -1)
+    else: # one random draw per state
+      unif = uniform(0., 1., -int(np.prod(shape))).reshape(shape)
+    return self._draw(idx, mean, unif, cond_pdf=cond_pdf)
+
+#-------------------------------------------------------------------------------
+  def sweep(self, *args, rng=None):
+    """ Performs a vectorised Gibbs sweep updating each variable in turn.
+
+    :param args: values in order of mean, which may be broadcastable arrays of
+                 states for many chains.
+    :param rng: optional random number generator (otherwise get_rng()).
+
+    :return: list of updated values with the broadcast shape of args.
+    """
+    assert len(args) == self._n, \
+        "Number of values {} incommensurate with {} means".format(
+            len(args), self._n)
+    dmu = self._stack(args) - self._mean
+    unif = get_rng(rng).uniform(size=(self._n,) + dmu.shape[:-1])
+    for idx in range(self._n):
+      mean = self._mean[idx] + dmu.dot(self._coef[idx])
+      dmu[..., idx] = self._draw(idx, mean, unif[idx]) - self._mean[idx]
+    dmu += self._mean
+    return [dmu[..., i] for i in range(self._n)]
 
 #-------------------------------------------------------------------------------
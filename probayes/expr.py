@@ -2,16 +2,136 @@
 
 #-------------------------------------------------------------------------------
 import collections
+import importlib
+import warnings
 import sympy
 import numpy as np
+import scipy.special
+from sympy.printing.numpy import SciPyPrinter
 from sympy.utilities.autowrap import ufuncify
+from probayes.icon import isspecial
 from probayes.variable_utils import parse_as_str_dict
+from probayes.expr_cache import expr_key, get_efun, put_efun, read_kernel, \
+                                write_kernel, compile_kernel, get_expr_cache_dir
+from probayes.expr_backends import DEFAULT_BACKEND, get_backend, \
+                                   backend_printer, backend_jit, fallback
 
+#-------------------------------------------------------------------------------
+def permute_args(func, indices):
+  """ Returns a function calling func with positional arguments reordered """
+  def _func(*args):
+    return func(*[args[index] for index in indices])
+  return _func
+
+#-------------------------------------------------------------------------------
+class KernelPrinter(SciPyPrinter):
+  """ SciPy printer that prints Min/Max elementwise to support broadcasting """
+  def _print_Min(self, expr):
+    return self._print_minmax(expr, 'minimum')
+
+  def _print_Max(self, expr):
+    return self._print_minmax(expr, 'maximum')
+
+  def _print_minmax(self, expr, func):
+    func = self._module_format('numpy.' + func)
+    args = [self._print(arg) for arg in expr.args]
+    code = args[0]
+    for arg in args[1:]:
+      code = '{}({}, {})'.format(func, code, arg)
+    return code
+
+#-------------------------------------------------------------------------------
+# Translation table of functions not (reliably) supported by SymPy's printers
+TRANSLATIONS = {
+    'Heaviside': lambda x, h0=0.5: np.heaviside(x, h0),
+    'lowergamma': lambda s, x: scipy.special.gamma(s) * \
+                               scipy.special.gammainc(s, x),
+    'uppergamma': lambda s, x: scipy.special.gamma(s) * \
+                               scipy.special.gammaincc(s, x),
+    'erfinv': scipy.special.erfinv,
+    'erfcinv': scipy.special.erfcinv,
+    'loggamma': scipy.special.gammaln,
+    'polygamma': scipy.special.polygamma,
+    'LambertW': lambda x, k=0: np.real(scipy.special.lambertw(x, k)),
+    'besseli': scipy.special.iv,
+    'besselj': scipy.special.jv,
+    'besselk': scipy.special.kv,
+    'bessely': scipy.special.yv,
+    'DiracDelta': lambda x: np.where(x == 0., np.inf, 0.),
+               }
+
+#-------------------------------------------------------------------------------
 DEFAULT_EFUNS = [
                   ({np.ndarray: ufuncify}, [], {'backend':'numpy'})
                   ,
-                  ({np.ndarray: sympy.lambdify}, ['numpy', 'scipy'], {} )
+                  ({np.ndarray: sympy.lambdify}, [], 
+                   {'modules': ['numpy', 'scipy']})
+                  ,
+                  ({np.ndarray: sympy.lambdify}, [],
+                   {'modules': [TRANSLATIONS, 'numpy', 'scipy'],
+                    'printer': KernelPrinter})
                 ]
+TRIAL_VALUES = np.array([0.25, 0.5, 0.75]) # Inputs to validate kernels
+LAMBDIFY_NAMESPACES = {} # Default namespaces of DEFAULT_EFUNS lambdify entries
+
+#-------------------------------------------------------------------------------
+def lambdify_namespace(spec):
+  """ Returns the default lambdify namespace of DEFAULT_EFUNS[spec] """
+  if spec not in LAMBDIFY_NAMESPACES:
+    efun, args, kwds = DEFAULT_EFUNS[spec]
+    func = efun[np.ndarray](tuple(), 0, *tuple(args), **dict(kwds))
+    LAMBDIFY_NAMESPACES.update({spec: dict(func.__globals__)})
+  return LAMBDIFY_NAMESPACES[spec]
+
+#-------------------------------------------------------------------------------
+def lambdify_cse(args, exprs, spec=-1, backend=None):
+  """ Returns a function of args evaluating a tuple of expressions exprs, in
+  which common subexpressions are evaluated only once (see sympy.cse).
+
+  :param args: sequence of SymPy symbols.
+  :param exprs: sequence of SymPy expressions.
+  :param spec: index of the DEFAULT_EFUNS lambdify entry providing the printer
+               and namespace (default: last).
+  :param backend: numeric backend (see probayes.expr_backends) with None
+                  denoting the global backend. If the backend cannot compile 
+                  the expressions, the function falls back to NumPy.
+
+  :return: function returning a tuple of len(exprs) evaluations.
+  """
+  backend = get_backend(backend)
+  func = _lambdify_cse(args, exprs, spec, DEFAULT_BACKEND)
+  if backend == DEFAULT_BACKEND:
+    return func
+  try:
+    backend_func = _lambdify_cse(args, exprs, spec, backend)
+  except Exception: # unsupported functions
+    return func
+  return fallback(backend_func, func)
+
+#-------------------------------------------------------------------------------
+def _lambdify_cse(args, exprs, spec, backend):
+  """ Performs lambdify_cse() for a given available backend """
+  _, _, kwds = DEFAULT_EFUNS[spec]
+  printer = backend_printer(backend, kwds.get('printer', SciPyPrinter))({
+                'fully_qualified_modules': False, 'inline': True,
+                'allow_unknown_functions': True, 'user_functions': {}})
+  dummies = [sympy.Symbol('_arg{}'.format(i)) for i in range(len(args))]
+  exprs = [sympy.sympify(expr).xreplace(dict(zip(args, dummies))) \
+           for expr in exprs]
+  replacements, reduced = sympy.cse(exprs, 
+                                    symbols=sympy.numbered_symbols('_cse'))
+  lines = ['def _lambdifycse({}):'.format(', '.join(map(str, dummies)))]
+  for symbol, expr in replacements:
+    lines.append('  {} = {}'.format(symbol, printer.doprint(expr)))
+  lines.append('  return ({},)'.format(
+               ', '.join([printer.doprint(expr) for expr in reduced])))
+  namespace = dict(lambdify_namespace(spec))
+  for module, names in printer.module_imports.items():
+    for name in names:
+      if name not in namespace:
+        namespace.update({name: getattr(importlib.import_module(module), name)})
+  exec(compile('\n'.join(lines), '<lambdify_cse>', 'exec'), namespace)
+  return backend_jit(backend, namespace['_lambdifycse'])
 
 #-------------------------------------------------------------------------------
 def collate_symbols(expr):
@@ -66,7 +186,7 @@ def sort_ordered_dict(ordereddict, order, reverse=False):
 class Expr:
   """ This class wraps sy.Expr. Sympy's dependence on __new__ to return
   modified class objects at instantiation doesn't play nicely with multiple
-  inheritance wrap them in here as a class instead and copy over the attributes.
+  inheritance wrap them in here as a class instead and delegate attributes.
 
   :example
   >>> import sympy as sy
@@ -84,9 +204,11 @@ class Expr:
   _symbols = None # Ordered dictionary of symbols keyed by name
   _efun = None    # Dictionary of evaluation functions
   _remap = None   # Optional dictionary for remapping
+  _backend = None # Numeric backend name (None for global)
 
 #-------------------------------------------------------------------------------
   def __init__(self, expr, **kwds):
+    self._backend = None if 'backend' not in kwds else kwds.pop('backend')
     self.expr = expr
     self.remap = None if 'remap' not in kwds else kwds.pop('remap')
 
@@ -99,6 +221,10 @@ class Expr:
   def symbols(self):
     return self._symbols
 
+  @property
+  def backend(self):
+    return self._backend
+
   @expr.setter
   def expr(self, expr=None):
     """ Sets the expr object for this instance. Either pass a sy.Expr object 
@@ -107,19 +233,96 @@ class Expr:
     self._expr = expr
     self._symbols = collate_symbols(self._expr)
 
-    # Make instance play nicely with Sympy by copying attributes and hash content
-    members = dir(self._expr)
-    for member in members:
-      if not hasattr(self, member):
-        try:
-          attribute = getattr(self._expr, member)
-          setattr(self, member, attribute)
-        except AttributeError:
-          pass
-
     # In addition to substitution, add default evaluation functions
-    for efun in DEFAULT_EFUNS:
-      self.add_efun(efun[0], *tuple(efun[1]), **dict(efun[2]))
+    self._efun = None
+    self._add_default_efuns()
+
+#-------------------------------------------------------------------------------
+  def _add_default_efuns(self):
+    """ Adds default evaluation functions from the compiled expression cache,
+    otherwise compiling and caching them (see probayes.expr_cache). """
+    self.add_efun()
+    if not self._symbols:
+      return
+    key = expr_key(self._expr, self._symbols.values())
+    efun = get_efun(key)
+    if efun is None:
+      efun = self._read_kernel()
+      if efun is None:
+        for default_efun in DEFAULT_EFUNS:
+          self.add_efun(default_efun[0], *tuple(default_efun[1]), 
+                        **dict(default_efun[2]))
+        efun = {key: val for key, val in self._efun.items() if key is not None}
+        self._write_kernel()
+      put_efun(key, efun)
+    self._efun.update(efun)
+    self._add_backend_efun(key)
+
+#-------------------------------------------------------------------------------
+  def _add_backend_efun(self, key):
+    """ Replaces the NumPy kernel with one compiled by the numeric backend if
+    available and consistent (see probayes.expr_backends), falling back to the
+    NumPy kernel if evaluation fails. """
+    backend = get_backend(self._backend)
+    if backend == DEFAULT_BACKEND or np.ndarray not in self._efun:
+      return
+    key = key + (backend,)
+    efun = get_efun(key)
+    if efun is None:
+      efun = {}
+      try:
+        func = _lambdify_cse(list(self._symbols.values()), [self._expr], -1,
+                             backend)
+      except Exception: # unsupported functions
+        func = None
+      if func is not None:
+        kernel = lambda *args: func(*args)[0]
+        if self._trial_efun(kernel):
+          efun = {np.ndarray: fallback(kernel, self._efun[np.ndarray])}
+      put_efun(key, efun)
+    self._efun.update(efun)
+
+#-------------------------------------------------------------------------------
+  def _kernel_symbols(self):
+    """ Returns symbol names and symbols sorted by name for on-disk kernels, 
+    since the order of free symbols may differ across processes. """
+    names = sorted(self._symbols.keys())
+    return names, [self._symbols[name] for name in names]
+
+#-------------------------------------------------------------------------------
+  def _read_kernel(self):
+    """ Returns efun dictionary of a kernel read from on-disk cache or None """
+    names, symbols = self._kernel_symbols()
+    kernel = read_kernel(expr_key(self._expr, symbols))
+    if kernel is None:
+      return None
+    func = compile_kernel(kernel, lambdify_namespace(kernel['spec']))
+    keys = list(self._symbols.keys())
+    if names != keys:
+      func = permute_args(func, [keys.index(name) for name in names])
+    if not self._trial_efun(func):
+      return None
+    return {np.ndarray: func}
+
+#-------------------------------------------------------------------------------
+  def _write_kernel(self):
+    """ Writes the first valid lambdified kernel to the on-disk cache """
+    if get_expr_cache_dir() is None:
+      return False
+    names, symbols = self._kernel_symbols()
+    for spec, default_efun in enumerate(DEFAULT_EFUNS):
+      efun, args, kwds = default_efun
+      if efun.get(np.ndarray, None) is not sympy.lambdify:
+        continue
+      try:
+        func = sympy.lambdify(tuple(symbols), self._expr, *tuple(args), 
+                              **dict(kwds))
+      except Exception:
+        continue
+      if self._trial_efun(func):
+        return write_kernel(expr_key(self._expr, symbols), spec, func,
+                            lambdify_namespace(spec))
+    return False
 
 #-------------------------------------------------------------------------------
   @property
@@ -153,12 +356,37 @@ class Expr:
     for key, val in efun.items():
       if key not in self._efun:
         try:
-          self._efun.update({key: val(symbols, self._expr, *args, **kwds)})
-        except (TypeError, ImportError, AttributeError): # Bypass sympy bugs
-          pass
-          # import pdb; pdb.set_trace()
+          func = val(symbols, self._expr, *args, **kwds)
+        except Exception: # Bypass sympy bugs and unsupported functions
+          continue
+        if key is np.ndarray and not self._trial_efun(func):
+          continue
+        self._efun.update({key: func})
     return self._efun
 
+#-------------------------------------------------------------------------------
+  def _trial_efun(self, func):
+    """ Returns whether func evaluates array inputs returning finite-sized 
+    arrays consistent with substitution, since lambdified functions may only 
+    fail when called and compiled functions may mistranslate functions. """
+    trial_values = [TRIAL_VALUES] * len(self._symbols)
+    try:
+      with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        vals = np.asarray(func(*trial_values), dtype=float)
+    except Exception:
+      return False
+    if vals.size not in (1, TRIAL_VALUES.size):
+      return False
+    subs = {symbol: TRIAL_VALUES[-1] for symbol in self._symbols.values()}
+    try:
+      val = complex(self._expr.subs(subs).evalf())
+    except (TypeError, ValueError): # no numerical reference available
+      return True
+    if not np.isfinite(val) or val.imag:
+      return True
+    return bool(np.isclose(vals.ravel()[-1], val.real, equal_nan=True))
+
 #-------------------------------------------------------------------------------
   def __call__(self, *args, **kwds):
     """ Performs evaluation of expression inputting symbols as a dictionary 
@@ -209,6 +437,13 @@ class Expr:
     if not(any(isarray)) or np.ndarray in self._efun:
       efun = self._efun[etype]
       vals = efun(*evalues) if etype else efun(values)
+      if etype == np.ndarray: # broadcast constant or partial outputs
+        shape = np.broadcast(*[evalue for i, evalue in enumerate(evalues) \
+                               if isarray[i]]).shape
+        vals = np.asarray(vals)
+        if vals.shape != shape:
+          vals = np.broadcast_to(vals, shape).copy()
+        return vals
       if isinstance(vals, np.ndarray):
         return vals
       elif isinstance(vals, sympy.Integer):
@@ -217,13 +452,14 @@ class Expr:
         return float(vals)
       elif isinstance(vals, sympy.Expr) and not len(collate_symbols(vals)):
         return float(vals)
-      elif etype == np.ndarray:
-        return np.array(vals)
       return vals
 
 
     # Try to support iterating numpy-array even without a NumPy eval func
     if any(isarray) and np.ndarray not in self._efun:
+      warnings.warn("No NumPy kernel for expression {}; ".format(self._expr) + 
+                    "falling back to slow elementwise substitution",
+                    RuntimeWarning)
       efun = self._efun[None]
 
       vec_dims = np.array([dim for dim in vec_dim if dim is not None])
@@ -259,6 +495,15 @@ class Expr:
 
     # Otherwise rely on evaluation function
 
+#-------------------------------------------------------------------------------
+  def __getattr__(self, name):
+    """ Delegates (non-special) attributes not found to the expression object to
+    make instances play nicely with SymPy """
+    if self._expr is None or isspecial(name):
+      raise AttributeError("'{}' object has no attribute '{}'".format(
+                           type(self).__name__, name))
+    return getattr(self._expr, name)
+
 #-------------------------------------------------------------------------------
   def __repr__(self):
     if self._expr is None:
@@ -0,0 +1,131 @@
+"""
+A registry of numeric backends for compiling SymPy expressions. The 'numpy'
+backend is always available. The 'numexpr' backend (multi-threaded evaluation
+without temporaries) and 'numba' backend (jitted NumPy) are only available
+if their packages are importable, otherwise evaluation falls back to 'numpy'.
+Backends may be set globally (see set_backend()) or per expression.
+"""
+#-------------------------------------------------------------------------------
+import warnings
+import importlib
+import importlib.util
+import collections
+
+#-------------------------------------------------------------------------------
+DEFAULT_BACKEND = 'numpy'
+BACKEND = DEFAULT_BACKEND            # Global backend
+BACKENDS = collections.OrderedDict() # Backend specifications keyed by name
+AVAILABLE = {}                       # Cached availability keyed by name
+UNAVAILABLE = set()                  # Requested backends found unavailable
+
+#-------------------------------------------------------------------------------
+def register_backend(name, module=None, printer=None, jit=None):
+  """ Registers a numeric backend for compiling expressions.
+
+  :param name: backend name.
+  :param module: name of the module required by the backend (or None).
+  :param printer: function returning a code printer class (None for default).
+  :param jit: function inputting the backend module and a compiled Python
+              function, returning the function wrapped by the backend.
+  """
+  assert isinstance(name, str), \
+      "Backend name must be a string, not {}".format(type(name))
+  BACKENDS.update({name: {'module': module, 'printer': printer, 'jit': jit}})
+  AVAILABLE.pop(name, None)
+
+#-------------------------------------------------------------------------------
+def is_available(name):
+  """ Returns whether the module required by backend name is importable """
+  if name not in AVAILABLE:
+    module = BACKENDS[name]['module']
+    AVAILABLE.update({name: module is None or \
+                            importlib.util.find_spec(module) is not None})
+  return AVAILABLE[name]
+
+#-------------------------------------------------------------------------------
+def available_backends():
+  """ Returns a list of names of registered backends that are importable """
+  return [name for name in BACKENDS.keys() if is_available(name)]
+
+#-------------------------------------------------------------------------------
+def set_backend(backend=None):
+  """ Sets the global backend (None resets to DEFAULT_BACKEND) """
+  global BACKEND
+  backend = backend or DEFAULT_BACKEND
+  assert backend in BACKENDS, \
+      "Unknown backend {}; registered backends: {}".format(
+          backend, list(BACKENDS.keys()))
+  BACKEND = backend
+
+#-------------------------------------------------------------------------------
+def get_backend(backend=None):
+  """ Returns the name of the backend to use for backend (None for global),
+  falling back to DEFAULT_BACKEND with a warning if unavailable. """
+  backend = backend or BACKEND
+  assert backend in BACKENDS, \
+      "Unknown backend {}; registered backends: {}".format(
+          backend, list(BACKENDS.keys()))
+  if not is_available(backend):
+    if backend not in UNAVAILABLE:
+      UNAVAILABLE.add(backend)
+      warnings.warn("Backend {} unavailable; falling back to {}".format(
+                    backend, DEFAULT_BACKEND), RuntimeWarning)
+    return DEFAULT_BACKEND
+  return backend
+
+#-------------------------------------------------------------------------------
+def backend_printer(backend, default):
+  """ Returns the code printer class for backend, otherwise default """
+  printer = BACKENDS[backend]['printer']
+  return default if printer is None else printer()
+
+#-------------------------------------------------------------------------------
+def backend_jit(backend, func):
+  """ Returns func wrapped by the backend jit function if specified """
+  jit = BACKENDS[backend]['jit']
+  module = BACKENDS[backend]['module']
+  if jit is None:
+    return func
+  return jit(importlib.import_module(module), func)
+
+#-------------------------------------------------------------------------------
+def fallback(func, default):
+  """ Returns a function calling func, otherwise default if func raises an
+  exception (e.g. unsupported functions for jitted functions), after which
+  default is always called to avoid repeating failed compilations. """
+  failed = [False]
+  def _func(*args):
+    if not failed[0]:
+      try:
+        return func(*args)
+      except Exception:
+        failed[0] = True
+    return default(*args)
+  return _func
+
+#-------------------------------------------------------------------------------
+def _numexpr_printer():
+  """ Returns a NumExpr printer that evaluates from the caller's locals """
+  from sympy.printing.lambdarepr import NumExprPrinter
+  class _NumExprPrinter(NumExprPrinter):
+    def doprint(self, expr):
+      code = super(NumExprPrinter, self).doprint(expr)
+      return "evaluate('{}')".format(code)
+  return _NumExprPrinter
+
+#-------------------------------------------------------------------------------
+def _numexpr_jit(numexpr, func):
+  """ Returns func with numexpr.evaluate added to its namespace """
+  func.__globals__.update({'evaluate': numexpr.evaluate})
+  return func
+
+#-------------------------------------------------------------------------------
+def _numba_jit(numba, func):
+  return numba.njit(func)
+
+#-------------------------------------------------------------------------------
+register_backend('numpy')
+register_backend('numexpr', 'numexpr', _numexpr_printer, _numexpr_jit)
+register_backend('numba', 'numba', None, _numba_jit)
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,199 @@
+"""
+A module to cache compiled expression evaluation functions. Functions are keyed
+by sympy.srepr() of the expression together with the order of its symbols, and
+held in a least-recently-used in-process cache. Optionally, the generated
+source of lambdified kernels can be stored in a cache directory so that
+identical expressions compile once across processes and restarts.
+"""
+#-------------------------------------------------------------------------------
+import os
+import json
+import hashlib
+import inspect
+import importlib
+import threading
+import collections
+import sympy
+
+#-------------------------------------------------------------------------------
+DEFAULT_EXPR_CACHE_SIZE = 1024
+EXPR_CACHE = collections.OrderedDict() # In-process LRU cache
+EXPR_CACHE_SIZE = DEFAULT_EXPR_CACHE_SIZE # Maximum size (0 to disable)
+EXPR_CACHE_DIR = None                  # On-disk cache directory (None to disable)
+EXPR_CACHE_LOCK = threading.Lock()     # Lock for cache and statistics
+EXPR_CACHE_STATS = collections.OrderedDict([
+                     ('hits', 0),        # In-process hits
+                     ('misses', 0),      # In-process misses
+                     ('evictions', 0),   # In-process evictions
+                     ('disk_hits', 0),   # On-disk hits
+                     ('disk_misses', 0), # On-disk misses
+                     ('disk_writes', 0), # On-disk writes
+                   ])
+KERNEL_MODULES = ['numpy', 'scipy.special', 'scipy', 'math']
+
+#-------------------------------------------------------------------------------
+def set_expr_cache(maxsize=None, cache_dir=None):
+  """ Configures the compiled expression cache.
+
+  :param maxsize: maximum number of in-process entries (0 disables caching).
+  :param cache_dir: directory for on-disk storage of lambdified source (None
+                    leaves the current setting unchanged, False disables
+                    on-disk caching).
+  """
+  global EXPR_CACHE_SIZE, EXPR_CACHE_DIR
+  with EXPR_CACHE_LOCK:
+    if maxsize is not None:
+      assert isinstance(maxsize, int) and maxsize >= 0, \
+          "Cache size must be a non-negative integer, not {}".format(maxsize)
+      EXPR_CACHE_SIZE = maxsize
+      while len(EXPR_CACHE) > EXPR_CACHE_SIZE:
+        EXPR_CACHE.popitem(last=False)
+        EXPR_CACHE_STATS['evictions'] += 1
+    if cache_dir is False:
+      EXPR_CACHE_DIR = None
+    elif cache_dir is not None:
+      EXPR_CACHE_DIR = str(cache_dir)
+      os.makedirs(EXPR_CACHE_DIR, exist_ok=True)
+
+#-------------------------------------------------------------------------------
+def clear_expr_cache(stats=True):
+  """ Clears the in-process cache and optionally resets the statistics """
+  with EXPR_CACHE_LOCK:
+    EXPR_CACHE.clear()
+    if stats:
+      for key in EXPR_CACHE_STATS.keys():
+        EXPR_CACHE_STATS[key] = 0
+
+#-------------------------------------------------------------------------------
+def expr_cache_stats():
+  """ Returns a dictionary of cache statistics """
+  with EXPR_CACHE_LOCK:
+    stats = collections.OrderedDict(EXPR_CACHE_STATS)
+    stats.update({'size': len(EXPR_CACHE),
+                  'maxsize': EXPR_CACHE_SIZE,
+                  'cache_dir': EXPR_CACHE_DIR})
+  return stats
+
+#-------------------------------------------------------------------------------
+def get_expr_cache_dir():
+  """ Returns the on-disk cache directory (None if disabled) """
+  return EXPR_CACHE_DIR
+
+#-------------------------------------------------------------------------------
+def expr_key(expr, symbols):
+  """ Returns a hashable key for sympy expression expr with ordered symbols """
+  return (sympy.srepr(expr), tuple(sympy.srepr(symbol) for symbol in symbols))
+
+#-------------------------------------------------------------------------------
+def get_efun(key):
+  """ Returns the cached evaluation functions for key, or None if missing """
+  if not EXPR_CACHE_SIZE:
+    return None
+  with EXPR_CACHE_LOCK:
+    if key not in EXPR_CACHE:
+      EXPR_CACHE_STATS['misses'] += 1
+      return None
+    EXPR_CACHE.move_to_end(key)
+    EXPR_CACHE_STATS['hits'] += 1
+    return dict(EXPR_CACHE[key])
+
+#-------------------------------------------------------------------------------
+def put_efun(key, efun):
+  """ Caches the evaluation function dictionary efun for key """
+  if not EXPR_CACHE_SIZE:
+    return
+  with EXPR_CACHE_LOCK:
+    EXPR_CACHE.update({key: dict(efun)})
+    EXPR_CACHE.move_to_end(key)
+    while len(EXPR_CACHE) > EXPR_CACHE_SIZE:
+      EXPR_CACHE.popitem(last=False)
+      EXPR_CACHE_STATS['evictions'] += 1
+
+#-------------------------------------------------------------------------------
+def _kernel_path(key):
+  """ Returns the on-disk path for key, which includes the SymPy version since
+  generated source may differ between versions. """
+  digest = hashlib.sha256(repr((sympy.__version__,) + key).encode())
+  return os.path.join(EXPR_CACHE_DIR, digest.hexdigest() + '.json')
+
+#-------------------------------------------------------------------------------
+def read_kernel(key):
+  """ Reads a kernel specification stored for key from the cache directory.
+
+  :return: None if missing, otherwise a dictionary with fields 'spec' (index
+           of the lambdify specification), 'source', and 'imports'.
+  """
+  if EXPR_CACHE_DIR is None:
+    return None
+  path = _kernel_path(key)
+  kernel = None
+  if os.path.isfile(path):
+    try:
+      with open(path, 'r') as kernel_file:
+        kernel = json.load(kernel_file)
+    except (OSError, ValueError):
+      kernel = None
+  with EXPR_CACHE_LOCK:
+    EXPR_CACHE_STATS['disk_hits' if kernel else 'disk_misses'] += 1
+  return kernel
+
+#-------------------------------------------------------------------------------
+def write_kernel(key, spec, func, namespace):
+  """ Writes the source of lambdified function func to the cache directory.
+
+  :param key: cache key (see expr_key).
+  :param spec: index of the lambdify specification used to generate func.
+  :param func: lambdified function.
+  :param namespace: default namespace of the lambdify specification, so that
+                    only additional imports are stored.
+
+  :return: True if written, otherwise False.
+  """
+  if EXPR_CACHE_DIR is None:
+    return False
+  try:
+    source = inspect.getsource(func)
+  except (OSError, TypeError):
+    return False
+  imports = collections.OrderedDict()
+  for name in func.__code__.co_names:
+    if name in namespace or name not in func.__globals__:
+      continue
+    obj = func.__globals__[name]
+    module = None
+    for module_name in KERNEL_MODULES:
+      try:
+        if getattr(importlib.import_module(module_name), name, None) is obj:
+          module = module_name
+          break
+      except ImportError:
+        pass
+    if module is None:
+      return False
+    imports.update({name: module})
+  kernel = {'spec': spec, 'source': source, 'imports': imports}
+  path = _kernel_path(key)
+  temp_path = "{}.{}.tmp".format(path, os.getpid())
+  try:
+    with open(temp_path, 'w') as kernel_file:
+      json.dump(kernel, kernel_file)
+    os.replace(temp_path, path)
+  except OSError:
+    return False
+  with EXPR_CACHE_LOCK:
+    EXPR_CACHE_STATS['disk_writes'] += 1
+  return True
+
+#-------------------------------------------------------------------------------
+def compile_kernel(kernel, namespace):
+  """ Compiles a kernel specification read by read_kernel() within a copy of
+  namespace, returning the compiled function. """
+  namespace = dict(namespace)
+  for name, module in kernel['imports'].items():
+    namespace.update({name: getattr(importlib.import_module(module), name)})
+  local = {}
+  exec(compile(kernel['source'], '<expr_cache>', 'exec'), namespace, local)
+  assert len(local) == 1, "Kernel source must define a single function"
+  return list(local.values())[0]
+
+#-------------------------------------------------------------------------------
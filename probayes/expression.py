@@ -19,6 +19,66 @@ def islambda(func):
   if type(func) is types.LambdaType:
     return func.__name__ == '<lambda>'
 
+#-------------------------------------------------------------------------------
+def pop_delta(kwds, key):
+  """ Pops key from kwds, differencing primed keys from unprimed keys """
+  if key[-1] != "'":
+    return kwds.pop(key)
+  return kwds.pop(key) - kwds.pop(key[:-1])
+
+#-------------------------------------------------------------------------------
+def mapping_adapter(mapping, delta=False):
+  """ Compiles an argument adapter for an order or delta mapping dictionary, in 
+  which keywords are mapped to position (if int), rekeyed (if str), or dropped
+  (if None). For delta mappings, values of primed keys are differenced from
+  those of unprimed keys.
+
+  :param mapping: order or delta mapping dictionary.
+  :param delta: boolean flag to denote a delta mapping.
+
+  :return: function adapter(args, kwds) returning remapped (args, kwds), in 
+           which kwds is modified in place.
+  """
+  pop = pop_delta if delta else dict.pop
+  ops = [(key, val if type(val) is int else None, 
+          val if isinstance(val, str) else None) for key, val in mapping.items()]
+  indices = [index for _, index, _ in ops if index is not None]
+  n_args = max(indices) + 1 if indices else 0
+  positional = sorted([(index, key) for key, index, _ in ops \
+                       if index is not None])
+  pad = [None] * (positional[0][0] if positional else 0)
+  pos_keys = [key for _, key in positional]
+  rekeys = [(key, rekey) for key, index, rekey in ops if index is None]
+
+  # Ordered adapter for appending to positional arguments or colliding rekeys
+  def _adapter(args, kwds):
+    args = list(args)
+    if len(args) < n_args:
+      args += [None] * (n_args - len(args))
+    for key, index, rekey in ops:
+      value = pop(kwds, key)
+      if index is not None:
+        args[index] = value
+      elif rekey is not None:
+        kwds.update({rekey: value})
+    return args, kwds
+
+  if any([rekey in mapping for _, rekey in rekeys]):
+    return _adapter
+
+  # Otherwise positional arguments are popped directly and rekeyed
+  def _keyword_adapter(args, kwds):
+    if args:
+      return _adapter(args, kwds)
+    args = pad + [pop(kwds, key) for key in pos_keys]
+    for key, rekey in rekeys:
+      value = pop(kwds, key)
+      if rekey is not None:
+        kwds.update({rekey: value})
+    return args, kwds
+
+  return _keyword_adapter
+
 #-------------------------------------------------------------------------------
 class Expression:
   """ A expression wrapper to enable object representations as an uncallable
@@ -60,6 +120,7 @@ class Expression:
   _isscalar = None # Flag to denote uncallable scalar
   _isiconic = None # Flag to denote sympy expression
   _symbols = None  # Dict of iconic symbols used
+  _backend = None  # Numeric backend for iconic expressions (None for global)
 
   # Private
   __invertible = None
@@ -68,6 +129,7 @@ class Expression:
   __derinv = None # derivative of value with respect to inverse
   __order = None
   __delta = None
+  __adapter = None # Compiled order or delta argument adapter
 
 #-------------------------------------------------------------------------------
   def __init__(self, expr=None, *args, **kwds):
@@ -142,6 +204,10 @@ class Expression:
   def symbols(self):
     return self._symbols
 
+  @property
+  def backend(self):
+    return self._backend
+
   def set_expr(self, expr=None, *args, **kwds):
     """ Set the Func instance's function object.
 
@@ -149,11 +215,15 @@ class Expression:
     :param *args: arguments to pass onto callables
     :param **kwds: keywords to pass onto callables
 
-    Note that the following two reserved keywords are disallowed:
+    Note that the following reserved keywords are disallowed:
 
     'order': which instead denotes a dictionary of remappings.
     'delta': which instead denotes a mapping of differences.
+    'backend': which instead denotes the numeric backend used to compile
+               iconic expressions (see probayes.expr_backends).
     """
+    kwds = dict(kwds)
+    self._backend = None if 'backend' not in kwds else kwds.pop('backend')
     self._expr = expr
     self._args = tuple(args)
     self._kwds = dict(kwds)
@@ -164,6 +234,7 @@ class Expression:
     self._isiconic = None
     self.__order = None
     self.__delta = None
+    self.__adapter = None
     self.__inverse = None
     self.__invexpr = None
     self.__invderi = None
@@ -184,7 +255,8 @@ class Expression:
 
     # Non-multi iconic
     if self._isiconic:
-      self._exprs.update({None: Expr(self._expr, *self._args, **self._kwds)})
+      self._exprs.update({None: Expr(self._expr, *self._args, 
+                                     backend=self._backend, **self._kwds)})
       self._symbols.update(self._exprs[None].symbols)
       self._ismulti = self.__invertible and \
                       len(self._exprs[None].symbols) == 1
@@ -232,11 +304,13 @@ class Expression:
       if self._isiconic:
         if isinstance(self._expr, tuple):
           for i, expr in enumerate(self._expr):
-            self._exprs.update({i: Expr(expr, *self._args, **self._kwds)})
+            self._exprs.update({i: Expr(expr, *self._args,
+                                        backend=self._backend, **self._kwds)})
             self._symbols.update(self._exprs[i].symbols)
         elif isinstance(self._expr, dict):
           for key, val in self._expr.items():
-            self._exprs.update({key: Expr(val, *self._args, **self._kwds)})
+            self._exprs.update({key: Expr(val, *self._args,
+                                          backend=self._backend, **self._kwds)})
             self._symbols.update(self._exprs[key].symbols)
     if 'order' in self._kwds:
       self.set_order(self._kwds.pop('order'))
@@ -252,10 +326,11 @@ class Expression:
     """
     self.__order = order
     if self.__order is None:
-      return
+      return self._set_adapter()
     assert self.__delta is None, "Cannot set both order and delta"
     assert not self.isiconic, "Cannot set order when using symbols"
     self._check_mapping(self.__order)
+    self._set_adapter()
 
 #-------------------------------------------------------------------------------
   def set_delta(self, delta=None):
@@ -264,10 +339,21 @@ class Expression:
     """
     self.__delta = delta
     if self.__delta is None:
-      return
+      return self._set_adapter()
     assert self.__order is None, "Cannot set both order and delta"
     assert not self.isiconic, "Cannot set delta when using symbols"
     self._check_mapping(self.__delta)
+    self._set_adapter()
+
+#-------------------------------------------------------------------------------
+  def _set_adapter(self):
+    """ Compiles the argument adapter for the order or delta mapping once so
+    that calls only route arguments (see mapping_adapter()) """
+    self.__adapter = None
+    if self.__order:
+      self.__adapter = mapping_adapter(self.__order)
+    elif self.__delta:
+      self.__adapter = mapping_adapter(self.__delta, delta=True)
 
 #-------------------------------------------------------------------------------
   def _check_mapping(self, mapping=None):
@@ -391,7 +477,7 @@ class Expression:
     #argsmid = args; kwdsmid = kwds; import pdb; pdb.set_trace() # debugging
 
     # Callables with neither order nor delta are straightforwards
-    if not self.__order and not self.__delta:
+    if self.__adapter is None:
       if self._islambda and hasattr(expr, '__code__') and \
           not expr.__code__.co_argcount: # Allow argument-free lambdas
         assert not len(args), \
@@ -402,47 +488,8 @@ class Expression:
       else:
         return expr(dict(kwds))
 
-    # Append None to args according to mapping index specification
-    n_args = len(args)
-    mapping = self.__order or self.__delta
-    for val in mapping.values():
-      if type(val) is int:
-        n_args = max(n_args, val+1)
-    args = list(args)
-    while len(args) < n_args:
-      args.append(None)
-
-    # Callables with order wrapper
-    if self.__order:
-      for key, val in self.__order.items():
-        if type(val) is int:
-          args[val] = kwds.pop(key)
-        elif val is None:
-          kwds.pop(key)
-        elif isinstance(val, str):
-          kwds.update({val: kwds.pop(key)})
-        else:
-          raise TypeError("Unrecognised order key: val type: {}:{}".\
-                          format(key, val))
-      return expr(*tuple(args), **kwds)
-
-    # Callables with delta wrapper
-    for key, val in self.__delta.items():
-      if key[-1] != "'":
-        value = kwds.pop(key)
-      else:
-        value = kwds.pop(key) - kwds.pop(key[:-1])
-      if type(val) is int:
-        args[val] = value
-      elif val is None:
-        pass
-      elif isinstance(val, str):
-        kwds.update({val: value})
-      else:
-        raise TypeError("Unrecognised delta key: val type: {}:{}".\
-                        format(key, val))
-
-    #argsout = args; kwdsout = kwds; import pdb; pdb.set_trace() # debugging
+    # Callables with order or delta wrapper
+    args, kwds = self.__adapter(args, kwds)
     return expr(*tuple(args), **kwds)
 
 #-------------------------------------------------------------------------------
@@ -0,0 +1,136 @@
+# Utility module for log-space factors of discrete variables, each represented
+# as a tuple (keys, logp) where logp is an array with axes ordered by keys.
+
+#-------------------------------------------------------------------------------
+import collections
+import numpy as np
+from probayes.dist import Dist
+from probayes.pscales import rescale
+from probayes.constants import NEARLY_POSITIVE_ZERO
+from probayes.sd_utils import plan_factors
+
+#-------------------------------------------------------------------------------
+LOG_FLOOR = np.log(NEARLY_POSITIVE_ZERO) # Floor for factor log-probabilities
+
+#-------------------------------------------------------------------------------
+def log_sum_exp(logp, axis=None, keepdims=False):
+  """ Returns log(sum(exp(logp))) along axis, robust to all -inf slices """
+  logp_max = np.max(logp, axis=axis, keepdims=True)
+  logp_max = np.where(np.isfinite(logp_max), logp_max, 0.)
+  with np.errstate(divide='ignore'):
+    summed = np.log(np.sum(np.exp(logp - logp_max), axis=axis,
+                           keepdims=keepdims))
+  if not keepdims:
+    logp_max = np.squeeze(logp_max, axis=axis)
+  return summed + logp_max
+
+#-------------------------------------------------------------------------------
+def factor_align(factor, keys):
+  """ Returns the logp of factor with axes broadcastable to ordered keys """
+  fkeys, logp = factor
+  order = [fkeys.index(key) for key in keys if key in fkeys]
+  logp = np.transpose(logp, order)
+  shape = list(logp.shape)
+  for i, key in enumerate(keys):
+    if key not in fkeys:
+      shape.insert(i, 1)
+  return logp.reshape(shape)
+
+#-------------------------------------------------------------------------------
+def factor_product(*factors):
+  """ Returns the product of factors (i.e. sum of log-probabilities) """
+  keys = []
+  for fkeys, _ in factors:
+    keys += [key for key in fkeys if key not in keys]
+  keys = tuple(keys)
+  logp = 0.
+  for factor in factors:
+    logp = logp + factor_align(factor, keys)
+  return keys, np.array(logp, dtype=float)
+
+#-------------------------------------------------------------------------------
+def factor_marginal(factor, keys, maximise=False):
+  """ Returns factor marginalised (or maximised) onto keys in factor order """
+  fkeys, logp = factor
+  axes = tuple(i for i, key in enumerate(fkeys) if key not in keys)
+  if not axes:
+    return factor
+  logp = np.max(logp, axis=axes) if maximise else log_sum_exp(logp, axes)
+  return tuple(key for key in fkeys if key in keys), logp
+
+#-------------------------------------------------------------------------------
+def factor_reduce(factor, index):
+  """ Returns factor reduced by indices given in dictionary index """
+  fkeys, logp = factor
+  slices = tuple(index.get(key, slice(None)) for key in fkeys)
+  return tuple(key for key in fkeys if key not in index), logp[slices]
+
+#-------------------------------------------------------------------------------
+def factor_normalise(factor):
+  """ Returns factor normalised in log-space with the log normaliser """
+  fkeys, logp = factor
+  log_norm = log_sum_exp(logp)
+  assert np.isfinite(log_norm), \
+      "Cannot normalise factor over {} with log normaliser {}".format(
+          fkeys, log_norm)
+  return (fkeys, logp - log_norm), float(log_norm)
+
+#-------------------------------------------------------------------------------
+def factor_dist(factor, vals, cond=None, pscale=None):
+  """ Returns a Dist of factor with values vals keyed by variable name.
+
+  :param factor: tuple (keys, logp).
+  :param vals: dictionary of 1-D arrays of values keyed by variable name.
+  :param cond: optional dictionary of conditioning scalar values.
+  :param pscale: probability scale of the returned Dist.
+  """
+  fkeys, logp = factor
+  cond = cond or {}
+  name = ','.join(fkeys)
+  if cond:
+    name += "|{}".format(','.join(cond.keys()))
+  dist_vals = collections.OrderedDict()
+  dims = collections.OrderedDict()
+  for i, key in enumerate(fkeys):
+    dist_vals.update({key: np.asarray(vals[key])})
+    dims.update({key: i})
+  for key, val in cond.items():
+    dist_vals.update({key: val})
+    dims.update({key: None})
+  return Dist(name, dist_vals, dims, rescale(logp, 'log', pscale), pscale)
+
+#-------------------------------------------------------------------------------
+def dist_factor(dist):
+  """ Returns a tuple (factor, vals) comprising the log-space factor of the
+  non-singleton variables of Dist dist and an OrderedDict of their 1-D values.
+  Singleton (e.g. observed) variables are excluded. """
+  keys = [key for key in dist.dims.keys() if dist.dims[key] is not None]
+  keys = sorted(keys, key=lambda key: dist.dims[key])
+  assert len(set(dist.dims[key] for key in keys)) == len(keys), \
+      "Shared dimensions unsupported in distribution {}".format(dist.name)
+  vals = collections.OrderedDict([(key, np.ravel(dist.vals[key]))
+                                  for key in keys])
+  logp = np.array(rescale(dist.prob, dist.ret_pscale(), 'log'), dtype=float)
+  logp = logp.reshape([len(val) for val in vals.values()])
+  return (tuple(keys), logp), vals
+
+#-------------------------------------------------------------------------------
+def eval_factors(arg, values=None, **kwds):
+  """ Returns a tuple (factors, vals) of log-space factors and OrderedDict of
+  their 1-D values from arg, which may be a Dist of (log-)probabilities over
+  grid values, an SD with discrete conditional probability tables (see
+  SD.compile_plan()) if values is None, or an RV/RF/SD evaluated over values
+  with optional keywords kwds (singleton or iid variables are excluded). """
+  if isinstance(arg, Dist):
+    factor, vals = dist_factor(arg)
+    return [factor], vals
+  if hasattr(arg, 'compile_plan') and values is None:
+    return plan_factors(arg.compile_plan())
+  keys = arg.keylist if hasattr(arg, 'keylist') else [arg.name]
+  sub_values = None if values is None else \
+               {key: values[key] for key in keys if key in values}
+  dist = arg(sub_values, **kwds) if sub_values else arg(**kwds)
+  factor, vals = dist_factor(dist)
+  return [factor], vals
+
+#-------------------------------------------------------------------------------
@@ -13,6 +13,7 @@ from probayes.vtypes import isscalar, isunitsetint, issingleton, isdimensionless
 from probayes.pscales import real_sqrt
 from probayes.expression import Expression
 from probayes.manifold import Manifold
+from probayes.rng import eval_rng, get_rng, rng_method
 
 NX_UNDIRECTED_GRAPH = nx.OrderedGraph
 
@@ -42,6 +43,7 @@ class Field (NX_UNDIRECTED_GRAPH):
   _leafs = None      # Field of Variables that do not condition others (for SD)
   _roots = None      # Field of Vairables not dependent on others (for SD)
   _stems = None      # OrderedDict of latent Variables (for Dependencies)
+  _rng = None        # Random generator (None defers to get_rng())
 
 #-------------------------------------------------------------------------------
   def __init__(self, *args): # over-rides NX_GRAPH.__init__()
@@ -191,6 +193,17 @@ class Field (NX_UNDIRECTED_GRAPH):
       self._delta_type = self._Delta
     self.eval_length()
 
+#-------------------------------------------------------------------------------
+  @property
+  def rng(self):
+    return self._rng
+
+  def set_rng(self, rng=None, bit_generator=None):
+    """ Sets the random generator used when sampling this field, which applies
+    to all variables that have no generator of their own (see eval_rng). """
+    self._rng = eval_rng(rng, bit_generator)
+    return self._rng
+
 #-------------------------------------------------------------------------------
   @property
   def delta(self):
@@ -361,6 +374,7 @@ class Field (NX_UNDIRECTED_GRAPH):
     return dist_name
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def evaluate(self, *args, _skip_parsing=False, min_dim=0, **kwds):
     """ 
     Keep args and kwds since could be called externally. This ignores self._prob.
@@ -435,6 +449,7 @@ class Field (NX_UNDIRECTED_GRAPH):
     return vals, dims
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def eval_delta(self, delta=None):
 
     # Handle native delta types within Variable deltas
@@ -482,7 +497,7 @@ class Field (NX_UNDIRECTED_GRAPH):
     rss = real_sqrt(np.sum(np.array(list(spherise.values()))**2))
     if self._delta_kwds['scale']:
       delta *= rss
-    deltas = np.random.uniform(-delta, delta, size=len(spherise))
+    deltas = get_rng(self._rng).uniform(-delta, delta, size=len(spherise))
     rss_deltas = real_sqrt(np.sum(deltas ** 2.))
     deltas = (deltas * delta) / rss_deltas
     delta_dict = collections.OrderedDict()
@@ -500,6 +515,7 @@ class Field (NX_UNDIRECTED_GRAPH):
     return delta
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def apply_delta(self, values, delta=None):
     delta = delta or self._delta
     if delta is None:
@@ -521,6 +537,7 @@ class Field (NX_UNDIRECTED_GRAPH):
     return vals
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def eval_step(self, pred_vals, succ_vals, reverse=False):
     """ Returns adjusted succ_vals """
 
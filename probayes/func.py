@@ -7,10 +7,12 @@ making also a disallowed keyword.
 
 Func may be a tuple of callable/uncallable functions
 '''
-import numpy as np
-import scipy.stats
 import collections
-from probayes.vtypes import isscalar, isunitary
+import functools
+from probayes.vtypes import isscalar
+from probayes.stats_types import scipy_stats_types
+from probayes.expression import mapping_adapter
+from probayes.mvar_utils import mvn_factor, mvar_eval
 
 #-------------------------------------------------------------------------------
 """ 
@@ -22,12 +24,13 @@ func[2]() cdf
 func[3]() logcdf
 func[4]() rvs
 """
-SCIPY_STATS_MVAR = {scipy.stats._multivariate.multi_rv_generic}
+
+SCIPY_METHODS = ['pdf', 'logpdf', 'cdf', 'logcdf', 'rvs']
 
 #------------------------------------------------------------------------------- 
-def is_scipy_stats_mvar(arg, scipy_stats_mvar=SCIPY_STATS_MVAR):
+def is_scipy_stats_mvar(arg):
   """ Returns a boolean for whether arg is an instance of scipy multivariate """
-  return isinstance(arg, tuple(scipy_stats_mvar))
+  return isinstance(arg, scipy_stats_types('mvar'))
 
 #-------------------------------------------------------------------------------
 class Func:
@@ -61,9 +64,10 @@ class Func:
   __callable = None
   __scipyobj = None
   __scipycalls = None
+  __mvn = None # Cached Cholesky factorisation of scipy mvar normals
   __order = None
   __delta = None
-  __index = None
+  __adapter = None # Compiled order or delta argument adapter
 
 #-------------------------------------------------------------------------------
   def __init__(self, func=None, *args, **kwds):
@@ -93,8 +97,10 @@ class Func:
     self._kwds = dict(kwds)
     self.__order = None
     self.__delta = None
+    self.__adapter = None
     self.__callable = None
     self.__scipyobj = None
+    self.__mvn = None
     self.__isscipy = False
 
     # Sanity check func
@@ -122,6 +128,7 @@ class Func:
     if is_scipy_stats_mvar(self._func):
       self.__isscipy = True
       self.__scipyobj = self._func(*args, **kwds)
+      self.__mvn = mvn_factor(self.__scipyobj)
       self.__scipycalls = {
                            0: self.__scipyobj.pdf,
                            1: self.__scipyobj.logpdf,
@@ -141,11 +148,12 @@ class Func:
     """
     self.__order = order
     if self.__order is None:
-      return
+      return self._set_adapter()
     assert self.__delta is None, "Cannot set both order and delta"
     assert self.__scipyobj is None, \
         "Optional 'order' keyword prohibited for scipy objectts"
     self._check_mapping(self.__order)
+    self._set_adapter()
 
 #-------------------------------------------------------------------------------
   def set_delta(self, delta=None):
@@ -154,11 +162,22 @@ class Func:
     """
     self.__delta = delta
     if self.__delta is None:
-      return
+      return self._set_adapter()
     assert self.__order is None, "Cannot set both order and delta"
     assert self.__scipyobj is None, \
         "Optional 'delta' keyword prohibited for scipy objectts"
     self._check_mapping(self.__delta)
+    self._set_adapter()
+
+#-------------------------------------------------------------------------------
+  def _set_adapter(self):
+    """ Compiles the argument adapter for the order or delta mapping once so
+    that calls only route arguments (see mapping_adapter()) """
+    self.__adapter = None
+    if self.__order:
+      self.__adapter = mapping_adapter(self.__order)
+    elif self.__delta:
+      self.__adapter = mapping_adapter(self.__delta, delta=True)
 
 #-------------------------------------------------------------------------------
   def _check_mapping(self, mapping=None):
@@ -240,6 +259,13 @@ class Func:
     """ Private call used by the wrapped Func interface.
     (see __call__ and __getitem__).
     """
+    return self._call_index(None, *args, **kwds)
+
+#-------------------------------------------------------------------------------
+  def _call_index(self, index, *args, **kwds):
+    """ Private call to the function indexed by index (None if unindexed),
+    which is passed explicitly rather than stored to keep calls reentrant.
+    """
 
     """
     # For debugging:
@@ -249,13 +275,10 @@ class Func:
 
     # Handle scipy objects separately
     if self.__isscipy:
-      return self._call_scipy(*args, **kwds)
+      return self._call_scipy(index, *args, **kwds)
 
-    # Check for indexing and reset if necessary
-    func = self._func
-    if self.__index is not None:
-      func = func[self.__index]
-      self.__index = None
+    # Check for indexing
+    func = self._func if index is None else self._func[index]
 
     # Non-callables
     if not self.__callable:
@@ -269,7 +292,7 @@ class Func:
       args = tuple(list(self._args) + list(args))
     if self._kwds:
       kwds = {**kwds, **self._kwds}
-    if not self.__order and not self.__delta:
+    if self.__adapter is None:
 
       """
       # For debugging:
@@ -280,69 +303,25 @@ class Func:
 
       return func(*args, **kwds)
 
-    # Append None to args according to mapping index specification
-    n_args = len(args)
-    mapping = self.__order or self.__delta
-    for val in mapping.values():
-      if type(val) is int:
-        n_args = max(n_args, val+1)
-    args = list(args)
-    while len(args) < n_args:
-      args.append(None)
-
-    # Callables with order wrapper
-    if self.__order:
-      for key, val in self.__order.items():
-        if type(val) is int:
-          args[val] = kwds.pop(key)
-        elif val is None:
-          kwds.pop(key)
-        elif isinstance(val, str):
-          kwds.update({val: kwds.pop(key)})
-        else:
-          raise TypeError("Unrecognised order key: val type: {}:{}".\
-                          format(key, val))
-      return func(*tuple(args), **kwds)
-
-    # Callables with delta wrapper
-    for key, val in self.__delta.items():
-      if key[-1] != "'":
-        value = kwds.pop(key)
-      else:
-        value = kwds.pop(key) - kwds.pop(key[:-1])
-      if type(val) is int:
-        args[val] = value
-      elif val is None:
-        pass
-      elif isinstance(val, str):
-        kwds.update({val: value})
-      else:
-        raise TypeError("Unrecognised delta key: val type: {}:{}".\
-                        format(key, val))
+    # Callables with order or delta wrapper
+    args, kwds = self.__adapter(args, kwds)
     return func(*tuple(args), **kwds)
 
 #-------------------------------------------------------------------------------
-  def _call_scipy(self, *args, **kwds):
+  def _call_scipy(self, index, *args, **kwds):
     """ Private call used by the wrapped Func interface for scipy objects.
     (see __call__ and __getitem__).
     """
-    index = 0
-    if self.__index is not None:
-      index = self.__index
-      self.__index = None
+    index = 0 if index is None else index
     if index < 4:
       if len(args) == 1 and isinstance(args[0], dict):
-        args = [np.ravel(val) for val in args[0].values()]
+        args = list(args[0].values())
       elif not len(args) and len(kwds):
         args = list(collections.OrderedDict(**kwds).values())
         kwds = {}
-      if isinstance(args, list) and not np.all([isunitary(arg) for arg in args]):
-        args = args[::-1]
-        if len(args) > 2:
-          args = args[1:] + [args[0]]
-        args = tuple(args)
-      return self.__scipycalls[index](np.stack(np.meshgrid(*args), axis=-1), 
-                                      **kwds)
+      if isinstance(args, list) or len(args) > 1: # values per dimension
+        return mvar_eval(self.__scipyobj, args, SCIPY_METHODS[index],
+                         factor=self.__mvn)
     return self.__scipycalls[index](*args, **kwds)
 
 #-------------------------------------------------------------------------------
@@ -361,8 +340,7 @@ class Func:
      return self._func
    assert self.__ismulti or self.__isscipy, \
      "Cannot index without single func, use Func()"
-   self.__index = spec
-   return self._call
+   return functools.partial(self._call_index, spec)
 
 #-------------------------------------------------------------------------------
   def __len__(self):
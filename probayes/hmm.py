@@ -0,0 +1,334 @@
+"""
+A hidden Markov model pairs a discrete state RV, whose transitional conditional
+p(x'|x) is specified by RV.set_tran(), with an emission probability p(y|x) of
+observations y. For a sequence of T observations of K states, forward-backward
+evaluates the posterior p(x_t|y_1, ..., y_T) of every time step and Viterbi
+evaluates the maximum a posteriori state path, each in O(T*K^2) operations
+vectorised over K states and over many sequences of equal length (batches).
+
+Forward-backward may be performed either in log-space or by scaling forward
+and backward messages to unit sum at each time step, where the log-evidence
+log p(y_1, ..., y_T) is given by the sum of the logarithms of the scalings.
+"""
+#-------------------------------------------------------------------------------
+import collections
+import numpy as np
+from probayes.dist import Dist
+from probayes.vtypes import VTYPES
+from probayes.pscales import rescale
+from probayes.factor_utils import log_sum_exp
+
+#-------------------------------------------------------------------------------
+HMM_METHODS = {'log', 'scaled'}
+DEFAULT_HMM_METHOD = 'scaled'
+
+#-------------------------------------------------------------------------------
+class HMM:
+  """ A hidden Markov model of a discrete state RV with transitional
+  probabilities emitting observations.
+
+  :example:
+  >>> import numpy as np
+  >>> import probayes as pb
+  >>> x = pb.RV('x', vtype=int, vset=[0, 1])
+  >>> x.set_tran(np.array([[0.9, 0.2], [0.1, 0.8]])) # p(x'|x) as [x', x]
+  >>> y = pb.RV('y', vtype=float, vset=[-10., 10.])
+  >>> yx = y | x
+  >>> yx.set_prob(lambda y, x: np.exp(-0.5 * (y - x)**2) / np.sqrt(2.*np.pi))
+  >>> hmm = pb.HMM(x, yx)
+  >>> post, log_evid = hmm.forward_backward({'y': obs})
+  >>> path, log_prob = hmm.viterbi({'y': obs})
+  """
+
+  # Protected
+  _state = None    # Discrete state RV
+  _emit = None     # Emission RF/SD or callable
+  _obs_keys = None # List of observation keys
+  _vals = None     # Array of state values in vset order
+  _log_init = None # Initial log-probabilities of states
+  _log_tran = None # Transition log-probabilities as [successor, predecessor]
+
+  # Private
+  __emit_pscale = None # Probability scale of emission probabilities
+
+#-------------------------------------------------------------------------------
+  def __init__(self, state, emit, init=None, pscale=None):
+    """ Initialises the HMM.
+
+    :param state: discrete state RV with a transitional set by set_tran().
+    :param emit: emission RF or SD of observation RVs and the state RV, whose
+                 probability is evaluated over all observations and states, or
+                 a callable emit(obs, state) returning broadcast probabilities.
+    :param init: optional initial state probabilities (default state prob).
+    :param pscale: probability scale of init and callable emit outputs.
+    """
+    self._state = state
+    assert self._state.vtype not in VTYPES[float], \
+        "Hidden states must be discrete, not {}".format(self._state.vtype)
+    assert self._state.tran is not None, \
+        "State transitional unspecified; use RV.set_tran()"
+    self._vals = np.array(self._state.vset)
+    self._set_tran()
+    self._set_emit(emit, pscale)
+    self.set_init(init, pscale)
+
+#-------------------------------------------------------------------------------
+  @property
+  def state(self):
+    return self._state
+
+  @property
+  def emit(self):
+    return self._emit
+
+  @property
+  def obs_keys(self):
+    return self._obs_keys
+
+  @property
+  def vals(self):
+    return self._vals
+
+  @property
+  def log_init(self):
+    return self._log_init
+
+  @property
+  def log_tran(self):
+    return self._log_tran
+
+#-------------------------------------------------------------------------------
+  def _set_tran(self):
+    """ Tabulates the state transitional as log-probabilities [succ, pred] over
+    state values using RV.eval_tran(), normalising callable transitionals over
+    successor states """
+    tran = self._state.tran
+    name = self._state.name
+    assert tran.callable or not tran.isscalar, \
+        "Transition matrix or callable required"
+    vals = {name: self._vals.reshape([1, -1]),
+            name+"'": self._vals.reshape([-1, 1])}
+    prob = self._state.eval_tran(vals)
+    prob = np.broadcast_to(prob, [len(self._vals)] * 2)
+    log_tran = rescale(np.array(prob, dtype=float), self._state.pscale, 'log')
+    if tran.callable:
+      log_tran = log_tran - log_sum_exp(log_tran, axis=0, keepdims=True)
+    self._log_tran = log_tran
+
+#-------------------------------------------------------------------------------
+  def _set_emit(self, emit, pscale=None):
+    """ Sets the emission RF/SD or callable with its probability scale """
+    self._emit = emit
+    if hasattr(self._emit, 'keylist'):
+      assert self._state.name in self._emit.keylist, \
+          "State {} absent from emission keys {}".format(
+              self._state.name, self._emit.keylist)
+      self._obs_keys = [key for key in self._emit.keylist
+                        if key != self._state.name]
+      self.__emit_pscale = self._emit.pscale
+    else:
+      assert callable(self._emit), \
+          "Emission must be an RF, SD, or callable, not {}".format(
+              type(self._emit))
+      self._obs_keys = None
+      self.__emit_pscale = 1. if pscale is None else pscale
+
+#-------------------------------------------------------------------------------
+  def set_init(self, init=None, pscale=None):
+    """ Sets initial state probabilities (default evaluated state prob) """
+    if init is None:
+      init = self._state.eval_prob(self._vals)
+      pscale = self._state.pscale
+    pscale = 1. if pscale is None else pscale
+    log_init = rescale(np.array(np.broadcast_to(init, self._vals.shape),
+                                dtype=float), pscale, 'log')
+    self._log_init = log_init - log_sum_exp(log_init)
+
+#-------------------------------------------------------------------------------
+  def log_emission(self, obs):
+    """ Returns a tuple (obs, log_emit) of observations and log-emission
+    probabilities of shape (batches, time steps, states), where obs is a
+    dictionary of arrays of shape (time steps,) or (batches, time steps) keyed
+    by observation name, or such an array for a single observation RV or a
+    callable emission. """
+    if self._obs_keys is None or not isinstance(obs, dict):
+      assert self._obs_keys is None or len(self._obs_keys) == 1, \
+          "Dictionary of observations required for keys {}".format(
+              self._obs_keys)
+      key = 'obs' if self._obs_keys is None else self._obs_keys[0]
+      obs = {key: obs}
+    obs = collections.OrderedDict([(key, np.asarray(val))
+                                   for key, val in obs.items()])
+    ndims = set(val.ndim for val in obs.values())
+    assert len(ndims) == 1 and list(ndims)[0] in [1, 2], \
+        "Observations must share 1 or 2 dimensions, not {}".format(ndims)
+    state = self._vals.reshape([1, 1, -1])
+    values = collections.OrderedDict(
+        [(key, np.atleast_2d(val)[..., None]) for key, val in obs.items()])
+    if self._obs_keys is None:
+      prob = self._emit(values['obs'], state)
+    else:
+      values.update({self._state.name: state})
+      prob = self._emit.eval_prob(values)
+    shape = np.broadcast_shapes(state.shape,
+                                *[val.shape for val in values.values()])
+    prob = np.array(np.broadcast_to(prob, shape), dtype=float)
+    return obs, rescale(prob, self.__emit_pscale, 'log')
+
+#-------------------------------------------------------------------------------
+  def _forward_log(self, log_emit):
+    """ Returns unnormalised log-space forward messages """
+    log_alpha = np.empty_like(log_emit)
+    log_alpha[:, 0] = self._log_init + log_emit[:, 0]
+    for t in range(1, log_emit.shape[1]):
+      log_alpha[:, t] = log_emit[:, t] + log_sum_exp(
+          log_alpha[:, t-1, None, :] + self._log_tran, axis=-1)
+    return log_alpha
+
+#-------------------------------------------------------------------------------
+  def _backward_log(self, log_emit):
+    """ Returns log-space backward messages """
+    log_beta = np.zeros_like(log_emit)
+    for t in range(log_emit.shape[1] - 2, -1, -1):
+      log_beta[:, t] = log_sum_exp(
+          (log_emit[:, t+1] + log_beta[:, t+1])[:, :, None] + self._log_tran,
+          axis=1)
+    return log_beta
+
+#-------------------------------------------------------------------------------
+  def _forward_scaled(self, log_emit):
+    """ Returns forward messages scaled to unit sum and the log-scalings """
+    log_max = np.max(log_emit, axis=-1, keepdims=True)
+    emit = np.exp(log_emit - log_max)
+    tran_T = np.exp(self._log_tran).T
+    alpha = np.empty_like(emit)
+    scale = np.empty(emit.shape[:2], dtype=float)
+    alpha[:, 0] = np.exp(self._log_init) * emit[:, 0]
+    for t in range(emit.shape[1]):
+      if t:
+        alpha[:, t] = emit[:, t] * alpha[:, t-1].dot(tran_T)
+      scale[:, t] = np.sum(alpha[:, t], axis=-1)
+      alpha[:, t] /= scale[:, t, None]
+    with np.errstate(divide='ignore'):
+      log_scale = np.log(scale) + log_max[..., 0]
+    return alpha, emit, scale, log_scale
+
+#-------------------------------------------------------------------------------
+  def _backward_scaled(self, emit, scale):
+    """ Returns backward messages scaled by the forward scalings """
+    tran = np.exp(self._log_tran)
+    beta = np.ones_like(emit)
+    for t in range(emit.shape[1] - 2, -1, -1):
+      beta[:, t] = (emit[:, t+1] * beta[:, t+1]).dot(tran) / scale[:, t+1, None]
+    return beta
+
+#-------------------------------------------------------------------------------
+  def _dists(self, obs, logp, pscale=None):
+    """ Returns a list of Dists of state log-probabilities logp per time step.
+    Batched observations share the first dimension and states the second. """
+    name = "{}|{}".format(self._state.name, ','.join(obs.keys()))
+    batched = list(obs.values())[0].ndim == 2
+    dists = [None] * logp.shape[1]
+    for t in range(logp.shape[1]):
+      prob = rescale(logp[:, t] if batched else logp[0, t], 'log', pscale)
+      vals = collections.OrderedDict()
+      dims = collections.OrderedDict()
+      if batched:
+        for key, val in obs.items():
+          vals.update({key: val[:, t]})
+          dims.update({key: 0})
+      vals.update({self._state.name: self._vals})
+      dims.update({self._state.name: int(batched)})
+      dists[t] = Dist(name, vals, dims, prob, pscale)
+    return dists
+
+#-------------------------------------------------------------------------------
+  def _eval_method(self, method=None):
+    method = DEFAULT_HMM_METHOD if method is None else method
+    assert method in HMM_METHODS, \
+        "Unknown method {}; available: {}".format(method, HMM_METHODS)
+    return method
+
+#-------------------------------------------------------------------------------
+  def filter(self, obs, method=None, pscale=None):
+    """ Returns filtering distributions p(x_t|y_1, ..., y_t) by a forward pass.
+
+    :param obs: observations (see log_emission()).
+    :param method: 'log' for log-space or 'scaled' for scaled messages.
+    :param pscale: probability scale of the returned Dists.
+
+    :return: a tuple of a list of Dists per time step and the log-evidence
+             (an array over batches for batched observations).
+    """
+    obs, log_emit = self.log_emission(obs)
+    if self._eval_method(method) == 'log':
+      log_alpha = self._forward_log(log_emit)
+      log_norm = log_sum_exp(log_alpha, axis=-1, keepdims=True)
+      logp = log_alpha - log_norm
+      log_evid = log_norm[:, -1, 0]
+    else:
+      alpha, _, _, log_scale = self._forward_scaled(log_emit)
+      with np.errstate(divide='ignore'):
+        logp = np.log(alpha)
+      log_evid = np.sum(log_scale, axis=-1)
+    batched = list(obs.values())[0].ndim == 2
+    return self._dists(obs, logp, pscale), \
+           log_evid if batched else float(log_evid[0])
+
+#-------------------------------------------------------------------------------
+  def forward_backward(self, obs, method=None, pscale=None):
+    """ Returns smoothing distributions p(x_t|y_1, ..., y_T) by forward-backward
+    message passing.
+
+    :param obs: observations (see log_emission()).
+    :param method: 'log' for log-space or 'scaled' for scaled messages.
+    :param pscale: probability scale of the returned Dists.
+
+    :return: a tuple of a list of Dists per time step and the log-evidence
+             (an array over batches for batched observations).
+    """
+    obs, log_emit = self.log_emission(obs)
+    if self._eval_method(method) == 'log':
+      log_alpha = self._forward_log(log_emit)
+      log_beta = self._backward_log(log_emit)
+      log_evid = log_sum_exp(log_alpha[:, -1], axis=-1)
+      logp = log_alpha + log_beta - log_evid[:, None, None]
+    else:
+      alpha, emit, scale, log_scale = self._forward_scaled(log_emit)
+      beta = self._backward_scaled(emit, scale)
+      with np.errstate(divide='ignore'):
+        logp = np.log(alpha * beta)
+      log_evid = np.sum(log_scale, axis=-1)
+    batched = list(obs.values())[0].ndim == 2
+    return self._dists(obs, logp, pscale), \
+           log_evid if batched else float(log_evid[0])
+
+#-------------------------------------------------------------------------------
+  def viterbi(self, obs):
+    """ Returns the maximum a posteriori state path by the Viterbi algorithm.
+
+    :param obs: observations (see log_emission()).
+
+    :return: a tuple of the state path of shape (time steps,) or (batches,
+             time steps) for batched observations, and the joint
+             log-probability of path and observations.
+    """
+    obs, log_emit = self.log_emission(obs)
+    n_batch, n_steps, _ = log_emit.shape
+    delta = self._log_init + log_emit[:, 0]
+    psi = np.zeros(log_emit.shape, dtype=int)
+    for t in range(1, n_steps):
+      cand = delta[:, None, :] + self._log_tran
+      psi[:, t] = np.argmax(cand, axis=-1)
+      delta = log_emit[:, t] + np.max(cand, axis=-1)
+    index = np.empty([n_batch, n_steps], dtype=int)
+    index[:, -1] = np.argmax(delta, axis=-1)
+    batch = np.arange(n_batch)
+    for t in range(n_steps - 1, 0, -1):
+      index[:, t-1] = psi[batch, t, index[:, t]]
+    log_prob = np.max(delta, axis=-1)
+    if list(obs.values())[0].ndim == 2:
+      return self._vals[index], log_prob
+    return self._vals[index[0]], float(log_prob[0])
+
+#-------------------------------------------------------------------------------
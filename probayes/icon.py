@@ -2,7 +2,15 @@
 
 #-------------------------------------------------------------------------------
 import sympy
-import sympy.stats
+
+#-------------------------------------------------------------------------------
+SYMPY_SPECIALS = {'__sympy__'} # Special attributes delegated to SymPy objects
+
+#-------------------------------------------------------------------------------
+def isspecial(name, delegated=SYMPY_SPECIALS):
+  """ Returns whether attribute name is special and not delegated """
+  return name.startswith('__') and name.endswith('__') and \
+         name not in delegated
 
 #-------------------------------------------------------------------------------
 def isiconic(var):
@@ -27,8 +35,8 @@ class Icon:
   object derived from sym
   . Sympy's dependence on __new__ 
   to return modified class objects at instantiation is makes multiple
-  inheritance tricky so instead we wrap them in here as a class and copy over 
-  the attributes.
+  inheritance tricky so instead we wrap them in here as a class and delegate
+  attribute access to the wrapped object.
 
   The resulting instance can be treated as a SymPy object using the __invert__
   method (~instance):
@@ -67,15 +75,13 @@ class Icon:
     else:
       raise TypeError("Symbol name must be string; {} entered".format(self._icon))
 
-    # Copy attributes and hash content
-    members = dir(self._icon)
-    for member in members:
-      if not hasattr(self, member):
-        try:
-          attribute = getattr(self._icon, member)
-          setattr(self, member, attribute)
-        except AttributeError:
-          pass
+#-------------------------------------------------------------------------------
+  def __getattr__(self, name):
+    """ Delegates (non-special) attributes not found to the icon object """
+    if self._icon is None or isspecial(name):
+      raise AttributeError("'{}' object has no attribute '{}'".format(
+                           type(self).__name__, name))
+    return getattr(self._icon, name)
 
 #-------------------------------------------------------------------------------
   def __repr__(self):
@@ -0,0 +1,269 @@
+"""
+Exact inference over discrete variables from log-space factors (see
+factor_utils.py). A greedy elimination order (min-fill or min-degree) of the
+interaction graph defines the cliques of a junction tree, whose potentials are
+calibrated by two-pass sum-product message passing. Calibrated beliefs are
+cached by evidence so that repeated queries reuse them. Queries not contained
+within a single clique are answered by variable elimination.
+"""
+#-------------------------------------------------------------------------------
+import collections
+import numpy as np
+import networkx as nx
+from probayes.sd_utils import value_index
+from probayes.factor_utils import factor_product, factor_marginal, \
+                                  factor_normalise, factor_align, log_sum_exp
+
+#-------------------------------------------------------------------------------
+DEFAULT_HEURISTIC = 'min_fill'
+ELIM_HEURISTICS = {'min_fill', 'min_degree'}
+DEFAULT_CALIBRATION_CACHE = 16 # Maximum number of cached calibrations
+
+#-------------------------------------------------------------------------------
+def interaction_graph(scopes):
+  """ Returns an OrderedDict of neighbour sets keyed by variable for scopes """
+  nbrs = collections.OrderedDict()
+  for scope in scopes:
+    for key in scope:
+      if key not in nbrs:
+        nbrs.update({key: set()})
+      nbrs[key].update(scope)
+  for key in nbrs.keys():
+    nbrs[key].discard(key)
+  return nbrs
+
+#-------------------------------------------------------------------------------
+def elim_order(scopes, heuristic=DEFAULT_HEURISTIC, keys=None):
+  """ Returns a greedy elimination order for keys (default all variables)
+  among the scopes of factors according to the heuristic ('min_fill' for the
+  fewest fill-in edges, 'min_degree' for the fewest neighbours). """
+  assert heuristic in ELIM_HEURISTICS, \
+      "Unknown heuristic {}; available: {}".format(heuristic, ELIM_HEURISTICS)
+  nbrs = interaction_graph(scopes)
+  remaining = [key for key in nbrs.keys() if keys is None or key in keys]
+  def _cost(key):
+    if heuristic == 'min_degree':
+      return len(nbrs[key])
+    key_nbrs = list(nbrs[key])
+    return sum(key_nbrs[j] not in nbrs[key_nbrs[i]]
+               for i in range(len(key_nbrs)) for j in range(i))
+  order = []
+  while remaining:
+    key = min(remaining, key=_cost)
+    for nbr in nbrs[key]:
+      nbrs[nbr].update(nbrs[key])
+      nbrs[nbr].discard(nbr)
+      nbrs[nbr].discard(key)
+    nbrs.pop(key)
+    remaining.remove(key)
+    order.append(key)
+  return order
+
+#-------------------------------------------------------------------------------
+def eliminate(factors, keys, heuristic=DEFAULT_HEURISTIC, maximise=False):
+  """ Returns the product of factors after summing out (or maximising) keys
+  by variable elimination in the order given by the heuristic. """
+  factors = list(factors)
+  order = elim_order([factor[0] for factor in factors], heuristic, keys)
+  for key in order:
+    related = [factor for factor in factors if key in factor[0]]
+    factors = [factor for factor in factors if key not in factor[0]]
+    prod = factor_product(*related)
+    factors.append(factor_marginal(prod, [k for k in prod[0] if k != key],
+                                   maximise))
+  return factor_product(*factors)
+
+#-------------------------------------------------------------------------------
+class JunctionTree:
+  """ A junction tree of log-space factors over discrete variables """
+
+  # Protected
+  _vals = None       # OrderedDict of 1-D value arrays keyed by variable
+  _factors = None    # List of factors (keys, logp)
+  _heuristic = None  # Elimination order heuristic
+  _order = None      # Elimination order
+  _cliques = None    # List of tuples of variable keys for each clique
+  _tree = None       # NetworkX graph of clique indices with separators
+  _schedule = None   # List of directed edges (i, j) in collect-distribute order
+  _potentials = None # List of clique log-potentials
+
+  # Private
+  __calibrated = None # OrderedDict of beliefs keyed by evidence indices
+  __cache_size = None # Maximum number of cached calibrations
+
+#-------------------------------------------------------------------------------
+  def __init__(self, factors, vals, heuristic=DEFAULT_HEURISTIC,
+               cache_size=DEFAULT_CALIBRATION_CACHE):
+    """ Initialises the junction tree.
+
+    :param factors: list of factors (keys, logp).
+    :param vals: dictionary of 1-D value arrays keyed by variable.
+    :param heuristic: elimination order heuristic ('min_fill', 'min_degree').
+    :param cache_size: maximum number of cached calibrations.
+    """
+    self._factors = list(factors)
+    self._vals = collections.OrderedDict(vals)
+    self._heuristic = heuristic
+    self.__cache_size = cache_size
+    self.__calibrated = collections.OrderedDict()
+    self._build()
+
+#-------------------------------------------------------------------------------
+  @property
+  def vals(self):
+    return self._vals
+
+  @property
+  def heuristic(self):
+    return self._heuristic
+
+  @property
+  def order(self):
+    return self._order
+
+  @property
+  def cliques(self):
+    return self._cliques
+
+  @property
+  def tree(self):
+    return self._tree
+
+#-------------------------------------------------------------------------------
+  def _build(self):
+    """ Builds cliques, the clique tree, message schedule, and potentials """
+    scopes = [factor[0] for factor in self._factors]
+    scopes += [(key,) for key in self._vals.keys()]
+    self._order = elim_order(scopes, self._heuristic)
+    nbrs = interaction_graph(scopes)
+    cliques = []
+    for key in self._order:
+      clique = set(nbrs[key]).union({key})
+      if not any(clique.issubset(other) for other in cliques):
+        cliques.append(clique)
+      for nbr in nbrs[key]:
+        nbrs[nbr].update(nbrs[key])
+        nbrs[nbr].discard(nbr)
+        nbrs[nbr].discard(key)
+      nbrs.pop(key)
+    rank = {key: i for i, key in enumerate(self._vals.keys())}
+    self._cliques = [tuple(sorted(clique, key=rank.get)) for clique in cliques]
+
+    # Maximum spanning tree (or forest) over separator sizes
+    graph = nx.Graph()
+    graph.add_nodes_from(range(len(self._cliques)))
+    for i in range(len(self._cliques)):
+      for j in range(i):
+        sep = set(self._cliques[i]).intersection(self._cliques[j])
+        if sep:
+          graph.add_edge(i, j, weight=len(sep))
+    self._tree = nx.maximum_spanning_tree(graph)
+    for i, j in self._tree.edges():
+      sep = tuple(key for key in self._cliques[i] if key in self._cliques[j])
+      self._tree.edges[i, j]['sep'] = sep
+
+    # Collect (leaves to roots) then distribute (roots to leaves) schedule
+    collect = []
+    for component in nx.connected_components(self._tree):
+      root = min(component)
+      collect += [(j, i) for i, j in nx.dfs_edges(self._tree, root)][::-1]
+    self._schedule = collect + [(j, i) for i, j in collect[::-1]]
+
+    # Assign each factor to the smallest clique containing its scope
+    self._potentials = [
+        np.zeros([len(self._vals[key]) for key in clique], dtype=float)
+        for clique in self._cliques]
+    for factor in self._factors:
+      index = min([i for i, clique in enumerate(self._cliques)
+                   if set(factor[0]).issubset(clique)],
+                  key=lambda i: len(self._cliques[i]))
+      self._potentials[index] = self._potentials[index] + \
+                                factor_align(factor, self._cliques[index])
+    self.__calibrated = collections.OrderedDict()
+
+#-------------------------------------------------------------------------------
+  def eval_index(self, evidence=None):
+    """ Returns an OrderedDict of value indices for evidence values """
+    index = collections.OrderedDict()
+    if not evidence:
+      return index
+    for key, val in evidence.items():
+      assert key in self._vals, "Unknown evidence variable {}".format(key)
+      index.update({key: int(value_index(self._vals[key], np.array([val]))[0])})
+    return index
+
+#-------------------------------------------------------------------------------
+  def evidence_factors(self, evidence=None):
+    """ Returns log-indicator factors for evidence values """
+    factors = []
+    for key, idx in self.eval_index(evidence).items():
+      logp = np.full(len(self._vals[key]), -np.inf)
+      logp[idx] = 0.
+      factors.append(((key,), logp))
+    return factors
+
+#-------------------------------------------------------------------------------
+  def calibrate(self, evidence=None):
+    """ Returns calibrated clique beliefs for evidence, reusing cached beliefs
+    for repeated evidence. """
+    index = self.eval_index(evidence)
+    cache_key = tuple(sorted(index.items()))
+    if cache_key in self.__calibrated:
+      self.__calibrated.move_to_end(cache_key)
+      return self.__calibrated[cache_key]
+    potentials = list(self._potentials)
+    for factor in self.evidence_factors(evidence):
+      i = [j for j, clique in enumerate(self._cliques)
+           if factor[0][0] in clique][0]
+      potentials[i] = potentials[i] + factor_align(factor, self._cliques[i])
+    messages = {}
+    for i, j in self._schedule:
+      incoming = [messages[(k, i)] for k in self._tree.neighbors(i)
+                  if k != j and (k, i) in messages]
+      prod = factor_product((self._cliques[i], potentials[i]), *incoming)
+      messages.update({(i, j): factor_marginal(prod,
+                                    self._tree.edges[i, j]['sep'])})
+    beliefs = []
+    for i, clique in enumerate(self._cliques):
+      incoming = [messages[(k, i)] for k in self._tree.neighbors(i)]
+      belief = factor_product((clique, potentials[i]), *incoming)
+      beliefs.append(factor_align(belief, clique))
+    self.__calibrated.update({cache_key: beliefs})
+    if len(self.__calibrated) > self.__cache_size:
+      self.__calibrated.popitem(last=False)
+    return beliefs
+
+#-------------------------------------------------------------------------------
+  def log_evidence(self, evidence=None):
+    """ Returns the log-normaliser (log-probability of evidence) """
+    beliefs = self.calibrate(evidence)
+    roots = [min(component)
+             for component in nx.connected_components(self._tree)]
+    return float(sum(log_sum_exp(beliefs[root]) for root in roots))
+
+#-------------------------------------------------------------------------------
+  def query(self, keys, evidence=None):
+    """ Returns the normalised log-space factor of keys given evidence, from
+    the smallest calibrated clique containing keys if available, otherwise by
+    variable elimination. """
+    keys = tuple(keys)
+    for key in keys:
+      assert key in self._vals, "Unknown query variable {}".format(key)
+      assert not evidence or key not in evidence, \
+          "Query variable {} included in evidence".format(key)
+    candidates = [i for i, clique in enumerate(self._cliques)
+                  if set(keys).issubset(clique)]
+    if candidates:
+      index = min(candidates, key=lambda i: len(self._cliques[i]))
+      beliefs = self.calibrate(evidence)
+      factor = factor_marginal((self._cliques[index], beliefs[index]), keys)
+    else:
+      factors = self._factors + self.evidence_factors(evidence)
+      elim_keys = [key for key in self._vals.keys() if key not in keys]
+      factor = eliminate(factors, elim_keys, self._heuristic)
+    assert np.isfinite(log_sum_exp(factor[1])), \
+        "Evidence {} has zero probability".format(evidence)
+    factor, _ = factor_normalise(factor)
+    return keys, factor_align(factor, keys)
+
+#-------------------------------------------------------------------------------
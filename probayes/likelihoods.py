@@ -3,10 +3,16 @@ Likelihood function utility module.
 """
 
 #-------------------------------------------------------------------------------
+import itertools
 import numpy as np
 import collections
 from probayes.rf_utils import slice_by_keyvals
 
+#-------------------------------------------------------------------------------
+DEFAULT_PERM_CHUNK = 1 << 20 # Default number of rows per block
+MAX_BIN_DIM = 62             # Maximum binary dimension for int64 encoding
+MAX_DENSE_DIM = 20           # Maximum dimension for dense counts by default
+
 #-------------------------------------------------------------------------------
 def int_to_bin(num, min_dim=0):
   """Convert positive integer(s) to binary array(s).
@@ -20,54 +26,300 @@ def int_to_bin(num, min_dim=0):
   if isinstance(num, np.ndarray):
     assert num.ndim == 1, "Input num must be integer or one dimensional array"
     min_dim = np.maximum(min_dim, len(np.binary_repr(np.max(num))))
-    return np.vstack([int_to_bin(element, min_dim) for element in num])
+    octets = num.astype('>u8').view(np.uint8).reshape([len(num), 8])
+    bits = np.unpackbits(octets, axis=1).astype(bool)
+    if min_dim <= 64:
+      return bits[:, 64-min_dim:]
+    return np.hstack([np.zeros([len(num), min_dim-64], dtype=bool), bits])
   bin_str = np.binary_repr(num)
   if min_dim:
     bin_str = bin_str.zfill(min_dim)
   return np.array(np.array(list(bin_str)).astype(np.int8), bool)
 
 #-------------------------------------------------------------------------------
-def bin_to_int(arr, _multiple=None):
+def bin_to_int(arr):
   """ Convert binary array(s) to positive integer(s)."""
   if isinstance(arr, (list, tuple)):
     arr = np.array(arr, dtype=int)
   assert isinstance(arr, np.ndarray) and arr.ndim and arr.ndim < 3, \
     "Input must be array type of not more than two dimensions"
-  if arr.ndim == 2:
-    if _multiple is None:
-      _multiple = 1 << np.arange(arr.shape[1])[::-1]
-    return np.hstack([bin_to_int(row, _multiple) for row in arr])
-  if _multiple is None:
-    _multiple = 1 << np.arange(arr.size)[::-1]
-  return arr.dot(_multiple)
+  if arr.ndim == 1:
+    return bin_to_int(arr.reshape([1, arr.size]))[0]
+  rows, cols = arr.shape
+  assert cols <= MAX_BIN_DIM, \
+      "Binary dimension {} exceeds {}".format(cols, MAX_BIN_DIM)
+  packed = np.packbits(arr.astype(bool, copy=False), axis=1)
+  octets = np.zeros([rows, 8], dtype=np.uint8)
+  octets[:, 8-packed.shape[1]:] = packed
+  codes = octets.view('>u8').ravel().astype(np.int64)
+  return codes >> ((-cols) % 8) # packbits pads the final octet with zeros
+
+#-------------------------------------------------------------------------------
+def iter_row_blocks(arr, chunk=None):
+  """ Yields blocks of at most chunk rows of arr (which may be a memmap) """
+  chunk = chunk or DEFAULT_PERM_CHUNK
+  for start in range(0, len(arr), chunk):
+    yield arr[start:start+chunk]
+
+#-------------------------------------------------------------------------------
+def bool_perm_counts(blocks, cols=None):
+  """ Returns a multidimensional array of counts of boolean permutations
+  contained in rows streamed from blocks, without materialising all rows.
+
+  :param blocks: iterable of rXc 2D NumPy bool arrays.
+  :param cols: number of columns (otherwise inferred from the first block).
+
+  :return: c-dimensional integer array of counts with each dimension ordered
+           as [False, True] for each of the columns.
+  """
+  flat = None
+  for block in blocks:
+    assert isinstance(block, np.ndarray) and block.ndim == 2 and \
+        block.dtype == bool, "Blocks must be 2D NumPy boolean arrays"
+    if cols is None:
+      cols = block.shape[1]
+    assert block.shape[1] == cols, \
+        "Block columns {} incommensurate with {}".format(block.shape[1], cols)
+    block_counts = np.bincount(bin_to_int(block), minlength=1 << cols)
+    flat = block_counts if flat is None else flat + block_counts
+  assert cols is not None, "No blocks or columns specified"
+  if flat is None:
+    flat = np.zeros(1 << cols, dtype=int)
+  return flat.reshape([2] * cols)
+
+#-------------------------------------------------------------------------------
+class PermCounts:
+  """ Sparse counts of boolean permutations stored as sorted unique codes (see
+  bin_to_int) of observed rows with their counts. Unobserved permutations have
+  zero counts, to which a baseline frequency (e.g. one for Laplacian smoothing)
+  is added analytically rather than stored.
+
+  :example:
+  >>> import numpy as np
+  >>> from probayes.likelihoods import sparse_perm_counts
+  >>> counts = sparse_perm_counts([np.array([[True, False], [True, True]])])
+  >>> print(counts.count({0: True, 1: False}))
+  1
+  """
+
+  # Protected
+  _cols = None      # Number of columns
+  _labels = None    # Ordered dictionary of column indices keyed by label
+  _codes = None     # Sorted unique permutation codes
+  _counts = None    # Counts of each code
+  _rows = None      # Total number of rows
+  _base_freq = None # Baseline frequency added to every permutation
+  _marginals = None # Marginal PermCounts keyed by tuple of column indices
+
+#-------------------------------------------------------------------------------
+  def __init__(self, codes, counts, cols, labels=None, base_freq=0):
+    self._codes = np.asarray(codes, dtype=np.int64)
+    self._counts = np.asarray(counts, dtype=np.int64)
+    assert self._codes.shape == self._counts.shape, \
+        "Codes and counts incommensurate"
+    self._cols = int(cols)
+    self._rows = int(self._counts.sum())
+    self._base_freq = base_freq
+    self._marginals = {}
+    self.set_labels(labels)
+
+#-------------------------------------------------------------------------------
+  @property
+  def cols(self):
+    return self._cols
+
+  @property
+  def labels(self):
+    return self._labels
+
+  @property
+  def codes(self):
+    return self._codes
+
+  @property
+  def counts(self):
+    return self._counts
+
+  @property
+  def rows(self):
+    return self._rows
+
+  @property
+  def base_freq(self):
+    return self._base_freq
+
+  @property
+  def total(self):
+    """ Returns total counts including baseline frequencies """
+    return self._rows + self._base_freq * float(1 << self._cols)
 
 #-------------------------------------------------------------------------------
-def bool_perm_freq(bool_2d, col_labels=None, base_freq=0):
+  def set_labels(self, labels=None):
+    """ Sets column labels (default integer indices) """
+    labels = range(self._cols) if labels is None else labels
+    assert len(labels) == self._cols, \
+        "Labels size {} incommensurate with column number {}".format(
+            len(labels), self._cols)
+    self._labels = collections.OrderedDict([(label, col) \
+                     for col, label in enumerate(labels)])
+
+#-------------------------------------------------------------------------------
+  def _encode(self, values):
+    """ Returns codes for a 2D bool array or dictionary of broadcastable
+    values keyed by all labels """
+    if not isinstance(values, dict):
+      return bin_to_int(np.asarray(values, dtype=bool))
+    assert set(values.keys()) == set(self._labels.keys()), \
+        "Keys {} mismatch labels {}".format(values.keys(), self._labels.keys())
+    codes = np.int64(0)
+    for label, col in self._labels.items():
+      bits = np.asarray(values[label], dtype=bool).astype(np.int64)
+      codes = codes + (bits << (self._cols - 1 - col))
+    return codes
+
+#-------------------------------------------------------------------------------
+  def count(self, values):
+    """ Returns counts (including baseline frequency) of permutations values, 
+    which may be a 2D bool array or dictionary keyed by labels of 
+    broadcastable bool values, in which case subsets of labels are evaluated
+    from marginal counts. """
+    if isinstance(values, dict) and set(values.keys()) != set(self._labels):
+      marginal = self.marginal(list(values.keys()))
+      return marginal.count(values)
+    codes = self._encode(values)
+    counts = np.zeros(np.shape(codes), dtype=np.int64)
+    if len(self._codes):
+      index = np.minimum(np.searchsorted(self._codes, codes), 
+                         len(self._codes) - 1)
+      counts = np.where(self._codes[index] == codes, self._counts[index], 0)
+    if self._base_freq:
+      counts = counts + self._base_freq
+    return counts if np.ndim(counts) else counts.item()
+
+#-------------------------------------------------------------------------------
+  def rel_freq(self, values):
+    """ Returns relative frequencies of permutation values (see count()) """
+    if isinstance(values, dict) and set(values.keys()) != set(self._labels):
+      return self.marginal(list(values.keys())).rel_freq(values)
+    return self.count(values) / self.total
+
+#-------------------------------------------------------------------------------
+  def marginal(self, labels):
+    """ Returns PermCounts marginalised over columns not in labels (in order),
+    with baseline frequencies summed over the marginalised columns. """
+    cols = tuple(self._labels[label] for label in labels)
+    if cols not in self._marginals:
+      codes = np.zeros_like(self._codes)
+      for col in cols:
+        codes = (codes << 1) | ((self._codes >> (self._cols - 1 - col)) & 1)
+      codes, counts = merge_codes(codes, self._counts)
+      base_freq = self._base_freq * float(1 << (self._cols - len(cols)))
+      self._marginals.update({cols: PermCounts(codes, counts, len(cols), 
+                                               list(labels), base_freq)})
+    return self._marginals[cols]
+
+#-------------------------------------------------------------------------------
+  def dense(self):
+    """ Returns a dense c-dimensional array of counts (excluding baseline) """
+    counts = np.zeros(1 << self._cols, dtype=int)
+    counts[self._codes] = self._counts
+    return counts.reshape([2] * self._cols)
+
+#-------------------------------------------------------------------------------
+def merge_codes(codes, counts):
+  """ Returns sorted unique codes with summed counts """
+  if not len(codes):
+    return codes, counts
+  order = np.argsort(codes, kind='stable')
+  codes, counts = codes[order], counts[order]
+  starts = np.flatnonzero(np.concatenate([[True], np.diff(codes) != 0]))
+  return codes[starts], np.add.reduceat(counts, starts)
+
+#-------------------------------------------------------------------------------
+def sparse_perm_counts(blocks, cols=None, labels=None, base_freq=0):
+  """ Returns PermCounts of boolean permutations contained in rows streamed
+  from blocks (see bool_perm_counts) without allocating 2^c cells.
+
+  :param blocks: iterable of rXc 2D NumPy bool arrays.
+  :param cols: number of columns (otherwise inferred from the first block).
+  :param labels: optional column labels.
+  :param base_freq: baseline frequency to add to counts.
+
+  :return: PermCounts instance.
+  """
+  codes = np.zeros(0, dtype=np.int64)
+  counts = np.zeros(0, dtype=np.int64)
+  for block in blocks:
+    assert isinstance(block, np.ndarray) and block.ndim == 2 and \
+        block.dtype == bool, "Blocks must be 2D NumPy boolean arrays"
+    if cols is None:
+      cols = block.shape[1]
+    assert block.shape[1] == cols, \
+        "Block columns {} incommensurate with {}".format(block.shape[1], cols)
+    block_codes, block_counts = np.unique(bin_to_int(block), 
+                                          return_counts=True)
+    codes, counts = merge_codes(np.concatenate([codes, block_codes]),
+                                np.concatenate([counts, block_counts]))
+  assert cols is not None, "No blocks or columns specified"
+  return PermCounts(codes, counts, cols, labels, base_freq)
+
+#-------------------------------------------------------------------------------
+def bool_perm_freq(bool_2d, col_labels=None, base_freq=0, chunk=None, 
+                   sparse=None):
   """ Returns a multidimensional array of counts of boolean permutations 
   contained in rows of bool_2d.
 
-  :param bool_2d: a rXc 2D NumPy bool array with r examples of boolean
-                  permutations of length c.
+  :param bool_2d: a rXc 2D NumPy bool array (or memmap) with r examples of 
+                  boolean permutations of length c, or an iterable of such 
+                  arrays of row blocks.
   :param col_labels: an optional list/tuple of keys for the labels.
   :param base_freq: baseline frequency to add to counts
                     (set to one for unit Laplacian smoothing).
+  :param chunk: number of rows per block for array inputs (see
+                bool_perm_counts).
+  :param sparse: whether to count using sparse codes (see PermCounts), which
+                 defaults to True if c exceeds MAX_DENSE_DIM.
 
   :return: counts or a tuple of (function, relative counts) if labels are given:
 
   counts: c-dimensional integer array of counts with each dimension ordered as
-          [False, True] for each of the columns in bool_2d.
+          [False, True] for each of the columns in bool_2d (PermCounts if
+          sparse).
   function: returns relative frequency given keywords corresponding to labels
 
   """
 
-  assert isinstance(bool_2d, np.ndarray) and bool_2d.ndim == 2 and \
-      bool_2d.dtype == bool, "First input must be a 2D NumPy boolean array"
-  
-  rows, cols = bool_2d.shape
-  counts = np.zeros([2] * cols, dtype=int)
-  sequences = bool_2d.astype(int).tolist()
-  for sequence in sequences:
-    counts[tuple(sequence)] += 1
+  if isinstance(bool_2d, np.ndarray):
+    assert bool_2d.ndim == 2 and bool_2d.dtype == bool, \
+        "First input must be a 2D NumPy boolean array"
+    blocks, cols = iter_row_blocks(bool_2d, chunk), bool_2d.shape[1]
+  else:
+    blocks, cols = iter(bool_2d), None
+    if sparse is None:
+      first = next(blocks)
+      blocks, cols = itertools.chain([first], blocks), first.shape[1]
+  sparse = cols > MAX_DENSE_DIM if sparse is None else sparse
+
+  # Sparse counts are evaluated by PermCounts
+  if sparse:
+    perm_counts = sparse_perm_counts(blocks, cols, col_labels, base_freq)
+    if col_labels is None:
+      return perm_counts
+
+    def _func_sparse_perm_freq(spec=None, **kwds):
+      kwds = dict(kwds)
+      kwds.pop('dims', None) # values are broadcastable
+      if spec is None:
+        spec = kwds
+      else:
+        assert not kwds, \
+            "Unknown keywords: {}".format(kwds)
+      return perm_counts.rel_freq(spec)
+
+    return _func_sparse_perm_freq, perm_counts
+
+  counts = bool_perm_counts(blocks, cols)
+  rows, cols = int(counts.sum()), counts.ndim
   if col_labels is None:
     return counts
   assert len(col_labels) == cols, \
@@ -81,9 +333,7 @@ def bool_perm_freq(bool_2d, col_labels=None, base_freq=0):
     reshape[dim] = 2
     dims.update({lbl: dim})
     vals.update({lbl: np.array([False, True]).reshape(reshape)})
-  if base_freq:
-    base_freq += counts
-  rel_freq = counts / rows
+  rel_freq = (counts + base_freq) / (rows + base_freq * counts.size)
 
   def _func_bool_perm_freq(spec=None, **kwds):
     assert 'dims' in kwds, \
@@ -0,0 +1,296 @@
+"""
+Loopy belief propagation over log-space factors of discrete variables (see
+factor_utils.py). Factors and variables are nodes of a bipartite networkx
+factor graph, with log-space factor-to-variable messages stored as NumPy arrays
+on its edges. Variable-to-factor messages are obtained from the sum of all
+messages incoming to each variable less the message of the receiving factor.
+Sum-product messages approximate marginals and max-product messages
+approximate max-marginals, exact for graphs without cycles.
+
+Updates are scheduled either in parallel ('flooding') or in order of largest
+residual ('residual'), optionally damped in linear space by:
+
+message = (1 - damping) * new_message + damping * old_message
+"""
+#-------------------------------------------------------------------------------
+import heapq
+import collections
+import numpy as np
+import networkx as nx
+from probayes.dist import Dist
+from probayes.sd_utils import value_index
+from probayes.factor_utils import LOG_FLOOR, eval_factors, log_sum_exp
+from probayes.pscales import rescale
+
+#-------------------------------------------------------------------------------
+DEFAULT_MAX_ITER = 100 # Default maximum number of iterations
+DEFAULT_TOL = 1e-8     # Default maximum residual for convergence
+BP_MODES = {'sum', 'max'}
+BP_SCHEDULES = {'flooding', 'residual'}
+
+#-------------------------------------------------------------------------------
+class LoopyBP:
+  """ Loopy belief propagation over a factor graph of discrete variables.
+
+  :example:
+  >>> import probayes as pb
+  >>> bp = pb.LoopyBP(sd, schedule='residual', damping=0.2)
+  >>> converged = bp.run()
+  >>> marginals = bp.marginals()
+  """
+
+  # Protected
+  _factors = None   # List of log-space factors (keys, logp)
+  _vals = None      # OrderedDict of 1-D values keyed by variable
+  _graph = None     # Factor graph with factor indices and variable nodes
+  _mode = None      # 'sum' or 'max' product
+  _schedule = None  # 'flooding' or 'residual'
+  _damping = None   # Damping coefficient in [0, 1)
+  _unary = None     # OrderedDict of log-evidence vectors keyed by variable
+  _residuals = None # List of maximum residuals after each iteration
+  _converged = None # Flag denoting convergence
+
+  # Private
+  __edges = None    # OrderedDict of edge data dicts keyed by (factor, var)
+  __totals = None   # OrderedDict of sum of incoming log-messages per variable
+
+#-------------------------------------------------------------------------------
+  def __init__(self, *args, values=None, mode='sum', schedule='flooding',
+               damping=0., **kwds):
+    """ Initialises loopy belief propagation with factors args.
+
+    :param args: Dists, SDs with discrete probability tables, or RV/RF/SD
+                 objects evaluated over values (see factor_utils.eval_factors).
+    :param values: dictionary of values used to evaluate RV/RF/SD arguments.
+    :param mode: 'sum' for sum-product or 'max' for max-product messages.
+    :param schedule: 'flooding' for parallel or 'residual' for residual order.
+    :param damping: linear-space damping coefficient in [0, 1).
+    :param kwds: optional keywords passed when evaluating arguments.
+    """
+    self._factors = []
+    self._vals = collections.OrderedDict()
+    for arg in args:
+      factors, vals = eval_factors(arg, values, **kwds)
+      for key, val in vals.items():
+        if key in self._vals:
+          assert np.array_equal(self._vals[key], val), \
+              "Inconsistent values for {}".format(key)
+        else:
+          self._vals.update({key: val})
+      for keys, logp in factors:
+        self._factors.append((keys, np.maximum(logp, LOG_FLOOR)))
+    self.set_mode(mode)
+    self.set_schedule(schedule, damping)
+    self._graph = nx.Graph()
+    self._graph.add_nodes_from(self._vals.keys(), bipartite=0)
+    self._graph.add_nodes_from(range(len(self._factors)), bipartite=1)
+    for i, (keys, _) in enumerate(self._factors):
+      for key in keys:
+        self._graph.add_edge(i, key)
+    self.__edges = collections.OrderedDict()
+    for i, (keys, _) in enumerate(self._factors):
+      for key in keys:
+        self.__edges.update({(i, key): self._graph.edges[i, key]})
+    self.set_evidence()
+
+#-------------------------------------------------------------------------------
+  @property
+  def factors(self):
+    return self._factors
+
+  @property
+  def vals(self):
+    return self._vals
+
+  @property
+  def graph(self):
+    return self._graph
+
+  @property
+  def mode(self):
+    return self._mode
+
+  @property
+  def schedule(self):
+    return self._schedule
+
+  @property
+  def damping(self):
+    return self._damping
+
+  @property
+  def residuals(self):
+    return self._residuals
+
+  @property
+  def converged(self):
+    return self._converged
+
+  @property
+  def n_iter(self):
+    return len(self._residuals)
+
+#-------------------------------------------------------------------------------
+  def set_mode(self, mode='sum'):
+    """ Sets sum-product ('sum') or max-product ('max') messages """
+    assert mode in BP_MODES, \
+        "Unknown mode {}; available: {}".format(mode, BP_MODES)
+    self._mode = mode
+
+#-------------------------------------------------------------------------------
+  def set_schedule(self, schedule='flooding', damping=0.):
+    """ Sets the update schedule ('flooding', 'residual') and damping """
+    assert schedule in BP_SCHEDULES, \
+        "Unknown schedule {}; available: {}".format(schedule, BP_SCHEDULES)
+    assert 0. <= damping < 1., \
+        "Damping must be in range [0, 1), not {}".format(damping)
+    self._schedule = schedule
+    self._damping = float(damping)
+
+#-------------------------------------------------------------------------------
+  def set_evidence(self, evidence=None):
+    """ Sets evidence values keyed by variable and resets all messages """
+    self._unary = collections.OrderedDict()
+    for key, val in self._vals.items():
+      self._unary.update({key: np.zeros(len(val), dtype=float)})
+    if evidence:
+      for key, val in evidence.items():
+        assert key in self._vals, "Unknown evidence variable {}".format(key)
+        index = value_index(self._vals[key], np.array([val]))[0]
+        self._unary[key][:] = LOG_FLOOR
+        self._unary[key][index] = 0.
+    self.reset()
+
+#-------------------------------------------------------------------------------
+  def reset(self):
+    """ Resets messages to uniform and clears convergence diagnostics """
+    for (_, key), edge in self.__edges.items():
+      edge.update({'f2v': np.zeros(len(self._vals[key]), dtype=float)})
+    self.__totals = collections.OrderedDict(
+        [(key, np.array(unary)) for key, unary in self._unary.items()])
+    self._residuals = []
+    self._converged = False
+
+#-------------------------------------------------------------------------------
+  def _normalise(self, logp):
+    """ Normalises log-messages to unit sum (sum) or zero maximum (max) """
+    norm = np.max(logp) if self._mode == 'max' else log_sum_exp(logp)
+    return logp - norm
+
+#-------------------------------------------------------------------------------
+  def _f2v(self, index, key):
+    """ Returns the new message from factor index to variable key """
+    keys, logp = self._factors[index]
+    prod = logp
+    for i, other in enumerate(keys):
+      if other != key:
+        v2f = self.__totals[other] - self.__edges[(index, other)]['f2v']
+        shape = [1] * len(keys)
+        shape[i] = -1
+        prod = prod + v2f.reshape(shape)
+    axes = tuple(i for i, other in enumerate(keys) if other != key)
+    if axes:
+      prod = np.max(prod, axis=axes) if self._mode == 'max' else \
+             log_sum_exp(prod, axes)
+    return np.maximum(self._normalise(prod), LOG_FLOOR)
+
+#-------------------------------------------------------------------------------
+  def _commit(self, index, key, message):
+    """ Stores the (damped) message returning the maximum absolute change """
+    edge = self.__edges[(index, key)]
+    old = edge['f2v']
+    if self._damping:
+      message = self._normalise(np.logaddexp(
+                    np.log1p(-self._damping) + message,
+                    np.log(self._damping) + old))
+    self.__totals[key] = self.__totals[key] + message - old
+    edge['f2v'] = message
+    return float(np.max(np.abs(message - old)))
+
+#-------------------------------------------------------------------------------
+  def iterate(self):
+    """ Performs one iteration, updating every edge once (flooding) or as many
+    updates as edges in order of largest residual (residual), returning the
+    maximum residual. """
+    if self._schedule == 'flooding':
+      messages = [(index, key, self._f2v(index, key))
+                  for index, key in self.__edges.keys()]
+      residual = 0.
+      for index, key, message in messages:
+        residual = max(residual, self._commit(index, key, message))
+      return residual
+    return self._iterate_residual()
+
+#-------------------------------------------------------------------------------
+  def _iterate_residual(self):
+    """ Performs residual belief propagation updates using a lazy heap """
+    candidates = {}
+    residuals = {}
+    heap = []
+    def _push(index, key):
+      message = self._f2v(index, key)
+      residual = float(np.max(np.abs(
+                     message - self.__edges[(index, key)]['f2v'])))
+      candidates[(index, key)] = message
+      residuals[(index, key)] = residual
+      heapq.heappush(heap, (-residual, index, key))
+    for index, key in self.__edges.keys():
+      _push(index, key)
+    for _ in range(len(self.__edges)):
+      while heap:
+        residual, index, key = heapq.heappop(heap)
+        if -residual == residuals[(index, key)]:
+          break
+      else:
+        break
+      self._commit(index, key, candidates[(index, key)])
+      if self._damping: # a damped message retains a residual
+        _push(index, key)
+      else:
+        residuals[(index, key)] = 0.
+      for other in self._graph.neighbors(key):
+        if other != index:
+          for target in self._factors[other][0]:
+            if target != key:
+              _push(other, target)
+    return max(residuals.values()) if residuals else 0.
+
+#-------------------------------------------------------------------------------
+  def run(self, max_iter=DEFAULT_MAX_ITER, tol=DEFAULT_TOL):
+    """ Iterates until the maximum residual falls within tol or max_iter
+    iterations are completed, returning whether converged. Residuals of each
+    iteration are recorded in LoopyBP.residuals. """
+    for _ in range(max_iter):
+      self._residuals.append(self.iterate())
+      if self._residuals[-1] <= tol:
+        self._converged = True
+        break
+    return self._converged
+
+#-------------------------------------------------------------------------------
+  def beliefs(self):
+    """ Returns an OrderedDict of normalised log-beliefs keyed by variable """
+    beliefs = collections.OrderedDict()
+    for key, total in self.__totals.items():
+      beliefs.update({key: total - log_sum_exp(total)})
+    return beliefs
+
+#-------------------------------------------------------------------------------
+  def marginals(self, pscale=None):
+    """ Returns an OrderedDict of 1-D Dists of beliefs keyed by variable """
+    marginals = collections.OrderedDict()
+    for key, logp in self.beliefs().items():
+      prob = rescale(logp, 'log', pscale)
+      marginals.update({key: Dist(key, {key: self._vals[key]}, {key: 0},
+                                  prob, pscale)})
+    return marginals
+
+#-------------------------------------------------------------------------------
+  def map_state(self):
+    """ Returns an OrderedDict of values maximising each belief (the MAP state
+    for max-product messages on graphs without cycles) """
+    return collections.OrderedDict(
+        [(key, self._vals[key][np.argmax(total)])
+         for key, total in self.__totals.items()])
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,178 @@
+"""
+Mean-field variational inference over discrete grids of variable values. The
+(unnormalised) joint log-density is a sum of log-space factors over subsets of
+variables (see factor_utils.py), and the approximate posterior is a product of
+independent 1-D distributions q(x_i) over the grid values of each variable.
+Coordinate ascent (CAVI) updates each q(x_i) in turn to:
+
+log q(x_i) = sum_f E_{q(x_-i)}[log f] + const
+
+where expectations are tensor contractions of each factor containing x_i with
+the distributions of its other variables. Only user-supplied factorisations
+(Dist factors or SDs of conditional probability tables) avoid evaluating the
+full grid; an RV, RF, or SD joint probability is evaluated over the full grid
+of its variables as a single factor.
+"""
+#-------------------------------------------------------------------------------
+import collections
+import numpy as np
+from probayes.dist import Dist
+from probayes.factor_utils import LOG_FLOOR, eval_factors, log_sum_exp
+from probayes.pscales import rescale
+
+#-------------------------------------------------------------------------------
+DEFAULT_MAX_ITER = 100 # Default maximum number of CAVI sweeps
+DEFAULT_TOL = 1e-8     # Default relative ELBO tolerance for convergence
+
+#-------------------------------------------------------------------------------
+class MeanField:
+  """ A mean-field variational approximation fitted by coordinate ascent to a
+  product of factors over grid values. Arguments that are not factorised by the
+  user are evaluated over their full joint grid (see eval_factors()).
+
+  :example:
+  >>> import probayes as pb
+  >>> mf = pb.MeanField(model, values={'x': data, 'mu': {64}, 'sigma': {64}},
+  ...                   iid=True)
+  >>> dists, elbo = mf.fit()
+  """
+
+  # Protected
+  _factors = None # List of log-space factors (keys, logp)
+  _vals = None    # OrderedDict of 1-D grid values keyed by variable
+  _logq = None    # OrderedDict of log-probabilities of q keyed by variable
+  _elbo = None    # List of ELBO evaluations after each sweep
+
+  # Private
+  __operands = None # OrderedDict of factor indices keyed by variable
+
+#-------------------------------------------------------------------------------
+  def __init__(self, *args, values=None, **kwds):
+    """ Initialises the mean-field approximation with factors args.
+
+    :param args: each arg may be a Dist of (log-)probabilities over grid values,
+                 an SD with discrete conditional probability tables (see
+                 SD.compile_plan()), or an RV/RF/SD evaluated over values.
+    :param values: dictionary of values (or {number} resolution sets) used to
+                   evaluate RV/RF/SD arguments; singleton or iid variables are
+                   treated as observed.
+    :param kwds: optional keywords passed when evaluating arguments (e.g. iid).
+    """
+    self._factors = []
+    self._vals = collections.OrderedDict()
+    for arg in args:
+      self.add_factor(arg, values, **kwds)
+
+#-------------------------------------------------------------------------------
+  @property
+  def factors(self):
+    return self._factors
+
+  @property
+  def vals(self):
+    return self._vals
+
+  @property
+  def logq(self):
+    return self._logq
+
+  @property
+  def elbo(self):
+    return self._elbo
+
+#-------------------------------------------------------------------------------
+  def add_factor(self, arg, values=None, **kwds):
+    """ Adds the factors of arg (see __init__()) and resets q """
+    factors, vals = eval_factors(arg, values, **kwds)
+    for key, val in vals.items():
+      if key in self._vals:
+        assert np.array_equal(self._vals[key], val), \
+            "Inconsistent grid values for {}".format(key)
+      else:
+        self._vals.update({key: val})
+    for keys, logp in factors:
+      self._factors.append((keys, np.maximum(logp, LOG_FLOOR)))
+    self.__operands = collections.OrderedDict([(key, [])
+                                               for key in self._vals.keys()])
+    for i, (keys, _) in enumerate(self._factors):
+      for key in keys:
+        self.__operands[key].append(i)
+    self.reset()
+
+#-------------------------------------------------------------------------------
+  def reset(self, logq=None):
+    """ Resets q to uniform distributions updated by optional dictionary logq
+    of log-probabilities keyed by variable, and clears the ELBO trace """
+    self._logq = collections.OrderedDict()
+    for key, val in self._vals.items():
+      self._logq.update({key: np.full(len(val), -np.log(len(val)))})
+    if logq:
+      for key, val in logq.items():
+        val = np.asarray(val, dtype=float)
+        self._logq.update({key: val - log_sum_exp(val)})
+    self._elbo = []
+
+#-------------------------------------------------------------------------------
+  def _expect(self, index, skip=None):
+    """ Returns the expectation of factor index under q for all variables
+    except skip, as a vector over the values of skip (or a scalar if None). """
+    keys, logp = self._factors[index]
+    operands = [logp, list(range(len(keys)))]
+    for i, key in enumerate(keys):
+      if key != skip:
+        operands += [np.exp(self._logq[key]), [i]]
+    output = [] if skip is None else [keys.index(skip)]
+    return np.einsum(*operands, output)
+
+#-------------------------------------------------------------------------------
+  def update(self, key):
+    """ Updates q for variable key by coordinate ascent """
+    logq = np.zeros(len(self._vals[key]), dtype=float)
+    for index in self.__operands[key]:
+      logq = logq + self._expect(index, key)
+    self._logq[key] = logq - log_sum_exp(logq)
+    return self._logq[key]
+
+#-------------------------------------------------------------------------------
+  def eval_elbo(self):
+    """ Returns the evidence lower bound: E_q[log joint] + entropy of q """
+    elbo = sum(float(self._expect(index))
+               for index in range(len(self._factors)))
+    for logq in self._logq.values():
+      prob = np.exp(logq)
+      elbo -= float(np.sum(np.where(prob > 0., prob * logq, 0.)))
+    return elbo
+
+#-------------------------------------------------------------------------------
+  def sweep(self):
+    """ Updates all variables in turn, returning the ELBO """
+    for key in self._vals.keys():
+      self.update(key)
+    self._elbo.append(self.eval_elbo())
+    return self._elbo[-1]
+
+#-------------------------------------------------------------------------------
+  def fit(self, max_iter=DEFAULT_MAX_ITER, tol=DEFAULT_TOL, pscale=None):
+    """ Performs coordinate ascent sweeps until the relative change in ELBO
+    falls within tol or max_iter sweeps are completed.
+
+    :return: tuple (dists, elbo) of an OrderedDict of 1-D Dists of q keyed by
+             variable (see dists()) and the list of ELBO values for each sweep.
+    """
+    for _ in range(max_iter):
+      elbo = self.sweep()
+      if len(self._elbo) > 1 and \
+          abs(elbo - self._elbo[-2]) <= tol * (1. + abs(elbo)):
+        break
+    return self.dists(pscale), self._elbo
+
+#-------------------------------------------------------------------------------
+  def dists(self, pscale=None):
+    """ Returns an OrderedDict of 1-D Dists of q keyed by variable """
+    dists = collections.OrderedDict()
+    for key, val in self._vals.items():
+      prob = rescale(self._logq[key], 'log', pscale)
+      dists.update({key: Dist(key, {key: val}, {key: 0}, prob, pscale)})
+    return dists
+
+#-------------------------------------------------------------------------------
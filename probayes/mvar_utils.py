@@ -0,0 +1,97 @@
+# Utility module for evaluating multivariate scipy.stats distributions
+
+#-------------------------------------------------------------------------------
+import numpy as np
+
+#-------------------------------------------------------------------------------
+DEFAULT_MVAR_CHUNK = 65536 # Maximum number of points evaluated per chunk
+MVN_METHODS = {'pdf', 'logpdf'} # Methods evaluated from Cholesky factors
+
+#-------------------------------------------------------------------------------
+def mvn_factor(obj):
+  """ Returns a (mean, cholesky, log_norm) tuple for a frozen scipy.stats
+  multivariate normal object obj for evaluating densities directly, or None
+  if obj is not a multivariate normal or its covariance is not positive
+  definite (in which case scipy handles the evaluation). """
+  import scipy.stats
+  if not isinstance(obj, scipy.stats._multivariate.multivariate_normal_frozen):
+    return None
+  mean = np.atleast_1d(np.asarray(obj.mean, dtype=float))
+  cov = np.atleast_2d(np.asarray(obj.cov, dtype=float))
+  try:
+    chol = np.linalg.cholesky(cov)
+  except np.linalg.LinAlgError:
+    return None
+  log_norm = -0.5 * len(mean) * np.log(2. * np.pi) - \
+             np.sum(np.log(np.diag(chol)))
+  return mean, chol, log_norm
+
+#-------------------------------------------------------------------------------
+def mvn_logpdf(vals, factor):
+  """ Returns the multivariate normal log density for list of values vals of
+  common broadcast shape using factor (see mvn_factor()) by forward
+  substitution of the Cholesky factor to evaluate the quadratic form. """
+  mean, chol, log_norm = factor
+  quad = 0.
+  resid = [None] * len(vals)
+  for i, val in enumerate(vals):
+    resid[i] = val - mean[i]
+    for j in range(i):
+      resid[i] = resid[i] - chol[i, j] * resid[j]
+    resid[i] = resid[i] / chol[i, i]
+    quad = quad + resid[i] ** 2
+  return log_norm - 0.5 * quad
+
+#-------------------------------------------------------------------------------
+def iter_chunks(shape, chunk=None):
+  """ Yields index tuples slicing an array of shape into chunks of at most chunk
+  elements in C-order. """
+  chunk = chunk or DEFAULT_MVAR_CHUNK
+  if not shape:
+    yield ()
+    return
+  axis = len(shape) - 1
+  block = 1
+  while axis > 0 and block * shape[axis] <= chunk:
+    block *= shape[axis]
+    axis -= 1
+  step = max(1, chunk // block)
+  for index in np.ndindex(*shape[:axis]):
+    for start in range(0, shape[axis], step):
+      yield index + (slice(start, min(start + step, shape[axis])),)
+
+#-------------------------------------------------------------------------------
+def mvar_eval(obj, vals, method='pdf', factor=None, chunk=None):
+  """ Evaluates a frozen multivariate scipy.stats object over the broadcast grid
+  of values in chunks, without stacking the full point cloud.
+
+  :param obj: frozen scipy.stats multivariate object (e.g. multivariate_normal).
+  :param vals: list of values (scalars or broadcastable arrays) for each
+               dimension in order.
+  :param method: name of the method of obj to evaluate (e.g. 'pdf', 'logpdf').
+  :param factor: optional Cholesky factorisation (see mvn_factor()) to evaluate
+                 multivariate normal densities directly.
+  :param chunk: maximum number of points evaluated per chunk.
+
+  :return: evaluations with the broadcast shape of vals (float if scalar).
+  """
+  vals = [np.asarray(val) for val in vals]
+  shape = np.broadcast(*vals).shape
+  use_factor = factor is not None and method in MVN_METHODS
+  func = None if use_factor else getattr(obj, method)
+  evals = np.empty(shape, dtype=float)
+  for index in iter_chunks(shape, chunk):
+    sub_vals = [np.broadcast_to(val, shape)[index] for val in vals]
+    if use_factor:
+      sub_evals = mvn_logpdf(sub_vals, factor)
+      if method == 'pdf':
+        sub_evals = np.exp(sub_evals)
+    else:
+      points = np.stack(np.broadcast_arrays(*sub_vals), axis=-1)
+      sub_evals = np.reshape(func(points), points.shape[:-1])
+    evals[index] = sub_evals
+  if not shape:
+    return float(evals)
+  return evals
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,334 @@
+"""
+An explicit Naive Bayes classifier implemented as a stochastic dependence in
+which a discrete class RV conditions mutually independent feature RVs:
+
+p(c | x_1, ..., x_n) = p(c) * prod_i p(x_i | c) / p(x_1, ..., x_n)
+
+Discrete (bool or int) features are modelled by class-conditional frequency
+tables and float features by class-conditional Gaussians. Fitting accumulates
+counts or sufficient statistics in one vectorised pass over blocks of rows,
+and prediction evaluates the log-posteriors of all rows in a block by a single
+matrix product in log-space.
+"""
+#-------------------------------------------------------------------------------
+import collections
+import numpy as np
+from probayes.rv import RV
+from probayes.rf import RF
+from probayes.sd import SD
+from probayes.dist import Dist
+from probayes.vtypes import VTYPES
+from probayes.pscales import rescale
+from probayes.sd_utils import value_index
+from probayes.likelihoods import DEFAULT_PERM_CHUNK, iter_row_blocks
+
+#-------------------------------------------------------------------------------
+DEFAULT_BASE_FREQ = 1.   # Default additive smoothing for discrete counts
+DEFAULT_VAR_FLOOR = 1e-9 # Gaussian variance floor relative to largest variance
+
+#-------------------------------------------------------------------------------
+def log_normalise(logp, axis=-1):
+  """ Returns logp normalised in log-space along axis """
+  logp_max = np.max(logp, axis=axis, keepdims=True)
+  logp = logp - logp_max
+  return logp - np.log(np.sum(np.exp(logp), axis=axis, keepdims=True))
+
+#-------------------------------------------------------------------------------
+class NaiveBayes (SD):
+  """ A Naive Bayes classifier is a stochastic dependence of feature RVs on a
+  single discrete class RV. Discrete features are fitted to class-conditional
+  frequency tables and float features to class-conditional Gaussians.
+
+  :example:
+  >>> import numpy as np
+  >>> import probayes as pb
+  >>> c = pb.RV('c', vtype=int, vset=[0, 1])
+  >>> x = pb.RV('x', vtype=bool)
+  >>> y = pb.RV('y', vtype=float)
+  >>> nb = pb.NaiveBayes(c, x, y)
+  >>> nb.fit({'c': c_obs, 'x': x_obs, 'y': y_obs})
+  >>> post = nb.predict({'x': x_new, 'y': y_new}) # p(c|x,y) for all rows
+  """
+
+  # Protected
+  _cls = None          # Class RV
+  _feats = None        # OrderedDict of feature RVs keyed by name
+  _classes = None      # Array of class values
+  _gauss = None        # OrderedDict of Gaussian flags keyed by feature name
+  _base_freq = None    # Additive smoothing for discrete counts
+  _class_counts = None # Number of observations of each class
+  _stats = None        # OrderedDict of class-conditional counts or statistics
+
+  # Private
+  __values = None      # OrderedDict of discrete values keyed by name
+  __weights = None     # Log-space weights (design columns x classes)
+  __bias = None        # Log-space bias per class
+  __log_prior = None   # Log-space class prior
+
+#-------------------------------------------------------------------------------
+  def __init__(self, cls, *feats, base_freq=DEFAULT_BASE_FREQ):
+    """ Initialises the classifier for class RV cls and feature RVs feats.
+
+    :param cls: class RV, which must be discrete (bool or int).
+    :param feats: feature RVs, which may be discrete or float.
+    :param base_freq: additive smoothing for class and discrete feature counts.
+    """
+    assert isinstance(cls, RV), \
+        "Class must be an RV, not {}".format(type(cls))
+    assert feats, "At least one feature RV required"
+    self._cls = cls
+    self._feats = collections.OrderedDict()
+    self._gauss = collections.OrderedDict()
+    self.__values = collections.OrderedDict()
+    assert cls.vtype not in VTYPES[float], \
+        "Class RV {} must be discrete".format(cls.name)
+    self.__values.update({cls.name: np.array(cls.vset)})
+    for feat in feats:
+      assert isinstance(feat, RV), \
+          "Features must be RVs, not {}".format(type(feat))
+      assert feat.name not in self.__values, \
+          "Duplicate RV name {}".format(feat.name)
+      self._feats.update({feat.name: feat})
+      self._gauss.update({feat.name: feat.vtype in VTYPES[float]})
+      if not self._gauss[feat.name]:
+        self.__values.update({feat.name: np.array(feat.vset)})
+    self._classes = self.__values[cls.name]
+    self._base_freq = float(base_freq)
+    super().__init__(RF(*feats), cls)
+    self.reset()
+
+#-------------------------------------------------------------------------------
+  @property
+  def cls(self):
+    return self._cls
+
+  @property
+  def feats(self):
+    return self._feats
+
+  @property
+  def classes(self):
+    return self._classes
+
+  @property
+  def base_freq(self):
+    return self._base_freq
+
+  @property
+  def class_counts(self):
+    return self._class_counts
+
+  @property
+  def stats(self):
+    return self._stats
+
+#-------------------------------------------------------------------------------
+  def reset(self):
+    """ Resets all accumulated counts and statistics """
+    n_classes = len(self._classes)
+    self._class_counts = np.zeros(n_classes, dtype=float)
+    self._stats = collections.OrderedDict()
+    for key in self._feats.keys():
+      shape = (2, n_classes) if self._gauss[key] else \
+              (n_classes, len(self.__values[key]))
+      self._stats.update({key: np.zeros(shape, dtype=float)})
+    self.__weights = None
+    self.__bias = None
+
+#-------------------------------------------------------------------------------
+  def _index(self, key, vals):
+    """ Returns indices of discrete values vals within the vset of key """
+    return value_index(self.__values[key], np.asarray(vals))
+
+#-------------------------------------------------------------------------------
+  def _iter_blocks(self, data, keys, chunk=None):
+    """ Yields OrderedDicts of 1-D arrays keyed by keys in blocks of at most
+    chunk rows from data, which may be a dictionary of arrays, a 2-D array (or
+    memmap) with columns ordered by keys, or an iterable of either. """
+    chunk = chunk or DEFAULT_PERM_CHUNK
+    if isinstance(data, dict):
+      cols = [np.atleast_1d(data[key]) for key in keys]
+      for start in range(0, len(cols[0]), chunk):
+        yield collections.OrderedDict([(key, col[start:start+chunk])
+                                       for key, col in zip(keys, cols)])
+    elif isinstance(data, np.ndarray):
+      assert data.ndim == 2 and data.shape[1] == len(keys), \
+          "Data array shape {} incommensurate with keys {}".format(
+              data.shape, keys)
+      for block in iter_row_blocks(data, chunk):
+        yield collections.OrderedDict(
+                  [(key, block[:, i]) for i, key in enumerate(keys)])
+    else:
+      for datum in data:
+        for block in self._iter_blocks(datum, keys, chunk):
+          yield block
+
+#-------------------------------------------------------------------------------
+  def fit(self, data, chunk=None):
+    """ Fits the classifier to data after resetting (see update()) """
+    self.reset()
+    return self.update(data, chunk)
+
+#-------------------------------------------------------------------------------
+  def update(self, data, chunk=None):
+    """ Accumulates class-conditional counts (discrete features) and sufficient
+    statistics (Gaussian features) from data.
+
+    :param data: dictionary of arrays keyed by the class and feature names,
+                 a 2-D array (or memmap) with columns ordered by class then
+                 features, or an iterable of either streaming blocks of rows.
+    :param chunk: maximum number of rows processed per block.
+
+    :return: total number of observations accumulated.
+    """
+    keys = [self._cls.name] + list(self._feats.keys())
+    n_classes = len(self._classes)
+    for block in self._iter_blocks(data, keys, chunk):
+      cls_index = self._index(self._cls.name, block[self._cls.name])
+      counts = np.bincount(cls_index, minlength=n_classes).astype(float)
+      prev_counts = self._class_counts
+      self._class_counts = prev_counts + counts
+      for key in self._feats.keys():
+        vals = block[key]
+        stats = self._stats[key]
+        if not self._gauss[key]:
+          n_vals = stats.shape[1]
+          stats += np.bincount(cls_index * n_vals + self._index(key, vals),
+                               minlength=stats.size).reshape(stats.shape)
+          continue
+
+        # Merge block mean and sum of squared deviations per class
+        vals = np.asarray(vals, dtype=float)
+        mean = np.bincount(cls_index, weights=vals, minlength=n_classes) / \
+               np.maximum(counts, 1.)
+        sum_sqr = np.bincount(cls_index, weights=(vals - mean[cls_index])**2,
+                              minlength=n_classes)
+        delta = mean - stats[0]
+        coef = counts / np.maximum(self._class_counts, 1.)
+        stats[1] += sum_sqr + delta**2 * prev_counts * coef
+        stats[0] += delta * coef
+    self.__weights = None
+    self.__bias = None
+    self.set_prob(self._log_lhood, pscale='log')
+    return float(np.sum(self._class_counts))
+
+#-------------------------------------------------------------------------------
+  def _set_weights(self):
+    """ Evaluates log-space weights and bias from the accumulated statistics """
+    assert np.sum(self._class_counts), "No observations fitted"
+    base_freq = self._base_freq
+    counts = self._class_counts + base_freq
+    self.__log_prior = np.log(counts / np.sum(counts))
+    bias = self.__log_prior
+    weights = []
+    gauss_vars = [np.maximum(self._stats[key][1], 0.) / \
+                  np.maximum(self._class_counts, 1.)
+                  for key in self._feats.keys() if self._gauss[key]]
+    var_floor = 0. if not gauss_vars else \
+                DEFAULT_VAR_FLOOR * max(1., np.max(gauss_vars))
+    for key in self._feats.keys():
+      stats = self._stats[key]
+      if not self._gauss[key]:
+        freqs = stats + base_freq
+        log_lhood = np.log(freqs / np.sum(freqs, axis=1, keepdims=True))
+        weights.append(log_lhood.T)
+        continue
+      mean = stats[0]
+      var = np.maximum(stats[1] / np.maximum(self._class_counts, 1.),
+                       var_floor)
+      weights.append(np.vstack([mean / var, -0.5 / var]))
+      bias = bias - 0.5 * (mean**2 / var + np.log(2. * np.pi * var))
+    self.__weights = np.vstack(weights)
+    self.__bias = bias
+
+#-------------------------------------------------------------------------------
+  def _design(self, block):
+    """ Returns the design matrix for a block of feature values comprising
+    one-hot columns for discrete features and [x, x**2] for Gaussians. """
+    n_rows = len(block[next(iter(self._feats.keys()))])
+    design = np.zeros([n_rows, self.__weights.shape[0]], dtype=float)
+    rows = np.arange(n_rows)
+    offset = 0
+    for key in self._feats.keys():
+      if not self._gauss[key]:
+        design[rows, offset + self._index(key, block[key])] = 1.
+        offset += len(self.__values[key])
+        continue
+      vals = np.asarray(block[key], dtype=float)
+      design[:, offset] = vals
+      design[:, offset+1] = vals**2
+      offset += 2
+    return design
+
+#-------------------------------------------------------------------------------
+  def _log_lhood(self, **values):
+    """ Returns the fitted log-likelihood log p(features|class) for
+    broadcastable class and feature values keyed by name (see SD.set_prob()).
+    """
+    if self.__weights is None:
+      self._set_weights()
+    keys = [self._cls.name] + list(self._feats.keys())
+    arrays = np.broadcast_arrays(*[np.asarray(values[key]) for key in keys])
+    shape = arrays[0].shape
+    block = collections.OrderedDict([(key, np.ravel(array))
+                                     for key, array in zip(keys, arrays)])
+    logp = self._design(block).dot(self.__weights) + \
+           self.__bias - self.__log_prior
+    cls_index = self._index(self._cls.name, block[self._cls.name])
+    return logp[np.arange(len(cls_index)), cls_index].reshape(shape)
+
+#-------------------------------------------------------------------------------
+  def _iter_log_posterior(self, data, chunk=None):
+    """ Yields blocks of feature values with their normalised log-posteriors """
+    if self.__weights is None:
+      self._set_weights()
+    for block in self._iter_blocks(data, list(self._feats.keys()), chunk):
+      logp = self._design(block).dot(self.__weights) + self.__bias
+      yield block, log_normalise(logp)
+
+#-------------------------------------------------------------------------------
+  def log_posterior(self, data, chunk=None):
+    """ Returns normalised class log-posteriors for all rows of feature data.
+
+    :param data: dictionary of arrays keyed by feature names, a 2-D array (or
+                 memmap) with columns ordered by features, or an iterable of
+                 either streaming blocks of rows.
+    :param chunk: maximum number of rows processed per block.
+
+    :return: array of log-posteriors of shape (rows, classes).
+    """
+    logps = [logp for _, logp in self._iter_log_posterior(data, chunk)]
+    return logps[0] if len(logps) == 1 else np.vstack(logps)
+
+#-------------------------------------------------------------------------------
+  def predict(self, data, chunk=None, pscale='log'):
+    """ Returns the class posterior distribution for feature data as a Dist
+    keyed by the class RV and conditioned by the features (see
+    log_posterior()). Scalar feature values return a Dist over classes,
+    otherwise feature rows share the first dimension and classes the second.
+
+    :param pscale: probability scale of the returned Dist (default 'log').
+    """
+    keys = list(self._feats.keys())
+    name = "{}|{}".format(self._cls.name, ','.join(keys))
+    blocks, logps = [], []
+    for block, logp in self._iter_log_posterior(data, chunk):
+      blocks.append(block)
+      logps.append(logp)
+    prob = rescale(logps[0] if len(logps) == 1 else np.vstack(logps),
+                   'log', pscale)
+    singleton = isinstance(data, dict) and \
+                all(np.isscalar(data[key]) for key in keys)
+    vals = collections.OrderedDict()
+    dims = collections.OrderedDict()
+    for key in keys:
+      if singleton:
+        vals.update({key: data[key]})
+      else:
+        vals.update({key: np.concatenate([block[key] for block in blocks])})
+      dims.update({key: None if singleton else 0})
+    vals.update({self._cls.name: self._classes})
+    dims.update({self._cls.name: 0 if singleton else 1})
+    return Dist(name, vals, dims, prob[0] if singleton else prob, pscale)
+
+#-------------------------------------------------------------------------------
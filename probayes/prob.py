@@ -6,42 +6,36 @@ of a variable set.
 #-------------------------------------------------------------------------------
 import collections
 import functools
-import numpy as np
-import scipy.stats
 import sympy
 from probayes.icon import isiconic
 from probayes.pscales import eval_pscale, rescale, iscomplex
 from probayes.vtypes import isscalar
 from probayes.expression import Expression
 from probayes.sympy_prob import is_sympy_stats_dist, SympyProb, sympy_sfun
+from probayes.stats_types import scipy_stats_types
+from probayes.mvar_utils import mvn_factor, mvar_eval
 
 #-------------------------------------------------------------------------------
-SCIPY_STATS_CONT = {scipy.stats.rv_continuous}
-SCIPY_STATS_DISC = {scipy.stats.rv_discrete}
-SCIPY_STATS_MVAR = {scipy.stats._multivariate.multi_rv_generic}
-SCIPY_STATS_DIST = SCIPY_STATS_MVAR.union(
-                       SCIPY_STATS_CONT.union(SCIPY_STATS_DISC).\
-                           union(SCIPY_STATS_MVAR))
 SCIPY_DIST_METHODS = ['pdf', 'logpdf', 'pmf', 'logpmf', 'cdf', 'logcdf', 'ppf', 
                       'rvs', 'sf', 'logsf', 'isf', 'moment', 'stats', 'expect', 
                       'entropy', 'fit', 'median', 'mean', 'var', 'std', 'interval']
 
 #-------------------------------------------------------------------------------
-def is_scipy_stats_cont(arg, scipy_stats_cont=SCIPY_STATS_CONT):
+def is_scipy_stats_cont(arg):
   """ Returns if arg belongs to scipy.stats.continuous """
-  return isinstance(arg, tuple(scipy_stats_cont))
+  return isinstance(arg, scipy_stats_types('cont'))
 
-def is_scipy_stats_disc(arg, scipy_stats_disc=SCIPY_STATS_DISC):
+def is_scipy_stats_disc(arg):
   """ Returns if arg belongs to scipy.stats.continuous """
-  return isinstance(arg, tuple(scipy_stats_disc))
+  return isinstance(arg, scipy_stats_types('disc'))
 
-def is_scipy_stats_mvar(arg, scipy_stats_mvar=SCIPY_STATS_MVAR):
+def is_scipy_stats_mvar(arg):
   """ Returns if arg belongs to scipy.stats._multivariate.multi_rv_generic """
-  return isinstance(arg, tuple(scipy_stats_mvar))
+  return isinstance(arg, scipy_stats_types('mvar'))
 
-def is_scipy_stats_dist(arg, scipy_stats_dist=SCIPY_STATS_DIST):
+def is_scipy_stats_dist(arg):
   """ Returns if arg belongs to scipy.stats.continuous or discrete """
-  return isinstance(arg, tuple(scipy_stats_dist))
+  return isinstance(arg, scipy_stats_types('dist'))
 
 #-------------------------------------------------------------------------------
 class Prob (Expression, SympyProb): 
@@ -73,11 +67,13 @@ class Prob (Expression, SympyProb):
   _logp = None       # Boolean flag to denote log probability from pscale
   _pfun = None       # 2-length tuple of cdf/icdf
   _sfun = None       # Random-variate sampling function
+  _prob_version = 0  # Counter incremented whenever the probability is set
 
   # Private
   __isscipy = None   # Boolean flag of whether expression is a scipy stats object
   __issympy = None   # Boolean flag of whether expression is a sympy stats object
   __issmvar = None   # Boolean flag of whether expression is a scipy mvar object
+  __mvn = None       # Cached Cholesky factorisation of scipy mvar normals
 
 #-------------------------------------------------------------------------------
   def __init__(self, prob=None, *args, **kwds):
@@ -111,6 +107,10 @@ class Prob (Expression, SympyProb):
   def issmvar(self):
     return self.__issmvar
 
+  @property
+  def prob_version(self):
+    return self._prob_version
+
   def set_prob(self, prob=None, *args, **kwds):
     """ Sets the probability and pscale with optional arguments and keywords.
 
@@ -121,6 +121,7 @@ class Prob (Expression, SympyProb):
     'pscale' is a reserved keyword. See set_pscale() for explanation of how 
     pscale is used.
     """
+    self._prob_version += 1
     pscale = None if 'pscale' not in kwds else kwds.pop('pscale')
     self.pscale = pscale or self._pscale
     self.__isscipy = is_scipy_stats_dist(prob)
@@ -196,6 +197,7 @@ class Prob (Expression, SympyProb):
       if self.__issmvar and is_scipy_stats_mvar(self._expr):
         self._expr = self._expr(*self._args,  **self._kwds)
         self._args, self._kwds = (), {} # No longer used
+      self.__mvn = mvn_factor(self._expr) if self.__issmvar else None
 
       # Iterate available methods
       for method in SCIPY_DIST_METHODS:
@@ -334,18 +336,13 @@ class Prob (Expression, SympyProb):
 
       # Scipy
       if self.__isscipy:
-        prob = self._partials['logp'] if self._logp else self._partials['prob']
-        if self.issmvar: # for mvar, convert dictionaries to arrays
-          vals = list(args[0].values())
-          if len(vals) == 1:
-            vals = np.array(vals)
-          else:
-            vals = vals[::-1]
-            if len(vals) > 2:
-              vals = vals[1:] + [vals[0]]
-            vals = np.stack(np.meshgrid(*tuple(vals)), axis=-1)
-          prob = prob(vals)
+        if self.issmvar: # for mvar, evaluate dictionary values in chunks
+          method = 'logpdf' if self._logp else 'pdf'
+          prob = mvar_eval(self._expr, list(args[0].values()), method, 
+                           factor=self.__mvn)
         else:
+          prob = self._partials['logp'] if self._logp \
+                 else self._partials['prob']
           prob = prob(*args)
 
       # Sympy distributions are looked after by SympyProb
@@ -5,6 +5,7 @@ probability distribution function without conditioning directions.
 #-------------------------------------------------------------------------------
 import collections
 import numpy as np
+import sympy
 
 from probayes.field import Field
 from probayes.rv import RV
@@ -12,12 +13,16 @@ from probayes.prob import Prob
 from probayes.dist import Dist
 from probayes.dist_utils import margcond_str
 from probayes.vtypes import isscalar, isunitsetint
-from probayes.pscales import iscomplex, prod_pscale
+from probayes.icon import isiconic
+from probayes.pscales import iscomplex, prod_pscale, rescale, logp_offs, \
+                             NEARLY_NEGATIVE_INF
 from probayes.rf_utils import rv_prod_rule, sample_cond_cov
-from probayes.expr import Expr
+from probayes.expr import Expr, lambdify_cse
+from probayes.expr_backends import get_backend
 from probayes.expression import Expression
 from probayes.cf import CF
 from probayes.cond_cov import CondCov
+from probayes.rng import rng_method
 
 DEFAULT_CONDITIONAL_PROBABILITY = {False: 1., True: 0.}
 
@@ -45,10 +50,12 @@ class RF (Field, Prob):
   _tsteps = None     # Number of steps per transitional modificiation
   _cvars = None      # Conditional random variable sampling specification
   _sym_tran = None   # Flag for symmetrical transitional conditional functions
+  _logp_grad = None  # Compiled log probability and gradient function
+  _fold = None       # (key, function, use_logs) of folded iconic RV logps
 
   # Private
   __def_prob = None   # Flag to denote prob is defaulted
-  __cond_mod = None  # conditional RV index modulus
+  __cond_mod = None  # conditional RV index modulus if stepped without tindex
   __cond_cov = None  # conditional covariance matrix
 
 #-------------------------------------------------------------------------------
@@ -98,14 +105,22 @@ class RF (Field, Prob):
 
     'pscale' is a reserved keyword. See Prob.pscale for explanation of how 
     pscale is used. Keyword 'passdims' is reserved to pass a flag to callable
-    prob functions to pass the dimensionality dictionary for values.
+    prob functions to pass the dimensionality dictionary for values. Keyword
+    'backend' is reserved to set the numeric backend used to compile iconic
+    and folded probabilities (see probayes.expr_backends).
     """
     kwds = dict(kwds)
     self._passdims = False if 'passdims' not in kwds else kwds.pop('passdims')
+    backend = None if 'backend' not in kwds else kwds.pop('backend')
+    if backend is not None and isiconic(prob):
+      kwds.update({'backend': backend})
+    self._logp_grad = None
+    self._fold = None
     if 'pscale' not in kwds and self._nvars:
       pscales = [var.pscale for var in self._varlist]
       kwds.update({'pscale': prod_pscale(pscales)})
     super().set_prob(prob, *args, **kwds)
+    self._backend = backend
     if self._prob is None:
       self._default_prob()
     else:
@@ -124,7 +139,7 @@ class RF (Field, Prob):
           prob = prob * mul
         else:
           prob = mul
-      self.set_prob(prob, pscale=self._pscale)
+      self.set_prob(prob, pscale=self._pscale, backend=self._backend)
       self.__def_prob = True
 
 #-------------------------------------------------------------------------------
@@ -305,6 +320,8 @@ class RF (Field, Prob):
       rvs = self._varlist
       if len(rvs) == 1 and rvs[0]._prob is not None:
         prob = rvs[0].eval_prob(values[rvs[0].name])
+      elif self._eval_fold():
+        prob = self._call_fold(values)
       else:
         prob, _ = rv_prod_rule(values, rvs=rvs, pscale=self._pscale)
       return prob
@@ -323,6 +340,119 @@ class RF (Field, Prob):
     return super().eval_prob(values)
 
 #-------------------------------------------------------------------------------
+  def _eval_fold(self):
+    """ Folds the probabilities of independent RVs into a single SymPy product 
+    (or sum of logs for logarithmic pscales) compiled as one broadcasting 
+    function, returning whether successful. This requires each RV probability 
+    to be either scalar (i.e. uniform), for which the function inputs are
+    masked constants, or an iconic expression of only its own variable. The 
+    fold is re-evaluated if any RV probability or the backend changes. """
+    key = (get_backend(self._backend),) + \
+          tuple((var.prob if isinstance(var.prob, sympy.Basic) or \
+                 isscalar(var.prob) else id(var.prob), var.pscale) \
+                for var in self._varlist)
+    if self._fold is not None and self._fold[0] == key:
+      return self._fold[1] is not None
+    use_logs = iscomplex(self._pscale) or \
+               any([iscomplex(var.pscale) for var in self._varlist])
+    func = None
+    terms = []
+    for var in self._varlist:
+      if var.isscalar: # term input as masked constant (see _call_fold())
+        terms.append(var[:])
+        continue
+      prob = var.prob
+      if not var.isiconic or not isinstance(prob, sympy.Expr) or \
+          not prob.free_symbols.issubset({var[:]}):
+        terms = None
+        break
+      if not use_logs:
+        terms.append(prob * var.pscale)
+      else:
+        logp = prob if iscomplex(var.pscale) else sympy.log(prob)
+        terms.append(logp + logp_offs(var.pscale))
+    if terms is not None:
+      expr = sympy.expand_log(sympy.Add(*terms), force=True) if use_logs \
+             else sympy.Mul(*terms) / self._pscale
+      func = lambdify_cse([var[:] for var in self._varlist], [expr],
+                          backend=self._backend)
+    self._fold = (key, func, use_logs)
+    return func is not None
+
+#-------------------------------------------------------------------------------
+  def _call_fold(self, values):
+    """ Evaluates folded RV probabilities (see _eval_fold()) for values """
+    _, func, use_logs = self._fold
+    args = [None] * self._nvars
+    for i, var in enumerate(self._varlist):
+      args[i] = values[var.name]
+      if var.isscalar:
+        prob = rescale(float(var.prob), var.pscale, 0.j if use_logs else 1.)
+        p_zero = -np.inf if use_logs else 0.
+        args[i] = prob if var._inside is None else \
+                  np.where(var._inside(args[i]), prob, p_zero)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      prob = func(*args)[0]
+    shape = np.broadcast(*[np.asarray(arg) for arg in args]).shape
+    if np.shape(prob) != shape:
+      prob = np.broadcast_to(prob, shape)
+    prob = np.array(prob, dtype=float, copy=False)
+    if not shape:
+      prob = float(max(prob, NEARLY_NEGATIVE_INF)) if use_logs else float(prob)
+    elif use_logs:
+      prob = np.maximum(prob, NEARLY_NEGATIVE_INF, out=prob)
+    if use_logs:
+      return rescale(prob, 0.j, self._pscale)
+    return prob
+
+#-------------------------------------------------------------------------------
+  def compile_logp_grad(self):
+    """ Compiles a single function evaluating the log probability and its
+    partial derivatives with respect to each RV, sharing common subexpressions
+    (see sympy.cse). Requires a SymPy or iconic probability. Logarithms of
+    products are expanded, which is valid for non-negative densities and 
+    avoids underflow from exponential factors. """
+    if self.issympy:
+      logp = self._partials['logp'].expr
+    else:
+      assert self._isiconic and isinstance(self._expr, sympy.Expr), \
+          "Gradients require SymPy or iconic probabilities, not {}".format(
+              self._prob)
+      logp = self._expr if iscomplex(self._pscale) else sympy.log(self._expr)
+    logp = sympy.expand_log(logp, force=True)
+    symbols = [var[:] for var in self._varlist]
+    grads = [sympy.diff(logp, symbol) for symbol in symbols]
+    self._logp_grad = lambdify_cse(symbols, [logp] + grads, 
+                                   backend=self._backend)
+    return self._logp_grad
+
+#-------------------------------------------------------------------------------
+  def eval_logp_grad(self, values):
+    """ Evaluates the log probability and its gradient, compiling if necessary
+    (see compile_logp_grad()).
+
+    :param values: dictionary of values keyed by RV name, which may be arrays
+                   with broadcastable shapes for batched evaluation.
+
+    :return: (logp, grad) where grad is a dictionary keyed by RV name of
+             partial derivatives broadcast to the shape of logp.
+    """
+    assert isinstance(values, dict), \
+        "Input to eval_logp_grad() requires values dict"
+    assert set(values.keys()) == self._keyset, \
+      "Sample dictionary keys {} mismatch with RV names {}".format(
+        values.keys(), self._keylist)
+    if self._logp_grad is None:
+      self.compile_logp_grad()
+    args = [values[key] for key in self._keylist]
+    evals = self._logp_grad(*args)
+    shape = np.broadcast(*[np.asarray(arg) for arg in args]).shape
+    evals = [np.broadcast_to(val, shape).astype(float) for val in evals]
+    grad = collections.OrderedDict(zip(self._keylist, evals[1:]))
+    return evals[0], grad
+
+#-------------------------------------------------------------------------------
+  @rng_method
   def eval_delta(self, delta=None):
     delta = super().eval_delta(delta)
 
@@ -352,8 +482,9 @@ class RF (Field, Prob):
     return self._prop(values)
 
 #-------------------------------------------------------------------------------
-  def eval_step(self, pred_vals, succ_vals, reverse=False):
-    """ Returns adjusted succ_vals """
+  @rng_method
+  def eval_step(self, pred_vals, succ_vals, reverse=False, tindex=None):
+    """ Returns adjusted succ_vals (see eval_tfun for tindex) """
     if succ_vals is None:
       if self._delta is None:
         if all([isscalar(pred_value) for pred_value in pred_vals]):
@@ -364,7 +495,7 @@ class RF (Field, Prob):
       return super().eval_step(pred_vals, succ_vals, reverse=reverse)
 
     if self._tfun is not None and self._tfun.callable:
-      succ_vals = self.eval_tfun(pred_vals)
+      succ_vals = self.eval_tfun(pred_vals, tindex=tindex)
     elif self._nvars == 1:
       var = self._varlist[0]
       tran = var.tran
@@ -396,8 +527,11 @@ class RF (Field, Prob):
     return vals, dims, kwargs
 
 #-------------------------------------------------------------------------------
-  def eval_tfun(self, values, *args, reverse=False, **kwds):
-    """ Evaluates tfun from values """
+  def eval_tfun(self, values, *args, reverse=False, tindex=None, **kwds):
+    """ Evaluates tfun from values. If sampling tsteps variables at-a-time, 
+    the optional transition index tindex of the chain determines which 
+    variables are sampled, otherwise the variables are cycled successively 
+    across calls. """
 
     # Handle non-callables first
     if self._tfun is None:
@@ -429,7 +563,11 @@ class RF (Field, Prob):
     # Determine keys distinguishing between default and custom specifications
     inp = self._tfun.ret_inp() # ?
     keys = list(succ_vals.keys()) if not inp else list(inp.keys())
-    if self._tsteps:
+    if self._tsteps and tindex is not None:
+      cond_mod = tindex % int(np.ceil(len(succ_vals) / self._tsteps))
+      cond_mod *= self._tsteps
+      keys = keys[cond_mod:(cond_mod+self._tsteps)]
+    elif self._tsteps:
       if self.__cond_mod is None:
         self.__cond_mod = 0
       keys = keys[self.__cond_mod:(self.__cond_mod+self._tsteps)]
@@ -592,6 +730,7 @@ class RF (Field, Prob):
     or self._tran, that denotes a transitional distirbution. """
 
     reverse = False if 'reverse' not in kwds else kwds.pop('reverse')
+    tindex = None if 'tindex' not in kwds else kwds.pop('tindex')
     pred_vals, succ_vals = None, None 
     if len(args) == 1:
       if isinstance(args[0], (list, tuple)) and len(args[0]) == 2:
@@ -617,7 +756,8 @@ class RF (Field, Prob):
         succ_vals = pred_vals
 
     # Evaluate successor evaluates
-    vals, dims, kwargs = self.eval_step(pred_vals, succ_vals, reverse=reverse)
+    vals, dims, kwargs = self.eval_step(pred_vals, succ_vals, reverse=reverse,
+                                        tindex=tindex)
     succ_vals = {key[:-1]: val for key, val in vals.items() if key[-1] == "'"}
     cond = self.eval_tran(vals, **kwargs)
     dist_succ_name = self.eval_dist_name(succ_vals, "'")
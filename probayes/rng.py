@@ -0,0 +1,113 @@
+"""
+A module to manage random number generators. Random draws throughout probayes
+are obtained from get_rng(), which resolves (in order of precedence) an object's
+own generator (see set_rng() methods), the innermost rng_context() of the
+current thread, the global generator set by set_rng(), and finally NumPy's
+legacy global state (so that np.random.seed() remains honoured).
+"""
+#-------------------------------------------------------------------------------
+import contextlib
+import functools
+import threading
+import numpy as np
+
+#-------------------------------------------------------------------------------
+DEFAULT_BIT_GENERATOR = np.random.PCG64
+RNG_CONTEXT = threading.local() # Thread-local stack of context generators
+RNG_GLOBAL = None               # Global generator (None for NumPy legacy)
+
+#-------------------------------------------------------------------------------
+def eval_rng(rng=None, bit_generator=None):
+  """ Returns a random generator according to the specification rng:
+
+  :param rng: None, a seed (integer or SeedSequence), a NumPy BitGenerator,
+              or a NumPy Generator or RandomState instance.
+  :param bit_generator: BitGenerator class for seeds (default PCG64).
+
+  :return: None if rng is None, otherwise a Generator or RandomState.
+  """
+  if rng is None or isinstance(rng, (np.random.Generator,
+                                     np.random.RandomState)):
+    return rng
+  if isinstance(rng, np.random.BitGenerator):
+    return np.random.Generator(rng)
+  bit_generator = bit_generator or DEFAULT_BIT_GENERATOR
+  assert isinstance(rng, (int, np.integer, np.random.SeedSequence)), \
+      "Unrecognised random generator specification: {}".format(rng)
+  return np.random.Generator(bit_generator(rng))
+
+#-------------------------------------------------------------------------------
+def get_rng(rng=None):
+  """ Returns rng if not None, otherwise the current contextual generator """
+  if rng is not None:
+    return rng
+  stack = getattr(RNG_CONTEXT, 'stack', None)
+  if stack:
+    return stack[-1]
+  if RNG_GLOBAL is not None:
+    return RNG_GLOBAL
+  return np.random.mtrand._rand
+
+#-------------------------------------------------------------------------------
+def set_rng(rng=None, bit_generator=None):
+  """ Sets the global random generator (see eval_rng), where None restores
+  NumPy's legacy global state, returning the generator. """
+  global RNG_GLOBAL
+  RNG_GLOBAL = eval_rng(rng, bit_generator)
+  return RNG_GLOBAL
+
+#-------------------------------------------------------------------------------
+@contextlib.contextmanager
+def rng_context(rng=None, bit_generator=None):
+  """ Context manager within which the current thread draws from the random
+  generator specified by rng (see eval_rng). If rng is None, the context is
+  left unchanged.
+
+  :example:
+  >>> import probayes as pb
+  >>> x = pb.RV('x', vtype=float, vset=[0., 1.])
+  >>> with pb.rng_context(42):
+  ...   samples = x({-3})
+  """
+  rng = eval_rng(rng, bit_generator)
+  if rng is None:
+    yield get_rng()
+    return
+  if getattr(RNG_CONTEXT, 'stack', None) is None:
+    RNG_CONTEXT.stack = []
+  RNG_CONTEXT.stack.append(rng)
+  try:
+    yield rng
+  finally:
+    RNG_CONTEXT.stack.pop()
+
+#-------------------------------------------------------------------------------
+def rng_method(method):
+  """ Decorator to evaluate an instance method within rng_context(self.rng) """
+  @functools.wraps(method)
+  def _method(self, *args, **kwds):
+    if self.rng is None:
+      return method(self, *args, **kwds)
+    with rng_context(self.rng):
+      return method(self, *args, **kwds)
+  return _method
+
+#-------------------------------------------------------------------------------
+def spawn_rngs(number, seed=None, bit_generator=None):
+  """ Returns a list of number statistically independent random generators
+  spawned from seed, e.g. for use by separate threads or processes. """
+  bit_generator = bit_generator or DEFAULT_BIT_GENERATOR
+  seed_seq = seed if isinstance(seed, np.random.SeedSequence) else \
+             np.random.SeedSequence(seed)
+  return [np.random.Generator(bit_generator(child)) \
+          for child in seed_seq.spawn(number)]
+
+#-------------------------------------------------------------------------------
+def rand_int(rng, low, high=None, size=None):
+  """ Returns random integers from low (inclusive) to high (exclusive) for
+  either Generator or RandomState instances. """
+  if isinstance(rng, np.random.Generator):
+    return rng.integers(low, high, size=size)
+  return rng.randint(low, high, size=size)
+
+#-------------------------------------------------------------------------------
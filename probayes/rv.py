@@ -14,8 +14,9 @@ from probayes.pscales import rescale, eval_pscale
 from probayes.expression import Expression
 from probayes.sympy_prob import bernoulli_prob, bernoulli_sfun
 from probayes.rv_utils import uniform_prob, matrix_cond_sample, \
-                          lookup_square_matrix
+                          lookup_square_matrix, tabulate_icdf
 from probayes.distribution import Distribution
+from probayes.rng import get_rng
 
 """
 A random variable is a triple (x, A_x, P_x) defined for an outcome x for every 
@@ -46,9 +47,12 @@ class RV (Variable, Prob):
   # Protected
   _tran = None        # Transitional prob - can be a matrix
   _tfun = None        # Like pfun for transitional conditionals
+  _itab = None        # Tabulated (cdf, icdf) nodes for pfun sampling
 
   # Private
   __def_prob = None   # Flag to denote prob is defaulted
+  __itol = None       # Tolerance for tabulated icdf
+  __ikwds = None      # Keywords for tabulate_icdf
   __sym_tran = None   # Flag to denote symmetric transitional
   __prime_key = None  # Modified-string to denote prime key for variable
 
@@ -152,12 +156,42 @@ class RV (Variable, Prob):
     :param **kwds: keywords to pass to callable functions
     """
     super().set_pfun(pfun, *args, **kwds)
+    self._itab = None
     if self._ufun is None or self._pfun is None:
       return
     assert self._ufun is None, \
       "Cannot assign non-uniform distribution alongside " + \
       "values transformation functions"
 
+#-------------------------------------------------------------------------------
+  @property
+  def itab(self):
+    """ Returns the tabulated (cdf, icdf) nodes if built """
+    return self._itab
+
+  def set_itab(self, tol=None, **kwds):
+    """ Opts in to sampling from a tabulated inverse CDF in place of pfun[1],
+    built once on first sampling and interpolated piecewise-linearly. 
+
+    :param tol: absolute tolerance in variable units (None to disable).
+    :param **kwds: optional min_size and max_size (see tabulate_icdf).
+
+    The table spans the CDF range of self.ulims, so it is rebuilt whenever 
+    pfun or the variable set changes.
+    """
+    self._itab = None
+    self.__itol = tol
+    self.__ikwds = dict(kwds)
+    if self.__itol is None:
+      return
+    assert self._vtype in VTYPES[float], \
+        "Tabulated ICDF sampling only supported for floating point vtypes"
+
+#-------------------------------------------------------------------------------
+  def _eval_ulims(self):
+    self._itab = None
+    return super()._eval_ulims()
+
 #-------------------------------------------------------------------------------
   def set_ufun(self, ufun=None, *args, **kwds):
     """ Sets a monotonic invertible tranformation for the domain as a tuple of
@@ -261,7 +295,8 @@ class RV (Variable, Prob):
           if not number or number < 0:
             number = number if not number else -number
             return Distribution(self._name, 
-                                {self.name: self._sfun[None](number)})
+                                {self.name: self._sfun[None](number, 
+                                  random_state=get_rng(self._rng))})
       return super().evaluate(values)
 
     # Evaluate values from inverse cdf bounded within cdf limits
@@ -272,9 +307,16 @@ class RV (Variable, Prob):
     values = uniform(
                      lims[0], lims[1], number, 
                      isinstance(self._vset[0], tuple),
-                     isinstance(self._vset[1], tuple)
+                     isinstance(self._vset[1], tuple),
+                     rng=self._rng
                     )
-    return Distribution(self._name, {self.name: self.pfun[1](values)})
+    if self.__itol is None:
+      return Distribution(self._name, {self.name: self.pfun[1](values)})
+    if self._itab is None:
+      self._itab = tabulate_icdf(self.pfun, self._ulims, self.__itol, 
+                                 **self.__ikwds)
+    return Distribution(self._name, 
+                        {self.name: np.interp(values, *self._itab)})
 
 #-------------------------------------------------------------------------------
   def eval_prob(self, values=None):
@@ -384,7 +426,8 @@ class RV (Variable, Prob):
         succ_vals, pred_idx, succ_idx = matrix_cond_sample(pred_vals, 
                                                            succ_vals, 
                                                            prob=prob, 
-                                                           vset=self._vset) 
+                                                           vset=self._vset,
+                                                           rng=self._rng) 
         kwargs.update({'pred_idx': pred_idx, 'succ_idx': succ_idx})
       pred_vals, succ_vals, dims = _reshape_vals(pred_vals, succ_vals)
 
@@ -405,7 +448,8 @@ class RV (Variable, Prob):
           lo, hi = float(min(lohi)), float(max(lohi))
           succ_vals = uniform(lo, hi, succ_vals,
                               isinstance(self._vset[0], tuple),
-                              isinstance(self._vset[1], tuple))
+                              isinstance(self._vset[1], tuple),
+                              rng=self._rng)
         else:
           succ_vals = np.atleast_1d(succ_vals)
         kwds.update({self._name: pred_vals,
@@ -1,9 +1,13 @@
+import warnings
 import numpy as np
 from probayes.vtypes import isunitset, isscalar, uniform, eval_vtype, VTYPES
 from probayes.pscales import eval_pscale, rescale, iscomplex, NEARLY_NEGATIVE_INF
 """
 A module to provide functional support to rv.py
 """
+DEFAULT_ITAB_MIN_SIZE = 65    # Initial number of nodes of tabulated icdfs
+DEFAULT_ITAB_MAX_SIZE = 65537 # Maximum number of nodes of tabulated icdfs
+
 #-------------------------------------------------------------------------------
 def uniform_prob(*args, prob=None, inside=None, pscale=1.):
   """ Uniform probability function for discrete and continuous vtypes. """
@@ -47,7 +51,7 @@ def uniform_prob(*args, prob=None, inside=None, pscale=1.):
   return prob
 
 #-------------------------------------------------------------------------------
-def matrix_cond_sample(pred_vals, succ_vals, prob, vset=None):
+def matrix_cond_sample(pred_vals, succ_vals, prob, vset=None, rng=None):
   """ Returns succ_vals with sampling """
   if not isunitset(succ_vals):
     return succ_vals
@@ -67,7 +71,7 @@ def matrix_cond_sample(pred_vals, succ_vals, prob, vset=None):
   cmf = np.cumsum(prob[:, pred_idx], axis=0)
   succ_cmf = list(succ_vals)[0]
   if type(succ_cmf) in VTYPES[int]:
-    succ_cmf = uniform(0., 1., succ_cmf)
+    succ_cmf = uniform(0., 1., succ_cmf, rng=rng)
   else:
     succ_cmf = np.atleast_1d(succ_cmf)
   succ_idx = np.maximum(0, np.minimum(support-1, np.digitize(succ_cmf, cmf)))
@@ -115,3 +119,48 @@ def lookup_square_matrix(col_vals, row_vals, sq_matrix,
   return mat
     
 #-------------------------------------------------------------------------------
+def tabulate_icdf(pfun, lims, tol, 
+                  min_size=DEFAULT_ITAB_MIN_SIZE, 
+                  max_size=DEFAULT_ITAB_MAX_SIZE):
+  """ Tabulates an inverse CDF for piecewise-linear interpolation.
+
+  :param pfun: two-length tuple of callables (cdf, icdf).
+  :param lims: two-length limits of the variable.
+  :param tol: absolute tolerance in variable units of interpolated values.
+  :param min_size: initial number of uniformly spaced CDF nodes.
+  :param max_size: maximum number of nodes before refinement stops.
+
+  :return: two-length tuple of monotonic NumPy arrays (cdf, icdf) 
+  
+  Intervals whose interpolated midpoint deviates from the exact inverse CDF 
+  by more than tol are bisected until all intervals satisfy the tolerance.
+  """
+  assert tol > 0., "Tolerance must be positive, not {}".format(tol)
+  cdf_lims = pfun[0](np.array(lims, dtype=float))
+  lo, hi = float(np.min(cdf_lims)), float(np.max(cdf_lims))
+  cdf = np.linspace(lo, hi, max(min_size, 2))
+  icdf = np.array(pfun[1](cdf), dtype=float)
+  assert np.all(np.isfinite(icdf)), \
+      "Non-finite inverse CDF evaluations within limits {}".format(lims)
+
+  # Bisect intervals that exceed tolerance
+  while True:
+    mid = 0.5 * (cdf[:-1] + cdf[1:])
+    exact = np.array(pfun[1](mid), dtype=float)
+    split = np.abs(exact - 0.5 * (icdf[:-1] + icdf[1:])) > tol
+    nsplit = np.sum(split)
+    if not nsplit:
+      break
+    if cdf.size + nsplit > max_size:
+      warnings.warn("Tabulated ICDF tolerance {} unmet for maximum size {}".\
+                    format(tol, max_size))
+      break
+    cdf = np.concatenate([cdf, mid[split]])
+    icdf = np.concatenate([icdf, exact[split]])
+    order = np.argsort(cdf, kind='stable')
+    cdf, icdf = cdf[order], icdf[order]
+
+  # Guard monotonicity against round-off in the inverse CDF
+  return cdf, np.maximum.accumulate(icdf)
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,62 @@
+"""
+A sampler is an iterable chain of realisations of a stochastic process that
+holds its own state, so that concurrent samplers of the same process share no
+mutable state during sampling.
+"""
+#-------------------------------------------------------------------------------
+from probayes.rng import eval_rng
+
+#-------------------------------------------------------------------------------
+class Sampler:
+  """ An iterator over SP.next() that retains its own step counter and last
+  accepted sample, and optionally its own random generator. Instances are
+  returned by SP.sampler().
+
+  :example:
+  >>> import probayes as pb
+  >>> x = pb.RV('x', vtype=float, vset=[0., 1.])
+  >>> process = pb.SP(pb.RF(x))
+  >>> sampler = process.sampler({0}, stop=3)
+  >>> samples = [sample for sample in sampler]
+  """
+
+  # Public
+  sp = None      # Stochastic process
+  args = None    # Arguments passed to SP.next()
+  kwds = None    # Keywords passed to SP.next()
+  stop = None    # Number of samples before stopping (None for indefinite)
+  counter = None # Number of samples drawn
+  last = None    # Last accepted opqr
+  rng = None     # Random generator (None defers to SP)
+
+#-------------------------------------------------------------------------------
+  def __init__(self, sp, *args, stop=None, rng=None, **kwds):
+    """ Initialises the sampler for process sp with args and kwds to pass to
+    SP.next() with optional stop number and random generator (see eval_rng).
+    """
+    self.sp = sp
+    self.args = tuple(args)
+    self.kwds = dict(kwds)
+    self.stop = stop
+    self.rng = eval_rng(rng)
+    self.reset()
+
+#-------------------------------------------------------------------------------
+  def reset(self, reset_last=True):
+    """ Resets the counter and optionally the last accepted sample """
+    self.counter = 0
+    if reset_last:
+      self.last = None
+
+#-------------------------------------------------------------------------------
+  def __iter__(self):
+    return self
+
+#-------------------------------------------------------------------------------
+  def __next__(self):
+    if self.stop is not None and self.counter >= self.stop:
+      self.reset()
+      raise StopIteration
+    return self.sp.next(self, *self.args, **self.kwds)
+
+#-------------------------------------------------------------------------------
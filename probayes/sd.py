@@ -7,8 +7,15 @@ import networkx as nx
 from probayes.rv import RV
 from probayes.rf import RF
 from probayes.dist_utils import product
-from probayes.sd_utils import desuffix, get_suffixed, arch_prob
+from probayes.sd_utils import desuffix, get_suffixed, arch_prob, PlanStep, \
+                             cond_table, sample_table, sample_var, \
+                             plan_factors
+from probayes.junction_tree import JunctionTree, DEFAULT_HEURISTIC
+from probayes.factor_utils import factor_dist
 from probayes.cf import CF
+from probayes.distribution import Distribution
+from probayes.vtypes import VTYPES
+from probayes.rng import rng_method, get_rng
 
 NX_DIRECTED_GRAPH = nx.OrderedDiGraph
 DEFAULT_CONVERGENCE_FUNCTION = 'mul'
@@ -42,7 +49,11 @@ class SD (NX_DIRECTED_GRAPH, RF):
   # Private
   __sub_rfs = None     # Convenience dictionary for the roots and leafs RFs
   __sub_cfs = None     # Dictionary of conditional functions
+  __sub_sds = None     # List of SDs of dependences neither serial nor parallel
   __sym_tran = None    # Flag to denote symmetrical conditionals
+  __plan = None        # Cached ancestral sampling plan (see compile_plan())
+  __plan_stamp = None  # Probability versions of the cached plan
+  __jtree = None       # Cached junction tree (see junction_tree())
 
 #------------------------------------------------------------------------------- 
   def __init__(self, *args):
@@ -69,6 +80,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
     """
     self._deps = None
     self._arch = None
+    self.__sub_sds = None
     self.__sym_tran = False
     if not args:
       return
@@ -180,6 +192,8 @@ class SD (NX_DIRECTED_GRAPH, RF):
       roots = RF(*tuple(roots))
       return self._refresh(leafs, roots)
 
+    # Otherwise retain the component SDs for their conditional probabilities
+    self.__sub_sds = list(args[::-1])
     return self._refresh()
 
 #-------------------------------------------------------------------------------
@@ -195,6 +209,8 @@ class SD (NX_DIRECTED_GRAPH, RF):
     self._leafs = None
     self._stems = collections.OrderedDict()
     self._roots = None
+    self.__plan = None
+    self.__jtree = None
 
     # If defaulting leafs, then assume a simple RF specification
     if leafs:
@@ -261,6 +277,8 @@ class SD (NX_DIRECTED_GRAPH, RF):
     if prob is not None:
       assert self._deps is None, \
           "Cannot specify probabilities alongside deps conditional dependencies"
+    self.__plan = None
+    self.__jtree = None
     prob = super().set_prob(prob, *args, **kwds)
     if prob is not None or not isinstance(self._arch, (list, tuple)):
       return prob
@@ -276,8 +294,10 @@ class SD (NX_DIRECTED_GRAPH, RF):
       self._arch = None
     if self._deps is None:
       self._deps = collections.OrderedDict()
-    assert not self._prob, \
+    assert not self._prob or self.def_prob, \
         "Cannot assign conditional dependencies alongside specified probability"
+    self.__plan = None
+    self.__jtree = None
     if inp is None and func is None:
       for key, val in out.items():
         self._deps.update({key: val})
@@ -286,11 +306,11 @@ class SD (NX_DIRECTED_GRAPH, RF):
     dep = CF(out, inp, func, *args, **kwds)
     dep_key = dep.ret_name()
     self._deps.update({dep_key: dep})
-    out_keys = list(dep.ret_out().ret_keys(as_list=True))
-    inp_keys = list(dep.ret_inp().ret_keys(as_list=True))
+    out_keys = list(dep.ret_out().keylist)
+    inp_keys = list(dep.ret_inp().keylist)
     for out_key in out_keys:
       for inp_key in inp_keys:
-        self.add_edge(inp_key, out_key)
+        self.add_edge(self._vars[inp_key], self._vars[out_key])
     return collections.OrderedDict({dep_key: self._deps[dep_key]})
 
 #-------------------------------------------------------------------------------
@@ -457,6 +477,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
     return super().evaluate(*args, _skip_parsing=_skip_parsing, **kwds)
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def __call__(self, *args, **kwds):
     """ Like RF.__call__ but optionally takes 'joint' keyword """
 
@@ -472,6 +493,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
     return joint_dist
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def step(self, *args, **kwds):
     prop_obj = self._prop_obj
     if prop_obj is None and (self._tran is not None or self._prop is not None):
@@ -480,6 +502,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
     return prop_obj.step(*args, **kwds)
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def propose(self, *args, **kwds):
     prop_obj = self._prop_obj
     if prop_obj is None and (self._tran is not None or self._prop is not None):
@@ -500,6 +523,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
     return self._tran_obj.parse_args(*args)
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def sample(self, *args, **kwds):
     """ A function for unconditional and conditional sampling. For conditional
     sampling, use RF.set_delta() to set the delta specification. if neither
@@ -531,7 +555,11 @@ class SD (NX_DIRECTED_GRAPH, RF):
     An optional argument args[1] can included in order to input a dictionary
     of values beyond outside the proposition distribution required to evaluate
     the probability distribution.
+
+    If using set_tran(), optional keyword tindex denotes the transition index 
+    of a sampling chain (see RF.eval_tfun()).
     """
+    tindex = None if 'tindex' not in kwds else kwds.pop('tindex')
     if not args: # Default to randomly sampling variable scalars
       args = {0},
     assert len(args) < 3, "Maximum of two positional arguments"
@@ -541,7 +569,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
             "Cannot input opqr object with neither set_prob() nor set_tran() set"
         return self.__call__(*args, **kwds)
       return self._sample_prop(*args, **kwds)
-    return self._sample_tran(*args, **kwds)
+    return self._sample_tran(*args, tindex=tindex, **kwds)
 
 #-------------------------------------------------------------------------------
   def _sample_prop(self, *args, **kwds):
@@ -569,7 +597,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
     return self.opqr(None, call, prop, None)
 
 #-------------------------------------------------------------------------------
-  def _sample_tran(self, *args, **kwds):
+  def _sample_tran(self, *args, tindex=None, **kwds):
     assert 'suffix' not in kwds, \
         "Disallowed keyword 'suffix' when using set_tran()"
 
@@ -580,7 +608,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
 
     # Non-opqr argument requires no parsing
     if not isinstance(args[0], self.opqr):
-      prop = self.step(args[0], **kwds)
+      prop = self.step(args[0], tindex=tindex, **kwds)
 
     # Otherwise parse successor:
     else:
@@ -589,7 +617,7 @@ class SD (NX_DIRECTED_GRAPH, RF):
       assert dist is not None, \
           "An input opqr argument must contain a non-None value for opqr.q"
       vals = get_suffixed(dist.vals)
-      prop = self.step(vals, **kwds)
+      prop = self.step(vals, tindex=tindex, **kwds)
 
     # Evaluate reverse proposal if transition function not symmetric
     if not self._sym_tran and not self._unit_tran:
@@ -606,6 +634,194 @@ class SD (NX_DIRECTED_GRAPH, RF):
 
     return self.opqr(orig, prob, prop, revp)
 
+#-------------------------------------------------------------------------------
+  def _plan_factors(self):
+    """ Returns a list of (out_keys, inp_keys, obj) conditional dependences
+    for ancestral sampling, where obj is a CF or an object with a specified
+    probability of out_keys given inp_keys. """
+    if self._deps:
+      return [(list(dep.ret_out().keylist), list(dep.ret_inp().keylist), dep)
+              for dep in self._deps.values()]
+    subarchs = self._arch if isinstance(self._arch, (list, tuple)) else \
+               self.__sub_sds
+    if subarchs:
+      factors = []
+      for subarch in subarchs:
+        if isinstance(subarch, SD):
+          factors += subarch._plan_factors()
+        elif subarch.prob is not None and not subarch.def_prob:
+          factors.append((list(subarch.keylist), [], subarch))
+      return factors
+    if self._prob is None or self.def_prob:
+      return []
+    roots = [] if not self._roots else list(self._roots.keylist)
+    return [(list(self._leafs.keylist), roots, self)]
+
+#-------------------------------------------------------------------------------
+  def _prob_stamp(self):
+    """ Returns a tuple of probability versions of the SD, its RVs, and any
+    component RFs and SDs, which changes whenever any probability is reset """
+    stamp = [self._prob_version] + [var.prob_version for var in self._varlist]
+    subarchs = self._arch if isinstance(self._arch, (list, tuple)) else \
+               self.__sub_sds
+    if subarchs:
+      for subarch in subarchs:
+        stamp.append(subarch._prob_stamp() if isinstance(subarch, SD) else
+                     subarch.prob_version)
+    return tuple(stamp)
+
+#-------------------------------------------------------------------------------
+  def compile_plan(self):
+    """ Compiles the ancestral sampling plan comprising steps in topological
+    order of the dependence graph, each sampling a group of RVs given their
+    predecessors according to one of the following kinds:
+
+    'deps': conditional function (see add_deps()) evaluated on arrays of draws.
+    'table': conditional probability table evaluated once over discrete vsets,
+             multiplying parallel dependences with common outputs.
+    'var': sampling from the RV itself (for RVs without predecessors).
+
+    The plan is cached until dependences or probabilities are changed,
+    including probabilities of component RVs, RFs, and SDs (see _prob_stamp()).
+    Every RV with predecessors in the graph must be conditioned by them.
+
+    :return: OrderedDict of PlanStep(out, inp, kind, spec) keyed by name.
+    """
+    stamp = self._prob_stamp()
+    if self.__plan is not None and stamp == self.__plan_stamp:
+      return self.__plan
+    self.__jtree = None
+    rank = {var.name: i for i, var in enumerate(nx.topological_sort(self))}
+    groups = collections.OrderedDict()
+    for out_keys, inp_keys, obj in self._plan_factors():
+      group_key = ','.join(out_keys)
+      if group_key not in groups:
+        for group in groups.values():
+          assert not set(out_keys).intersection(group[0]), \
+              "Variables {} conditioned by multiple dependences".format(
+                  out_keys)
+        groups.update({group_key: [out_keys, [], []]})
+      group = groups[group_key]
+      group[1] += [key for key in inp_keys if key not in group[1]]
+      group[2].append(obj)
+    outs = set()
+    for group in groups.values():
+      outs.update(group[0])
+    for key in self._keylist:
+      if key not in outs:
+        groups.update({key: [[key], [], [self._vars[key]]]})
+
+    # Assemble steps in topological order
+    plan = collections.OrderedDict()
+    sampled = set()
+    for out_keys, inp_keys, objs in sorted(groups.values(),
+        key=lambda group: min(rank[key] for key in group[0])):
+      for key in inp_keys:
+        assert key in sampled, \
+            "Variable {} required before sampling {}".format(key, out_keys)
+      name = ','.join(out_keys)
+      if inp_keys:
+        name += "|{}".format(','.join(inp_keys))
+      discrete = all([self._vars[key].vtype not in VTYPES[float]
+                      for key in out_keys + inp_keys])
+      if isinstance(objs[0], CF):
+        assert len(objs) == 1, \
+            "Multiple conditional functions for {}".format(name)
+        step = PlanStep(out_keys, inp_keys, 'deps', objs[0])
+      elif discrete:
+        dists = [obj() for obj in objs]
+        step = PlanStep(out_keys, inp_keys, 'table',
+                        cond_table(dists, out_keys, inp_keys))
+      else:
+        assert isinstance(objs[0], RV) and not inp_keys, \
+            "Sampling {} requires discrete vsets or conditional functions".\
+            format(name)
+        assert objs[0].isfinite or objs[0].pfun is not None, \
+            "Sampling {} with bounds {} requires a pfun (see RV.set_pfun())".\
+            format(name, objs[0].ulims)
+        step = PlanStep(out_keys, inp_keys, 'var', objs[0])
+      plan.update({name: step})
+      sampled.update(out_keys)
+
+    # Every dependence of the graph must be conditioned by the plan
+    for var in self.nodes:
+      preds = set(pred.name for pred in self.predecessors(var))
+      if preds:
+        inps = [step.inp for step in plan.values() if var.name in step.out]
+        assert preds.issubset(inps[0]), \
+            "Plan conditions {} by {} rather than its predecessors {}".format(
+                var.name, inps[0], sorted(preds))
+    self.__plan = plan
+    self.__plan_stamp = stamp
+    return self.__plan
+
+#-------------------------------------------------------------------------------
+  @rng_method
+  def ancestral(self, size=1):
+    """ Returns size joint draws of all RVs by ancestral sampling, sampling
+    each step of the compiled plan (see compile_plan()) for all draws at once.
+
+    :param size: number of joint draws.
+
+    :return: Distribution of draws keyed by RV names sharing one dimension.
+    """
+    plan = self.compile_plan()
+    rng = get_rng()
+    draws = collections.OrderedDict()
+    for step in plan.values():
+      if step.kind == 'table':
+        draws.update(sample_table(*step.spec, step.inp, step.out, draws,
+                                  size, rng))
+      elif step.kind == 'var':
+        draws.update({step.out[0]: sample_var(step.spec, size, rng)})
+      else:
+        output = step.spec(collections.OrderedDict(
+                               [(key, draws[key]) for key in step.inp]))
+        output = output if isinstance(output, dict) else output[0]
+        draws.update({key: np.broadcast_to(output[key], size)
+                      for key in step.out})
+    vals = collections.OrderedDict([(key, draws[key])
+                                    for key in self._keylist])
+    return Distribution(','.join(self._keylist), vals,
+                        dims={key: 0 for key in self._keylist})
+
+#-------------------------------------------------------------------------------
+  def junction_tree(self, heuristic=None):
+    """ Returns the junction tree over the discrete conditional probability
+    tables of the compiled plan (see compile_plan()), cached along with its
+    calibrations until the plan is invalidated.
+
+    :param heuristic: elimination order heuristic ('min_fill', 'min_degree'),
+                      where None reuses any cached tree (or DEFAULT_HEURISTIC).
+    """
+    plan = self.compile_plan() # invalidates any stale junction tree
+    if heuristic is None and self.__jtree is not None:
+      return self.__jtree
+    heuristic = heuristic or DEFAULT_HEURISTIC
+    if self.__jtree is None or self.__jtree.heuristic != heuristic:
+      factors, vals = plan_factors(plan)
+      self.__jtree = JunctionTree(factors, vals, heuristic)
+    return self.__jtree
+
+#-------------------------------------------------------------------------------
+  def posterior(self, query, evidence=None, pscale=None):
+    """ Returns the exact posterior distribution of query RVs given evidence
+    by junction tree inference (see junction_tree()) without evaluating the
+    full joint distribution.
+
+    :param query: RV name, comma-separated RV names, or list of RV names.
+    :param evidence: dictionary of scalar values keyed by RV name.
+    :param pscale: probability scale of the returned Dist (default SD pscale).
+
+    :return: Dist of query RVs conditioned by the evidence.
+    """
+    if isinstance(query, str):
+      query = query.split(',')
+    jtree = self.junction_tree()
+    factor = jtree.query(query, evidence)
+    pscale = self._pscale if pscale is None else pscale
+    return factor_dist(factor, jtree.vals, evidence, pscale)
+
 #-------------------------------------------------------------------------------
   def __and__(self, other):
     return SD(other, self)
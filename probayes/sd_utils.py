@@ -1,7 +1,9 @@
 # Utility module for SD objects
 
 import collections
-from probayes.pscales import prod_rule
+import numpy as np
+from probayes.constants import NEARLY_POSITIVE_ZERO
+from probayes.pscales import prod_rule, rescale
 
 #-------------------------------------------------------------------------------
 def desuffix(values, suffix="'"):
@@ -50,3 +52,107 @@ def arch_prob(arch, dims, **kwds):
   return prob
 
 #-------------------------------------------------------------------------------
+PlanStep = collections.namedtuple('PlanStep', ['out', 'inp', 'kind', 'spec'])
+
+#-------------------------------------------------------------------------------
+def value_index(values, draws):
+  """ Returns indices of draws among 1-D array of unique values """
+  order = np.argsort(values, kind='stable')
+  index = np.minimum(np.searchsorted(values[order], draws), len(values) - 1)
+  index = order[index]
+  assert np.all(values[index] == draws), \
+      "Values {} outside {}".format(np.setdiff1d(draws, values), values)
+  return index
+
+#-------------------------------------------------------------------------------
+def cond_table(dists, out_keys, inp_keys=()):
+  """ Returns a conditional probability table of out_keys given inp_keys from
+  the product of distributions dists evaluated over full grids of values.
+
+  :param dists: list of Dist instances each including all out_keys.
+  :param out_keys: list of keys of conditioned variables.
+  :param inp_keys: list of keys of conditioning variables.
+
+  :return: tuple (vals, table) where vals is an OrderedDict of 1-D arrays of
+           values keyed by inp_keys then out_keys, and table is a 2-D array of
+           conditional probabilities with rows indexing flattened inp values
+           and columns indexing flattened out values.
+  """
+  keys = list(inp_keys) + list(out_keys)
+  vals = collections.OrderedDict()
+  prob = 1.
+  for dist in dists:
+    dist_keys = [key for key in keys if key in dist.dims]
+    for key in out_keys:
+      assert key in dist_keys, \
+          "Distribution {} missing variable {}".format(dist.name, key)
+    for key in dist_keys:
+      assert dist.dims[key] is not None, \
+          "Distribution {} singleton for variable {}".format(dist.name, key)
+      values = np.ravel(dist.vals[key])
+      if key not in vals:
+        vals.update({key: values})
+      assert np.array_equal(vals[key], values), \
+          "Inconsistent values for {} across distributions".format(key)
+    dist_prob = np.transpose(rescale(dist.prob, dist.ret_pscale(), 1.),
+                             [dist.dims[key] for key in dist_keys])
+    shape = [len(vals[key]) if key in dist_keys else 1 for key in keys]
+    prob = prob * dist_prob.reshape(shape)
+  vals = collections.OrderedDict([(key, vals[key]) for key in keys])
+  n_inp = int(np.prod([len(vals[key]) for key in inp_keys]))
+  prob = np.broadcast_to(prob, [len(val) for val in vals.values()])
+  prob = np.array(prob, dtype=float).reshape([n_inp, -1])
+  norm = np.sum(prob, axis=1, keepdims=True)
+  table = np.where(norm > 0., prob / np.maximum(norm, NEARLY_POSITIVE_ZERO),
+                   1. / prob.shape[1])
+  return vals, table
+
+#-------------------------------------------------------------------------------
+def sample_table(vals, table, inp_keys, out_keys, draws, size, rng):
+  """ Samples out_keys given draws of inp_keys from a conditional probability
+  table (see cond_table()) by inverse transform sampling of all size draws.
+  """
+  cumt = np.cumsum(table, axis=1)
+  cumt[:, -1] = 1.
+  shape = [len(vals[key]) for key in inp_keys]
+  rows = np.zeros(size, dtype=int)
+  if inp_keys:
+    index = [np.broadcast_to(value_index(vals[key], draws[key]), size)
+             for key in inp_keys]
+    rows = np.ravel_multi_index(index, shape)
+  unif = rng.uniform(size=size)
+  cols = np.minimum(np.sum(np.expand_dims(unif, -1) >= cumt[rows], axis=-1),
+                    cumt.shape[1] - 1)
+  index = np.unravel_index(cols, [len(vals[key]) for key in out_keys])
+  return collections.OrderedDict([(key, vals[key][idx])
+                                  for key, idx in zip(out_keys, index)])
+
+#-------------------------------------------------------------------------------
+def sample_var(var, size, rng):
+  """ Samples size draws of RV var (see RV.evaluate()), by inverse transform
+  sampling within the CDF limits of its bounds if they are not finite.
+  """
+  if var.isfinite:
+    return var.evaluate({-size})[var.name]
+  lims = var.pfun[0](np.array(var.ulims, dtype=float))
+  return var.pfun[1](rng.uniform(lims[0], lims[1], size=size))
+
+#-------------------------------------------------------------------------------
+def plan_factors(plan):
+  """ Returns a tuple (factors, vals) of log-space factors (keys, logp) for
+  each step of an ancestral sampling plan (see SD.compile_plan()) and the
+  OrderedDict of 1-D value arrays keyed by variable. """
+  factors = []
+  vals = collections.OrderedDict()
+  for name, step in plan.items():
+    assert step.kind == 'table', \
+        "Discrete conditional probability table required for {}".format(name)
+    step_vals, table = step.spec
+    keys = tuple(step_vals.keys())
+    vals.update(step_vals)
+    with np.errstate(divide='ignore'):
+      logp = np.log(table).reshape([len(step_vals[key]) for key in keys])
+    factors.append((keys, logp))
+  return factors, vals
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,334 @@
+"""
+Sequential Monte Carlo (particle filtering) of a state-space process whose
+states evolve according to transitionals specified by set_tran() and set_tfun()
+and emit observations with a likelihood evaluated by an observation RF or SD.
+
+At each time step, particles are propagated through the transitional, weighted
+by the observation likelihood in log-space, and resampled (systematically or by
+stratification) if the Kish effective sample size (ESS) falls below a fraction
+of the number of particles. The log-evidence log p(y_1, ..., y_T) is estimated
+by accumulating the logarithms of the mean weighted likelihoods.
+
+Particle arrays are allocated once and updated in-place, with transitions
+vectorised over all particles for:
+
+- RFs with a covariance matrix transitional (gaussian random walk).
+- RFs with a callable tfun accepting dictionaries of arrays (see
+  RF.eval_tfun()).
+- RVs with a transition matrix (inverse CDF sampling over the vset).
+- RVs with a callable (CDF, ICDF) tfun (inverse CDF sampling, see
+  RV.set_tfun()).
+"""
+#-------------------------------------------------------------------------------
+import collections
+import numpy as np
+from probayes.dist import Dist
+from probayes.pscales import rescale
+from probayes.rng import eval_rng, get_rng, rng_method
+from probayes.sd_utils import value_index
+from probayes.sp_utils import RESAMPLERS, kish_ess
+from probayes.factor_utils import log_sum_exp
+
+#-------------------------------------------------------------------------------
+DEFAULT_PARTICLES = 10000 # Default number of particles
+DEFAULT_RESAMPLER = 'systematic'
+DEFAULT_ESS_FRAC = 0.5    # Default ESS fraction of particles for resampling
+
+#-------------------------------------------------------------------------------
+class SMC:
+  """ A sequential Monte Carlo particle filter for a state-space process.
+
+  :example:
+  >>> import numpy as np
+  >>> import scipy.stats
+  >>> import probayes as pb
+  >>> x = pb.RV('x', [-10., 10.], prob=scipy.stats.norm)
+  >>> process = pb.SP(pb.RF(x))
+  >>> process.set_tran(np.array([[0.1]])) # random walk variance
+  >>> y = pb.RV('y', [-np.inf, np.inf])
+  >>> yx = y | x
+  >>> yx.set_prob(scipy.stats.norm.logpdf, order={'y': 0, 'x': 'loc'},
+  ...             pscale='log')
+  >>> smc = pb.SMC(process, yx, size=100000)
+  >>> dists, log_evid = smc.filter({'y': obs})
+  """
+
+  # Protected
+  _process = None   # State process (SP, SD, RF, or RV)
+  _like = None      # Observation likelihood (RF, SD, or callable)
+  _keys = None      # List of state keys
+  _obs_keys = None  # List of observation keys
+  _size = None      # Number of particles
+  _resampler = None # Resampling method
+  _ess_frac = None  # ESS fraction of particles for resampling
+  _particles = None # OrderedDict of particle arrays keyed by state
+  _logw = None      # Normalised particle log-weights
+  _log_evid = None  # Accumulated log-evidence estimate
+  _ess = None       # List of ESS at each time step before resampling
+  _resampled = None # List of flags denoting resampling at each time step
+  _rng = None       # Random generator (None defers to get_rng())
+
+  # Private
+  __buffer = None      # OrderedDict of particle buffers for resampling
+  __like_pscale = None # Probability scale of likelihoods
+
+#-------------------------------------------------------------------------------
+  def __init__(self, process, like, size=DEFAULT_PARTICLES,
+               resampler=DEFAULT_RESAMPLER, ess_frac=DEFAULT_ESS_FRAC,
+               pscale=None, rng=None):
+    """ Initialises the particle filter.
+
+    :param process: SP, SD, RF, or RV of states with transitionals.
+    :param like: observation RF or SD of observation and state RVs, or a
+                 callable of a dictionary of observations and particle arrays.
+    :param size: number of particles.
+    :param resampler: resampling method ('systematic', 'stratified').
+    :param ess_frac: ESS fraction of size below which particles are resampled.
+    :param pscale: probability scale of callable like outputs (default 1.).
+    :param rng: optional random generator specification (see eval_rng).
+    """
+    self._process = process
+    self._keys = list(process.keylist) if hasattr(process, 'keylist') else \
+                 [process.name]
+    self._like = like
+    if hasattr(self._like, 'keylist'):
+      self._obs_keys = [key for key in self._like.keylist
+                        if key not in self._keys]
+      self.__like_pscale = self._like.pscale
+    else:
+      assert callable(self._like), \
+          "Likelihood must be an RF, SD, or callable, not {}".format(
+              type(self._like))
+      self.__like_pscale = 1. if pscale is None else pscale
+    self._size = int(size)
+    assert self._size > 0, \
+        "Number of particles must be positive, not {}".format(size)
+    self.set_resampler(resampler, ess_frac)
+    self.set_rng(rng)
+    self._particles = collections.OrderedDict()
+    self.__buffer = collections.OrderedDict()
+    self._logw = np.empty(self._size, dtype=float)
+
+#-------------------------------------------------------------------------------
+  @property
+  def process(self):
+    return self._process
+
+  @property
+  def like(self):
+    return self._like
+
+  @property
+  def keys(self):
+    return self._keys
+
+  @property
+  def size(self):
+    return self._size
+
+  @property
+  def particles(self):
+    return self._particles
+
+  @property
+  def logw(self):
+    return self._logw
+
+  @property
+  def log_evid(self):
+    return self._log_evid
+
+  @property
+  def ess(self):
+    return self._ess
+
+  @property
+  def resampled(self):
+    return self._resampled
+
+  @property
+  def n_steps(self):
+    return len(self._ess)
+
+  @property
+  def rng(self):
+    return self._rng
+
+  def set_rng(self, rng=None, bit_generator=None):
+    """ Sets the random generator used for propagation, resampling, and
+    initial draws (see eval_rng). """
+    self._rng = eval_rng(rng, bit_generator)
+    return self._rng
+
+#-------------------------------------------------------------------------------
+  def set_resampler(self, resampler=DEFAULT_RESAMPLER,
+                    ess_frac=DEFAULT_ESS_FRAC):
+    """ Sets the resampling method and ESS fraction threshold """
+    assert resampler in RESAMPLERS, \
+        "Unknown resampler {}; available: {}".format(resampler,
+                                                     set(RESAMPLERS.keys()))
+    assert 0. <= ess_frac <= 1., \
+        "ESS fraction must be in range [0, 1], not {}".format(ess_frac)
+    self._resampler = resampler
+    self._ess_frac = float(ess_frac)
+
+#-------------------------------------------------------------------------------
+  def _varlist(self):
+    return self._process.varlist if hasattr(self._process, 'varlist') else \
+           [self._process]
+
+#-------------------------------------------------------------------------------
+  @rng_method
+  def reset(self, init=None):
+    """ Initialises particles from init, a dictionary of particle values keyed
+    by state (broadcast to size), defaulting to independent random draws from
+    each RV (see RV.evaluate()), with uniform weights. """
+    init = init or {}
+    for var in self._varlist():
+      key = var.name
+      val = init[key] if key in init else var.evaluate({-self._size})[key]
+      val = np.asarray(val)
+      dtype = float if np.issubdtype(val.dtype, np.floating) else val.dtype
+      if key not in self._particles or \
+          self._particles[key].dtype != dtype:
+        self._particles[key] = np.empty(self._size, dtype=dtype)
+        self.__buffer[key] = np.empty(self._size, dtype=dtype)
+      self._particles[key][:] = val
+    self._logw.fill(-np.log(self._size))
+    self._log_evid = 0.
+    self._ess = []
+    self._resampled = []
+
+#-------------------------------------------------------------------------------
+  def _propagate(self):
+    """ Propagates particles in-place through the transitionals """
+    rng = get_rng()
+    tran = getattr(self._process, 'tran', None)
+    tfun = getattr(self._process, 'tfun', None)
+    if hasattr(self._process, 'varlist') and tran is not None and \
+        not tran.callable and not tran.isscalar: # gaussian random walk
+      chol = tfun()
+      delta = rng.standard_normal(size=(self._size, len(self._keys)))
+      delta = delta.dot(chol.T)
+      for i, key in enumerate(self._keys):
+        self._particles[key] += delta[:, i]
+      return
+    if hasattr(self._process, 'varlist') and tfun is not None and \
+        tfun.callable:
+      succ_vals = self._process.eval_tfun(
+          collections.OrderedDict(self._particles))
+      for key in self._keys:
+        self._particles[key][:] = succ_vals[key]
+      return
+    for var in self._varlist():
+      self._propagate_rv(var, rng)
+
+#-------------------------------------------------------------------------------
+  def _propagate_rv(self, var, rng):
+    """ Propagates particles of RV var in-place by inverse CDF sampling """
+    key = var.name
+    pred = self._particles[key]
+    tran, tfun = var.tran, var.tfun
+    unif = rng.uniform(size=self._size)
+    if tran is not None and not tran.callable and not tran.isscalar:
+      prob = tran() if not tran.ismulti else tran[0]()
+      vals = np.array(sorted(var.vset)) # matrix order (see RV.eval_tran())
+      cmf = np.cumsum(prob, axis=0)
+      pred_idx = value_index(vals, pred)
+      succ_idx = np.sum(unif * cmf[-1, pred_idx] > cmf[:, pred_idx], axis=0)
+      np.take(vals, np.minimum(succ_idx, len(vals) - 1), out=pred)
+      return
+    assert tfun is not None and tfun.callable, \
+        ("Vectorised propagation of {} requires a transition matrix or "
+         "callable (CDF, ICDF) tfun").format(key)
+    lo, hi = min(var.ulims), max(var.ulims)
+    cdf_lo = tfun[0](**{key: pred, key+"'": lo})
+    cdf_hi = tfun[0](**{key: pred, key+"'": hi})
+    unif = cdf_lo + (cdf_hi - cdf_lo) * unif
+    pred[:] = tfun[1](**{key: pred, key+"'": unif})
+
+#-------------------------------------------------------------------------------
+  def log_like(self, obs):
+    """ Returns particle log-likelihoods for a dictionary of observations """
+    values = collections.OrderedDict(obs)
+    values.update(self._particles)
+    if hasattr(self._like, 'eval_prob'):
+      prob = self._like.eval_prob({key: values[key]
+                                   for key in self._like.keylist})
+    else:
+      prob = self._like(values)
+    prob = np.array(np.broadcast_to(prob, [self._size]), dtype=float)
+    return rescale(prob, self.__like_pscale, 'log')
+
+#-------------------------------------------------------------------------------
+  def dist(self):
+    """ Returns a Dist of copied particle values with normalised log-weights """
+    name = ','.join(self._keys)
+    if self._obs_keys:
+      name += "|{}".format(','.join(self._obs_keys))
+    vals = collections.OrderedDict(
+        [(key, np.array(val)) for key, val in self._particles.items()])
+    dims = collections.OrderedDict([(key, 0) for key in vals.keys()])
+    return Dist(name, vals, dims, np.array(self._logw), 'log')
+
+#-------------------------------------------------------------------------------
+  @rng_method
+  def step(self, obs):
+    """ Performs one filtering step for a dictionary of scalar observations
+    obs (or a scalar for a single observation RV), propagating particles
+    except at the first step, weighting by the likelihood, and resampling
+    if the ESS falls below the threshold. Returns the weighted filtering Dist
+    before any resampling. """
+    assert self._particles, "Particles uninitialised; use reset()"
+    if not isinstance(obs, dict):
+      assert self._obs_keys is not None and len(self._obs_keys) == 1, \
+          "Dictionary of observations required"
+      obs = {self._obs_keys[0]: obs}
+    if self._ess:
+      self._propagate()
+    loglik = self.log_like(obs)
+    log_inc = log_sum_exp(self._logw + loglik)
+    self._log_evid += float(log_inc)
+    self._logw += loglik
+    self._logw -= log_inc
+    ess = kish_ess(self._logw)
+    self._ess.append(ess)
+    dist = self.dist()
+    resample = ess < self._ess_frac * self._size
+    self._resampled.append(resample)
+    if resample:
+      index = RESAMPLERS[self._resampler](self._logw, self._size, get_rng())
+      for key in self._keys:
+        np.take(self._particles[key], index, out=self.__buffer[key])
+        self._particles[key], self.__buffer[key] = \
+            self.__buffer[key], self._particles[key]
+      self._logw.fill(-np.log(self._size))
+    return dist
+
+#-------------------------------------------------------------------------------
+  @rng_method
+  def filter(self, obs, init=None):
+    """ Returns filtering distributions for a sequence of observations.
+
+    :param obs: dictionary of 1-D arrays of observations keyed by observation
+                name, or such an array for a single observation RV.
+    :param init: optional initial particles (see reset()).
+
+    :return: a tuple of a list of filtering Dists of weighted particles per
+             time step and the log-evidence estimate.
+    """
+    if not isinstance(obs, dict):
+      assert self._obs_keys is not None and len(self._obs_keys) == 1, \
+          "Dictionary of observations required"
+      obs = {self._obs_keys[0]: obs}
+    obs = collections.OrderedDict([(key, np.asarray(val))
+                                   for key, val in obs.items()])
+    n_steps = set(len(val) for val in obs.values())
+    assert len(n_steps) == 1, \
+        "Observation sequences of unequal lengths {}".format(n_steps)
+    self.reset(init)
+    dists = [self.step({key: val[t] for key, val in obs.items()})
+             for t in range(list(n_steps)[0])]
+    return dists, self._log_evid
+
+#-------------------------------------------------------------------------------
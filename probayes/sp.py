@@ -5,13 +5,19 @@ samples a directed graph.
 """
 #-------------------------------------------------------------------------------
 import collections
-import inspect
+import threading
 import warnings
+import numpy as np
 from probayes.sd import SD
 from probayes.expression import Expression
 from probayes.dist import Dist
 from probayes.dist_utils import summate
-from probayes.sp_utils import sample_generator, MCMC_SAMPLERS
+from probayes.vtypes import uniform
+from probayes.pscales import rescale, NEARLY_NEGATIVE_INF
+from probayes.rng import rng_method, rng_context
+from probayes.sp_utils import MCMC_SAMPLERS, DEFAULT_MAX_BATCH, \
+                             normalise_logw, kish_ess
+from probayes.sampler import Sampler
 
 #-------------------------------------------------------------------------------
 class SP (SD):
@@ -26,12 +32,12 @@ class SP (SD):
   _update = None # Update function (output True, None, or False)
 
   # Private
-  __samplers = None  # List of samplers
-  __counter = None   # Step counter
-  __last = None      # Last argument ordereddict
+  __samplers = None  # List of samplers each retaining their own state
+  __lock = None      # Lock for registering samplers
 
 #-------------------------------------------------------------------------------
   def __init__(self, *args, **kwds):
+    self.__lock = threading.Lock()
     super().__init__(*args, **kwds)
     self.reset()
 
@@ -107,20 +113,13 @@ class SP (SD):
 #-------------------------------------------------------------------------------
   def reset(self, sampler_id=None, reset_last=True): # Leave option to preseve
     if self.__samplers is None or sampler_id is None:
-      self.__samplers = []
-    if self.__counter is None:
-      self.__counter = collections.Counter()
-    if self.__last is None:
-      self.__last = collections.OrderedDict()
+      with self.__lock:
+        self.__samplers = []
     if sampler_id is None:
       return
     sampler = self.get_sampler(sampler_id)
-    self.__counter[sampler] = 0
-    if sampler not in self.__last:
-      self.__last[sampler] = None
-    elif reset_last:
-      self.__last[sampler] = None
-    return self.__samplers, self.__counter, self.__last
+    sampler.reset(reset_last)
+    return sampler
 
 #-------------------------------------------------------------------------------
   def __call__(self, *args, **kwds):
@@ -203,30 +202,41 @@ class SP (SD):
 #-------------------------------------------------------------------------------
   def get_counter(self, sampler_id=None):
     if sampler_id is None:
-      return self.__counter
-    return self.__counter[self.get_sampler(sampler_id)]
+      return collections.Counter({sampler: sampler.counter \
+                                  for sampler in self.__samplers})
+    return self.get_sampler(sampler_id).counter
 
 #-------------------------------------------------------------------------------
   def get_last(self, sampler_id=None):
     if sampler_id is None:
-      return self.__last
-    return self.__last[self.get_sampler(sampler_id)]
+      return collections.OrderedDict([(sampler, sampler.last) \
+                                      for sampler in self.__samplers])
+    return self.get_sampler(sampler_id).last
 
 #-------------------------------------------------------------------------------
+  @rng_method
   def next(self, sampler_id, *args, **kwds):
-
-    # Reset counters
+    """ Returns the next sample of the sampler identified by sampler_id,
+    updating only the state retained by the sampler. """
     sampler = self.get_sampler(sampler_id)
-    self.__counter[sampler] += 1
-    last = self.__last[sampler]
+    with rng_context(sampler.rng):
+      return self._next(sampler, *args, **kwds)
+
+#-------------------------------------------------------------------------------
+  def _next(self, sampler, *args, **kwds):
+
+    # Increment counter
+    tindex = sampler.counter
+    sampler.counter += 1
+    last = sampler.last
     no_proposal = self._tran is None and self._tfun is None and \
                   not self._unit_tran and self._prop is None
 
     # Treat sampling without proposals as a distribution call
     if last is None or no_proposal:
-      opqr = self.sample(*args, **kwds)
       if no_proposal:
-        return opqr
+        return self.sample(*args, **kwds)
+      opqr = self.sample(*args, tindex=tindex, **kwds)
 
     # Otherwise refeed last proposals into sample function
     else:
@@ -234,10 +244,10 @@ class SP (SD):
           self._delta is None:
         last = {0}
       if len(args) < 2:
-        opqr = self.sample(last, **kwds)
+        opqr = self.sample(last, tindex=tindex, **kwds)
       else:
         args = tuple([last] + list(args[1:]))
-        opqr = self.sample(*args, **kwds)
+        opqr = self.sample(*args, tindex=tindex, **kwds)
 
     # Set to last if accept is not False
     stuv = self.stuv(self.eval_expr(self._scores, opqr),
@@ -246,14 +256,19 @@ class SP (SD):
                      None)
     update = self.eval_expr(self._update, stuv)
     verdit = opqr.o
-    if self._update is None or self.__last[sampler] is None or update:
-      self.__last[sampler] = opqr
+    if self._update is None or sampler.last is None or update:
+      sampler.last = opqr
       verdit = opqr.p
     return self.opqrstuv(opqr.o, opqr.p, opqr.q, opqr.r, 
                          stuv.s, stuv.t, update, verdit)
 
 #-------------------------------------------------------------------------------
   def sampler(self, *args, **kwds):
+    """ Returns a Sampler iterator with optional keywords stop (number of
+    samples) and rng (random generator for the sampler, see eval_rng). 
+    Each sampler retains its own state so that separate samplers of the same 
+    process may be iterated concurrently (e.g. from different threads).
+    """
     if self.__samplers is None:
       self.reset()
     if not args:
@@ -262,22 +277,17 @@ class SP (SD):
       kwds.update({'stop': args[0]})
       args = {0},
     stop = None if 'stop' not in kwds else kwds.pop('stop')
-    sampler = sample_generator(self, 
-                               len(self.__samplers), 
-                               *args, 
-                               stop=stop, 
-                               **kwds)
-    self.__samplers.append(sampler)
-    self.__counter[sampler] = 0
-    self.__last[sampler] = None
+    rng = None if 'rng' not in kwds else kwds.pop('rng')
+    sampler = Sampler(self, *args, stop=stop, rng=rng, **kwds)
+    with self.__lock:
+      self.__samplers.append(sampler)
     return sampler
 
 #-------------------------------------------------------------------------------
   def walk(self, sampler, stop=None):
-    gen_vars = inspect.getgeneratorlocals(sampler)
-    assert 'stop' in gen_vars, \
-        'Sampler must be a sampler_generator instance returned by SP.sampler()'
-    if stop is None and gen_vars['stop'] is None:
+    assert isinstance(sampler, Sampler), \
+        'Sampler must be a Sampler instance returned by SP.sampler()'
+    if stop is None and sampler.stop is None:
       warnings.warn(
         "No stop specification set - this walk may proceed indefinitely")
     if stop is None: 
@@ -289,4 +299,117 @@ class SP (SD):
       steps.append(sample)
     return steps
 
+#-------------------------------------------------------------------------------
+  def eval_batch(self, size):
+    """ Evaluates a batch of size proposals sharing a single dimension, 
+    returning a two-length tuple of the proposal and target distributions. """
+    prop_obj = self._prop_obj or self
+    prop = self.propose({','.join(prop_obj.keylist): {-size}}, suffix=False)
+    prob = self.__call__(prop.ret_marg_vals())
+    return prop, prob
+
+#-------------------------------------------------------------------------------
+  @rng_method
+  def rejection_sample(self, n, envelope=None, batch=None, 
+                             max_batch=DEFAULT_MAX_BATCH):
+    """ Vectorised rejection sampling of n samples from the target probability 
+    using proposal batches from set_prop() (or the prior if unset).
+
+    :param n: number of accepted samples to return.
+    :param envelope: scalar coefficient M of the proposal density q such that
+                     p <= M*q, or a callable of the proposal values returning 
+                     envelope densities. If None, M is estimated as the 
+                     running maximum ratio p/q over batches, warning if
+                     increased since earlier acceptances may be biased.
+    :param batch: initial batch size (defaults to n).
+    :param max_batch: maximum batch size.
+
+    :return: a Dist of n accepted samples sharing a single dimension.
+
+    Each batch accepts proposals for which u*envelope < p for uniform u with 
+    comparisons performed in log space. Subsequent batch sizes are adapted to 
+    the observed acceptance rate.
+    """
+    assert n > 0, "Number of samples must be positive, not {}".format(n)
+    if callable(envelope):
+      envelope = Expression(envelope)
+    batch = min(n if batch is None else batch, max_batch)
+    log_coef = None
+    estimate = envelope is None
+    if envelope is not None and not isinstance(envelope, Expression):
+      assert envelope > 0., "Envelope coefficient must be positive"
+      log_coef = np.log(envelope)
+    name = None
+    vals = collections.OrderedDict()
+    probs = []
+    n_prop, n_accept = 0, 0
+    while n_accept < n:
+      prop, prob = self.eval_batch(batch)
+      logp = np.ravel(rescale(prob.prob, self._pscale, 0.j).real)
+      if isinstance(envelope, Expression):
+        loge = np.log(np.ravel(envelope(**prop.vals)))
+      else:
+        loge = np.ravel(rescale(prop.prob, self._pscale, 0.j).real)
+        if estimate:
+          log_max = np.max(logp - loge)
+          if log_coef is None:
+            log_coef = log_max
+          elif log_max > log_coef:
+            warnings.warn("Estimated envelope coefficient increased from " + \
+                          "{} to {}; ".format(np.exp(log_coef),
+                                              np.exp(log_max)) + \
+                          "samples accepted previously may be biased")
+            log_coef = log_max
+        loge = loge + log_coef
+      with np.errstate(divide='ignore', invalid='ignore'):
+        accept = np.logical_and(logp > NEARLY_NEGATIVE_INF,
+                                np.log(uniform(0., 1., -batch)) < logp - loge)
+      if name is None:
+        name = prob.name
+        vals.update({key: [] for key in prop.vals.keys()})
+      for key in vals.keys():
+        vals[key].append(np.ravel(prop.vals[key])[accept])
+      probs.append(np.ravel(prob.prob)[accept])
+      n_prop += batch
+      n_accept += int(np.sum(accept))
+
+      # Adapt batch size to acceptance rate aiming to complete in one batch
+      rate = max(n_accept / n_prop, 1. / max_batch)
+      batch = int(min(max_batch, np.ceil(1.1 * (n - n_accept) / rate)))
+
+    vals = collections.OrderedDict({key: np.concatenate(val)[:n] \
+                                    for key, val in vals.items()})
+    dims = collections.OrderedDict({key: 0 for key in vals.keys()})
+    prob = np.concatenate(probs)[:n]
+    return Dist(name, vals, dims, prob, self._pscale)
+
+#-------------------------------------------------------------------------------
+  @rng_method
+  def importance_sample(self, n):
+    """ Importance sampling from a single batch of n proposals.
+
+    :param n: number of proposals.
+
+    :return dist: a Dist of the proposals with probabilities comprising the 
+                  self-normalised log-weights (pscale='log').
+    :return ess: Kish effective sample size of the weights.
+
+    Weights are evaluated in log space as the ratio of target to proposal 
+    probabilities from set_prop() (or the prior if unset). The returned Dist 
+    supports weighted expectation() directly, and quantile() if univariate 
+    since its values are then sorted.
+    """
+    assert n > 0, "Number of samples must be positive, not {}".format(n)
+    prop, prob = self.eval_batch(n)
+    logw = rescale(np.ravel(prob.prob), self._pscale, 0.j).real - \
+           rescale(np.ravel(prop.prob), self._pscale, 0.j).real
+    logw = normalise_logw(logw)
+    vals = collections.OrderedDict({key: np.ravel(val) \
+                                    for key, val in prop.vals.items()})
+    dims = collections.OrderedDict({key: 0 for key in vals.keys()})
+    dist = Dist(prob.name, vals, dims, logw, 'log')
+    if len(vals) == 1:
+      dist = dist.sorted(list(vals.keys())[0])
+    return dist, kish_ess(logw)
+
 #-------------------------------------------------------------------------------
@@ -3,17 +3,48 @@
 import numpy as np
 from probayes.vtypes import isscalar
 from probayes.pscales import rescale, div_prob
+from probayes.rng import get_rng
 
 #-------------------------------------------------------------------------------
-def sample_generator(sp, sampler_id, *args, stop=None, **kwds):
-  if stop is None:
-    while True:
-      yield sp.next(sampler_id, *args, **kwds)
-  else:
-    while sp.get_counter(sampler_id) < stop:
-      yield sp.next(sampler_id, *args, **kwds)
-    else:
-      sp.reset(sampler_id)
+DEFAULT_MAX_BATCH = 1048576 # Maximum batch size for vectorised sampling
+
+#-------------------------------------------------------------------------------
+def normalise_logw(logw):
+  """ Returns log-weights normalised to sum to unity in linear space """
+  logw = np.asarray(logw, dtype=float)
+  max_logw = np.max(logw)
+  return logw - (max_logw + np.log(np.sum(np.exp(logw - max_logw))))
+
+#-------------------------------------------------------------------------------
+def kish_ess(logw):
+  """ Returns the Kish effective sample size of (unnormalised) log-weights """
+  return float(1. / np.sum(np.exp(2. * normalise_logw(logw))))
+
+#-------------------------------------------------------------------------------
+def systematic_resample(logw, size=None, rng=None):
+  """ Returns size indices resampled from log-weights by systematic
+  resampling, i.e. a single uniform offset for equally spaced strata """
+  size = len(logw) if size is None else size
+  cdf = np.cumsum(np.exp(normalise_logw(logw)))
+  unif = (get_rng(rng).uniform() + np.arange(size)) / size
+  return np.minimum(np.searchsorted(cdf, unif * cdf[-1], side='right'),
+                    len(cdf) - 1)
+
+#-------------------------------------------------------------------------------
+def stratified_resample(logw, size=None, rng=None):
+  """ Returns size indices resampled from log-weights by stratified
+  resampling, i.e. an independent uniform offset within each stratum """
+  size = len(logw) if size is None else size
+  cdf = np.cumsum(np.exp(normalise_logw(logw)))
+  unif = (get_rng(rng).uniform(size=size) + np.arange(size)) / size
+  return np.minimum(np.searchsorted(cdf, unif * cdf[-1], side='right'),
+                    len(cdf) - 1)
+
+#-------------------------------------------------------------------------------
+RESAMPLERS = {
+    'systematic': systematic_resample,
+    'stratified': stratified_resample,
+             }
 
 #-------------------------------------------------------------------------------
 def metropolis_scores(opqr, pscale=None):
@@ -28,7 +59,7 @@ def metropolis_scores(opqr, pscale=None):
 
 #-------------------------------------------------------------------------------
 def metropolis_thresh(*args, **kwds):
-  return np.random.uniform(*args, **kwds)
+  return get_rng().uniform(*args, **kwds)
 
 #-------------------------------------------------------------------------------
 def metropolis_update(stu):
@@ -0,0 +1,46 @@
+"""
+Deferred registries of SciPy and SymPy statistical distribution types. Since
+importing scipy.stats and sympy.stats is slow, the registries are only
+constructed once those packages have been imported (by the user or otherwise),
+before which no instance of their types can exist.
+"""
+#-------------------------------------------------------------------------------
+import sys
+import collections
+
+#-------------------------------------------------------------------------------
+SCIPY_STATS_TYPES = collections.OrderedDict() # Keyed by 'cont', 'disc', etc.
+SYMPY_STATS_TYPES = collections.OrderedDict() # Keyed by 'dist'
+
+#-------------------------------------------------------------------------------
+def scipy_stats_types(kind='dist'):
+  """ Returns a tuple of scipy.stats distribution types according to kind:
+
+  :param kind: 'cont' (continuous), 'disc' (discrete), 'mvar' (multivariate),
+               or 'dist' (any of the above).
+
+  :return: tuple of types (empty if scipy.stats has not been imported).
+  """
+  if 'scipy.stats' not in sys.modules:
+    return ()
+  if not SCIPY_STATS_TYPES:
+    import scipy.stats
+    cont = (scipy.stats.rv_continuous,)
+    disc = (scipy.stats.rv_discrete,)
+    mvar = (scipy.stats._multivariate.multi_rv_generic,)
+    SCIPY_STATS_TYPES.update({'cont': cont, 'disc': disc, 'mvar': mvar,
+                              'dist': cont + disc + mvar})
+  return SCIPY_STATS_TYPES[kind]
+
+#-------------------------------------------------------------------------------
+def sympy_stats_types(kind='dist'):
+  """ Returns a tuple of sympy.stats distribution types (empty if sympy.stats
+  has not been imported) """
+  if 'sympy.stats' not in sys.modules:
+    return ()
+  if not SYMPY_STATS_TYPES:
+    import sympy.stats
+    SYMPY_STATS_TYPES.update({'dist': (sympy.stats.rv.RandomSymbol,)})
+  return SYMPY_STATS_TYPES[kind]
+
+#-------------------------------------------------------------------------------
@@ -6,16 +6,17 @@ import collections
 import functools
 import numpy as np
 import sympy
-import sympy.stats
-import scipy.stats
 from probayes.expr import Expr
+from probayes.stats_types import sympy_stats_types
 
 
 #-------------------------------------------------------------------------------
-SYMPY_STATS_DIST = {sympy.stats.rv.RandomSymbol}
-def is_sympy_stats_dist(arg, sympy_stats_dist=SYMPY_STATS_DIST):
+DEFAULT_SOLVE_OPS = 40     # Maximum CDF operation count to attempt solve()
+DEFAULT_ICDF_XTOL = 1e-10  # Relative tolerance for numerical inverse CDFs
+DEFAULT_ICDF_ITER = 200    # Maximum bisection iterations
+def is_sympy_stats_dist(arg):
   """ Returns if arguments belongs to sympy.stats.continuous or discrete """
-  return isinstance(arg, tuple(sympy_stats_dist))
+  return isinstance(arg, sympy_stats_types('dist'))
 
 #-------------------------------------------------------------------------------
 def sympy_obj_from_dist(dist, _recursive=False):
@@ -47,7 +48,7 @@ def sympy_obj_from_dist(dist, _recursive=False):
   return None
 
 #-------------------------------------------------------------------------------
-def sympy_sfun(distr, size=0, dtype=None, _sfunc=sympy.stats.sample):
+def sympy_sfun(distr, size=0, dtype=None, _sfunc=None):
   """ Sampling function for Sympy distributions where:
 
   :param distr: Sympy stats distribution
@@ -56,6 +57,9 @@ def sympy_sfun(distr, size=0, dtype=None, _sfunc=sympy.stats.sample):
 
   :return randomly samples from distribution.
   """
+  if _sfunc is None:
+    import sympy.stats # deferred since slow to import
+    _sfunc = sympy.stats.sample
   if not size:
     samples = _sfunc(distr)
     if dtype:
@@ -80,12 +84,128 @@ def bernoulli_prob(var, bias=0.5):
   return var * (2*bias - 1) + (1 - bias)
 
 #-------------------------------------------------------------------------------
-def bernoulli_sfun(size=None, bias=0.5):
+def bernoulli_sfun(size=None, bias=0.5, random_state=None):
   """ Returns Bernoulli random variates of given size for given bias """
+  import scipy.stats # deferred since slow to import
   bern = scipy.stats.bernoulli(p=float(bias))
   if not size:
-    return bool(bern.rvs())
-  return bern.rvs(size).astype(bool)
+    return bool(bern.rvs(random_state=random_state))
+  return bern.rvs(size, random_state=random_state).astype(bool)
+
+#-------------------------------------------------------------------------------
+def bisect_icdf(cdf, values, lims=(-np.inf, np.inf), xtol=DEFAULT_ICDF_XTOL,
+                max_iter=DEFAULT_ICDF_ITER):
+  """ Numerically inverts a monotonic vectorised CDF function by bisection.
+
+  :param cdf: vectorised CDF function.
+  :param values: cumulative probabilities to invert.
+  :param lims: support limits (may be infinite).
+  :param xtol: relative tolerance.
+  :param max_iter: maximum number of bisection iterations.
+
+  :return: array of inverse CDF evaluations.
+  """
+  values = np.asarray(values, dtype=float)
+  icdf = np.full(values.shape, np.nan)
+  icdf[values <= 0.] = lims[0]
+  icdf[values >= 1.] = lims[1]
+  inside = np.logical_and(values > 0., values < 1.)
+  if not np.any(inside):
+    return icdf
+  probs = values[inside]
+  p_min, p_max = np.min(probs), np.max(probs)
+
+  # Find finite brackets by geometric expansion about an interior point
+  lo, hi = float(lims[0]), float(lims[1])
+  centre = 0. if not np.isfinite(lo) and not np.isfinite(hi) else \
+           lo + 1. if not np.isfinite(hi) else \
+           hi - 1. if not np.isfinite(lo) else 0.5 * (lo + hi)
+  width = 1.
+  while not np.isfinite(lo) and cdf(np.array([centre - width]))[0] > p_min:
+    width *= 2.
+  lo = lo if np.isfinite(lo) else centre - width
+  width = 1.
+  while not np.isfinite(hi) and cdf(np.array([centre + width]))[0] < p_max:
+    width *= 2.
+  hi = hi if np.isfinite(hi) else centre + width
+
+  # Vectorised bisection
+  lo = np.full(probs.shape, lo)
+  hi = np.full(probs.shape, hi)
+  for _ in range(max_iter):
+    mid = 0.5 * (lo + hi)
+    below = cdf(mid) < probs
+    lo = np.where(below, mid, lo)
+    hi = np.where(below, hi, mid)
+    if np.max(hi - lo) <= xtol * max(1., np.max(np.abs(mid))):
+      break
+  icdf[inside] = 0.5 * (lo + hi)
+  return icdf
+
+#-------------------------------------------------------------------------------
+class LazyExpr:
+  """ A callable proxy for an Expr, whose SymPy expression and evaluation 
+  functions are only computed on first access. If the builder returns a
+  non-SymPy callable, calls are delegated to it and expr is None.
+
+  :example
+  >>> import sympy
+  >>> from probayes.sympy_prob import LazyExpr
+  >>> x = sympy.Symbol('x')
+  >>> lazy = LazyExpr(lambda: x + 1)
+  >>> print(lazy(1))
+  2
+  """
+
+  # Protected
+  _builder = None # Function returning a SymPy expression or callable
+  _kwds = None    # Keywords to pass to Expr
+  _built = None   # Flag denoting whether built
+  _expr = None    # SymPy expression (None if not iconic)
+  _call = None    # Expr instance or callable
+
+#-------------------------------------------------------------------------------
+  def __init__(self, builder, **kwds):
+    self._builder = builder
+    self._kwds = dict(kwds)
+    self._built = False
+
+#-------------------------------------------------------------------------------
+  @property
+  def built(self):
+    return self._built
+
+  @property
+  def expr(self):
+    self._build()
+    return self._expr
+
+#-------------------------------------------------------------------------------
+  def _build(self):
+    """ Evaluates the builder once """
+    if self._built:
+      return
+    built = self._builder()
+    if isinstance(built, sympy.Basic):
+      self._expr = built
+    else:
+      assert callable(built), \
+          "Builder must return a SymPy expression or callable: {}".format(built)
+      self._call = built
+    self._built = True
+
+#-------------------------------------------------------------------------------
+  def __call__(self, *args, **kwds):
+    self._build()
+    if self._call is None:
+      self._call = Expr(self._expr, **self._kwds)
+    return self._call(*args, **kwds)
+
+#-------------------------------------------------------------------------------
+  def __repr__(self):
+    if not self._built:
+      return "{}(unbuilt)".format(type(self).__name__)
+    return repr(self._expr) if self._expr is not None else repr(self._call)
 
 #-------------------------------------------------------------------------------
 class SympyProb:
@@ -146,32 +266,87 @@ class SympyProb:
     if not isinstance(self._cterm, sympy.Symbol):
       raise TypeError("Unexpected first argument type: {}".format(type(self._cterm)))
     
-    # Set PDF, CDF, ICDF
+    # Set PDF, CDF, ICDF lazily since only evaluated on first call
     if hasattr(self._probj, 'pdf'):
-      self._exprs.update({'prob': Expr(self._probj.pdf(self._cterm))})
-      self._exprs.update({'logp': Expr(sympy.log(self._exprs['prob'].expr))})
+      self._exprs.update({'prob': LazyExpr(self._build_prob)})
+      self._exprs.update({'logp': LazyExpr(self._build_logp)})
     if hasattr(self._probj, '_cdf'):
-      try:
-        cdf_expr = Expr(self._probj._cdf(self._cterm))
-        self._exprs.update({'cdf': cdf_expr})
-      except:
-        pass
-    if 'cdf' in self._exprs.keys():
       icdf_name = "_{}_cdf".format(self._cterm.name)
       self.__icdf = sympy.Symbol(icdf_name)
-      invexprs = sympy.solve(self._exprs['cdf'].expr - self.__icdf,  self._cterm)
-      n_exprs = len(invexprs)
-      if n_exprs:
-        invexpr = invexprs[0]
-        if n_exprs > 1:
-          for expr in invexprs[1:]:
-            if len(expr.__repr__()) < len(invexpr.__repr__()):
-              invexpr = expr
-        self._exprs.update({'icdf': Expr(invexpr, remap={self._cterm.name: icdf_name})})
+      self._exprs.update({'cdf': LazyExpr(self._build_cdf)})
+      self._exprs.update({'icdf': LazyExpr(self._build_icdf, 
+                                      remap={self._cterm.name: icdf_name})})
 
     # Set sampling function
     self._exprs.update({'sfun': functools.partial(sympy_sfun, self._distr)})
 
+#-------------------------------------------------------------------------------
+  def _build_prob(self):
+    return self._probj.pdf(self._cterm)
+
+#-------------------------------------------------------------------------------
+  def _build_logp(self):
+    return sympy.log(self._exprs['prob'].expr)
+
+#-------------------------------------------------------------------------------
+  def _build_cdf(self):
+    return self._probj.cdf(self._cterm)
+
+#-------------------------------------------------------------------------------
+  def _build_icdf(self):
+    """ Returns the inverse CDF expression from the distribution quantile or by
+    solving the CDF if sufficiently simple, otherwise a numerical inverse. """
+    invexpr = None
+    if hasattr(self._probj, '_quantile'):
+      try:
+        invexpr = self._probj._quantile(self.__icdf)
+      except (NotImplementedError, TypeError, ValueError):
+        invexpr = None
+    cdf_expr = self._exprs['cdf'].expr
+    if invexpr is None and sympy.count_ops(cdf_expr) <= DEFAULT_SOLVE_OPS:
+      try:
+        invexprs = sympy.solve(cdf_expr - self.__icdf, self._cterm)
+      except (NotImplementedError, TypeError, ValueError):
+        invexprs = []
+      for expr in invexprs:
+        if invexpr is None or len(expr.__repr__()) < len(invexpr.__repr__()):
+          invexpr = expr
+    if isinstance(invexpr, sympy.Basic) and \
+        invexpr.free_symbols == {self.__icdf} and \
+        self._check_icdf(invexpr):
+      return invexpr
+    return self._numeric_icdf
+
+#-------------------------------------------------------------------------------
+  def _check_icdf(self, invexpr, values=(0.1, 0.5, 0.9)):
+    """ Returns whether an inverse CDF expression inverts the CDF, since
+    solutions may lie on the wrong branch. """
+    cdf_expr = self._exprs['cdf'].expr
+    for value in values:
+      try:
+        icdf = complex(invexpr.subs({self.__icdf: value}).evalf())
+        if icdf.imag or not np.isfinite(icdf):
+          return False
+        cdf = complex(cdf_expr.subs({self._cterm: icdf.real}).evalf())
+      except (TypeError, ValueError):
+        return False
+      if not np.isclose(cdf.real, value):
+        return False
+    return True
+
+#-------------------------------------------------------------------------------
+  def _numeric_icdf(self, *args, **kwds):
+    """ Numerical inverse CDF with the calling conventions of Expr """
+    values = args[0] if len(args) == 1 and not kwds else kwds
+    if isinstance(values, dict):
+      values = values[self._cterm.name] if self._cterm.name in values else \
+               list(values.values())[0]
+    support = self._probj.set
+    lims = (float(support.inf), float(support.sup)) if \
+           isinstance(support, sympy.Interval) else (-np.inf, np.inf)
+    icdf = bisect_icdf(self._exprs['cdf'], values, lims)
+    return icdf if icdf.ndim else float(icdf)
+
 #-------------------------------------------------------------------------------
   def __getitem__(self, arg):
     """ Returns class member or partials dictionary object according to arg:
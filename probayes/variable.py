@@ -14,6 +14,7 @@ from probayes.variable_utils import parse_as_str_dict
 from probayes.pscales import log_prob
 from probayes.expression import Expression
 from probayes.distribution import Distribution
+from probayes.rng import eval_rng, get_rng, rand_int
 
 # Defaults
 DEFAULT_VNAME = 'var'
@@ -67,6 +68,7 @@ class Variable (Icon):
   _delta = None      # Default delta operation
   _delta_args = None # Optional delta arguments 
   _delta_kwds = None # Optional delta keywords 
+  _rng = None        # Random generator (None defers to get_rng())
 
   # Private       
   __no_ucov = None   # Boolean flag to denote no univariate change of variables
@@ -400,6 +402,17 @@ class Variable (Icon):
     if 'bound' not in self._delta_kwds:
       self._delta_kwds.update({'bound': False})
 
+#-------------------------------------------------------------------------------
+  @property
+  def rng(self):
+    return self._rng
+
+  def set_rng(self, rng=None, bit_generator=None):
+    """ Sets the random generator for sampling this variable (see eval_rng),
+    where None defers to the contextual generator (see get_rng). """
+    self._rng = eval_rng(rng, bit_generator)
+    return self._rng
+
 #-------------------------------------------------------------------------------
   @property
   def icon(self):
@@ -554,12 +567,12 @@ class Variable (Icon):
       if self._vtype not in VTYPES[float]:
         values = np.array(list(self._vset), dtype=self._vtype)
         if not number:
-          values = values[np.random.randint(0, len(values))]
+          values = values[rand_int(get_rng(self._rng), 0, len(values))]
         else:
           if number > 0:
             indices = np.arange(number, dtype=int) % self._length
           else:
-            indices = np.random.permutation(-number) % self._length
+            indices = get_rng(self._rng).permutation(-number) % self._length
           values = values[indices]
         return Distribution(self._name, {self.name: values})
        
@@ -570,7 +583,8 @@ class Variable (Icon):
                 values, self._ulims)
         values = uniform(self._ulims[0], self._ulims[1], number, 
                            isinstance(self._vset[0], tuple), 
-                           isinstance(self._vset[1], tuple)
+                           isinstance(self._vset[1], tuple),
+                           rng=self._rng
                         )
 
       # Only use ufun when isunitsetint(values)
@@ -613,16 +627,16 @@ class Variable (Icon):
       assert len(delta) == 1, "Tuple delta must contain one element"
       delta = delta[0]
       if self._vtype not in VTYPES[bool]:
-        delta = delta if np.random.uniform() > 0.5 else -delta
+        delta = delta if get_rng(self._rng).uniform() > 0.5 else -delta
     elif urand:
       assert len(delta) == 1, "List delta must contain one element"
       delta = delta[0]
       if self._vtype in VTYPES[bool]:
         pass
       elif self._vtype in VTYPES[int]:
-        delta = np.random.randint(-delta, delta)
+        delta = rand_int(get_rng(self._rng), -delta, delta)
       else:
-        delta = np.random.uniform(-delta, delta)
+        delta = get_rng(self._rng).uniform(-delta, delta)
     assert isscalar(delta), "Unrecognised delta type: {}".format(delta)
     if delta == self._delta and self._delta_kwds['scale']:
       assert np.isfinite(self._length), "Cannot scale by infinite length"
@@ -673,10 +687,10 @@ class Variable (Icon):
         assert len(delta) == 1, "Tuple/list delta must contain one element"
         delta = delta[0]
         if isscalar(values) or orand:
-          vals = values if delta > np.random.uniform() > 0.5 \
+          vals = values if delta > get_rng(self._rng).uniform() > 0.5 \
                  else np.logical_not(values)
         else:
-          flip = delta > np.random.uniform(size=values.shape)
+          flip = delta > get_rng(self._rng).uniform(size=values.shape)
           vals = np.copy(values)
           vals[flip] = np.logical_not(vals[flip])
       else:
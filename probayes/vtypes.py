@@ -7,6 +7,7 @@ import numpy as np
 import sympy
 import functools
 import operator
+from probayes.rng import get_rng
 
 #-------------------------------------------------------------------------------
 VTYPES = {
@@ -170,7 +171,8 @@ def uniform(v_0=0,
             v_1=1, 
             n=None,
             ex_0=False,
-            ex_1=False):
+            ex_1=False,
+            rng=None):
   r""" Samples $n$ points in the range $v_0$ to $v_1$ with optional exclusion of
   respective limits according to boolean flags values (default False) given by
   ex_0 and ex_1. The sampled values are uniformly obtained in the range 
@@ -179,13 +181,15 @@ def uniform(v_0=0,
   If $n<0$, then $-n$ points are sampled randomly (ignoring limit exclusions).
   If $n=0$, then a single scalar value is sampled randomly.
   If $n>0$, then $n$ points are linearly sampled according to limit exclusions.
+
+  Random draws are obtained from rng if not None, otherwise from get_rng().
   """
 
   # Zero or negative denote random uniform
   if not n:
-    return np.random.uniform(v_0, v_1)
+    return get_rng(rng).uniform(v_0, v_1)
   if n < 0:
-    return np.random.uniform(v_0, v_1, size=-n)
+    return get_rng(rng).uniform(v_0, v_1, size=-n)
 
   # Using linspace may require slicing
   if not ex_0 and not ex_1:
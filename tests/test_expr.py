@@ -3,13 +3,17 @@
 #-------------------------------------------------------------------------------
 import pytest
 import math
+import warnings
 import numpy as np
 import sympy as sy
 import probayes as pb
+from probayes.expr_cache import DEFAULT_EXPR_CACHE_SIZE
 
 #-------------------------------------------------------------------------------
 LOG_TESTS = [(math.exp(1.),1.)]
 INC_TESTS = [(3,4), (np.linspace(-3, 3, 7), np.linspace(-2, 4, 7))]
+KERNEL_TESTS = ['heaviside', 'min', 'erfinv', 'lowergamma', 'piecewise']
+BACKEND_TESTS = ['numpy', 'numexpr', 'numba']
 
 #-------------------------------------------------------------------------------
 @pytest.mark.parametrize("inp,out", LOG_TESTS)
@@ -44,3 +48,84 @@ def test_inc(inp, out):
         f_x, out)
 
 #-------------------------------------------------------------------------------
+@pytest.mark.parametrize("func", KERNEL_TESTS)
+def test_kernel(func):
+  x, y = sy.Symbol('x'), sy.Symbol('y')
+  expr = {'heaviside': sy.Heaviside(x - y),
+          'min': sy.Min(x, y),
+          'erfinv': sy.erfinv(x*y),
+          'lowergamma': sy.lowergamma(2, x + y),
+          'piecewise': sy.Piecewise((x, x < y), (1., True))}[func]
+  expr = pb.Expr(expr)
+  x_vals = np.linspace(0.1, 0.9, 5).reshape([5, 1])
+  y_vals = np.linspace(0.2, 0.8, 4).reshape([1, 4])
+  with warnings.catch_warnings():
+    warnings.simplefilter('error', RuntimeWarning)
+    vals = expr({'x': x_vals, 'y': y_vals})
+  assert vals.shape == (5, 4), "Kernel output not broadcast"
+  for i, j in [(0, 0), (2, 1), (4, 3)]:
+    val = float(expr[:].subs({x: x_vals[i, 0], y: y_vals[0, j]}))
+    assert np.isclose(vals[i, j], val), "Kernel output {} not {}".format(
+        vals[i, j], val)
+
+#-------------------------------------------------------------------------------
+def test_subs_warning():
+  x, y = sy.Symbol('x'), sy.Symbol('y')
+  expr = pb.Expr(sy.Integral(sy.exp(-y**2), (y, 0, x)))
+  with pytest.warns(RuntimeWarning):
+    vals = expr({'x': np.array([0., 1.])})
+  assert np.allclose(vals, [0., 0.746824]), "Slow path output incorrect"
+
+#-------------------------------------------------------------------------------
+def test_expr_cache(tmp_path):
+  x, y = sy.Symbol('x'), sy.Symbol('y')
+  expr = sy.exp(-x**2) * sy.erfinv(y)
+  x_vals = np.linspace(-1., 1., 5).reshape([5, 1])
+  y_vals = np.linspace(-0.5, 0.5, 3).reshape([1, 3])
+  pb.set_expr_cache(cache_dir=tmp_path)
+  pb.clear_expr_cache()
+  try:
+    vals = pb.Expr(expr)({'x': x_vals, 'y': y_vals})
+    stats = pb.expr_cache_stats()
+    assert stats['misses'] == 1 and stats['disk_writes'] == 1, \
+        "Expression not cached: {}".format(stats)
+    cached_vals = pb.Expr(expr)({'x': x_vals, 'y': y_vals})
+    assert pb.expr_cache_stats()['hits'] == 1, "In-process cache not used"
+    pb.clear_expr_cache()
+    disk_vals = pb.Expr(expr)({'x': x_vals, 'y': y_vals})
+    assert pb.expr_cache_stats()['disk_hits'] == 1, "On-disk cache not used"
+    pb.set_expr_cache(maxsize=16)
+    assert pb.expr_cache_stats()['cache_dir'] == str(tmp_path), \
+        "Resizing disabled the on-disk cache"
+  finally:
+    pb.set_expr_cache(maxsize=DEFAULT_EXPR_CACHE_SIZE, cache_dir=False)
+    pb.clear_expr_cache()
+  assert np.allclose(vals, cached_vals) and np.allclose(vals, disk_vals), \
+      "Cached expression outputs differ"
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("backend", BACKEND_TESTS)
+def test_backend(backend):
+  x = sy.Symbol('x')
+  y = sy.Symbol('y')
+  expr = sy.exp(-x**2 / 2) * sy.sqrt(y**2 + 1)
+  vals = {'x': np.linspace(-2., 2., 5).reshape([5, 1]), 
+          'y': np.linspace(-1., 1., 3).reshape([1, 3])}
+  expected = np.exp(-vals['x']**2 / 2) * np.sqrt(vals['y']**2 + 1)
+  with warnings.catch_warnings(): # unavailable backends fall back to NumPy
+    warnings.simplefilter('ignore', RuntimeWarning)
+    assert pb.get_backend(backend) in pb.available_backends(), \
+        "Backend {} unresolved".format(backend)
+    pb.set_backend(backend)
+    try:
+      output = pb.Expr(expr)(vals)
+      erf_output = pb.Expr(sy.erf(x))(vals['x'])
+    finally:
+      pb.set_backend()
+  assert np.allclose(output, expected), \
+      "Backend {} output incorrect".format(backend)
+  erf_expected = [math.erf(val) for val in vals['x'].ravel()]
+  assert np.allclose(erf_output.ravel(), erf_expected), \
+      "Backend {} fallback output incorrect".format(backend)
+
+#-------------------------------------------------------------------------------
@@ -14,6 +14,14 @@ FUNCT_TESTS = [(np.negative, 2.), (np.reciprocal, 2.),
     ((np.log, np.exp), 2.), ({'key_0': np.exp, 'key_1': np.log}, 2.)]
 LAMBDA_TESTS = [(lambda x: np.negative(x), 2.), (lambda x: np.reciprocal(x), 2.)]
 SYMPY_TESTS = [((sympy.log, sympy.exp), 2.), (sympy.log, 2)]
+ORDER_TESTS = [({'x': 0, 'mu': 'loc', 'sigma': 'scale'}, (), 
+                {'x': 0.3, 'mu': 0.1, 'sigma': 2.}, (0.3, 0.1, 2.)),
+               ({'mu': 1, 'sigma': 2, 'x': None}, (0.3,), 
+                {'x': 0.3, 'mu': 0.1, 'sigma': 2.}, (0.3, 0.1, 2.)),
+               ({'sigma': 'scale', 'scale': 'loc', 'x': 0}, (), # sequential
+                {'x': 0.3, 'scale': 0.1, 'sigma': 2.}, (0.3, 2., 1.))]
+DELTA_TESTS = [({"x'": 0, 's': 1}, {"x'": 2., 'x': 0.5, 's': 3.}, 4.5),
+               ({"x'": 'x', 'y': None}, {"x'": 2., 'x': 0.5, 'y': 3.}, 1.5)]
 
 #-------------------------------------------------------------------------------
 @pytest.mark.parametrize("values", VALUE_TESTS)
@@ -77,3 +85,23 @@ def test_sympys(func, vals):
   assert np.isclose(vals, reverse), "Reversal did not reverse"
 
 #-------------------------------------------------------------------------------
+@pytest.mark.parametrize("order, args, vals, params", ORDER_TESTS)
+def test_order(order, args, vals, params):
+  expected = scipy.stats.norm.logpdf(*params)
+  expr = pb.Expression(scipy.stats.norm.logpdf, order=order)
+  for _ in range(2): # adapter must not retain state between calls
+    assert np.isclose(expr(*args, **vals), expected), \
+        "Order mapping {} incorrect".format(order)
+    if not args:
+      assert np.isclose(expr(dict(vals)), expected), \
+          "Order mapping {} incorrect for dict input".format(order)
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("delta, vals, expected", DELTA_TESTS)
+def test_delta(delta, vals, expected):
+  expr = pb.Expression(lambda x, s=1.: x * s, delta=delta)
+  for _ in range(2):
+    assert np.isclose(expr(vals), expected), \
+        "Delta mapping {} incorrect".format(delta)
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,120 @@
+# Module to test hidden Markov models
+
+#-------------------------------------------------------------------------------
+import pytest
+import itertools
+import numpy as np
+import probayes as pb
+
+#-------------------------------------------------------------------------------
+HMM_TESTS = [(4, 'scaled', 0), (5, 'log', 1), (3, 'scaled', 2)]
+BATCH_TESTS = [(8, 50, 0), (3, 400, 1)]
+
+#-------------------------------------------------------------------------------
+def gauss_hmm(seed, n_states=3):
+  rng = np.random.default_rng(seed)
+  tran = rng.uniform(0.1, 1., size=[n_states, n_states])
+  tran = tran / np.sum(tran, axis=0) # columns conditioned by predecessors
+  x = pb.RV('x', vtype=int, vset=list(range(n_states)))
+  x.set_tran(tran)
+  y = pb.RV('y', vtype=float, vset=[-np.inf, np.inf])
+  yx = y | x
+  yx.set_prob(lambda y, x: np.exp(-0.5 * (y - x)**2) / np.sqrt(2. * np.pi))
+  return pb.HMM(x, yx), tran
+
+#-------------------------------------------------------------------------------
+def brute_force(hmm, tran, obs):
+  """ Returns joint probabilities of all state paths with observations """
+  n_states = len(hmm.vals)
+  emit = np.exp(-0.5 * (obs[:, None] - hmm.vals)**2) / np.sqrt(2. * np.pi)
+  paths = list(itertools.product(range(n_states), repeat=len(obs)))
+  prob = np.empty(len(paths), dtype=float)
+  for i, path in enumerate(paths):
+    prob[i] = emit[0, path[0]] / n_states
+    for t in range(1, len(obs)):
+      prob[i] *= tran[path[t], path[t-1]] * emit[t, path[t]]
+  return np.array(paths), prob
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("n_steps, method, seed", HMM_TESTS)
+def test_hmm(n_steps, method, seed):
+  hmm, tran = gauss_hmm(seed)
+  obs = np.random.default_rng(seed).normal(1., 1., size=n_steps)
+  paths, prob = brute_force(hmm, tran, obs)
+  post, log_evid = hmm.forward_backward({'y': obs}, method=method)
+  assert len(post) == n_steps, "Incorrect number of posterior Dists"
+  assert np.isclose(log_evid, np.log(np.sum(prob))), "Log-evidence mismatch"
+  for t in range(n_steps):
+    marg = np.bincount(paths[:, t], weights=prob, minlength=len(hmm.vals))
+    assert np.allclose(post[t].prob, marg / np.sum(marg)), \
+        "Posterior mismatch at step {}".format(t)
+  filt, filt_evid = hmm.filter(obs, method=method)
+  assert np.isclose(filt_evid, log_evid), "Filtering log-evidence mismatch"
+  assert np.allclose(filt[-1].prob, post[-1].prob), "Filtering mismatch"
+  path, log_prob = hmm.viterbi(obs)
+  assert np.array_equal(path, paths[np.argmax(prob)]), "Viterbi path mismatch"
+  assert np.isclose(log_prob, np.log(np.max(prob))), "MAP probability mismatch"
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("n_batch, n_steps, seed", BATCH_TESTS)
+def test_hmm_batch(n_batch, n_steps, seed):
+  hmm, _ = gauss_hmm(seed)
+  obs = np.random.default_rng(seed).normal(1., 1., size=[n_batch, n_steps])
+  post, log_evid = hmm.forward_backward({'y': obs}, pscale='log')
+  log_post, log_log_evid = hmm.forward_backward({'y': obs}, method='log',
+                                                pscale='log')
+  paths, _ = hmm.viterbi({'y': obs})
+  assert log_evid.shape == (n_batch,), "Incorrect log-evidence shape"
+  assert paths.shape == (n_batch, n_steps), "Incorrect path shape"
+  assert np.allclose(log_evid, log_log_evid), "Method log-evidence mismatch"
+  for t in [0, n_steps // 2, n_steps - 1]:
+    assert post[t].prob.shape == (n_batch, len(hmm.vals)), \
+        "Incorrect batched posterior shape"
+    assert np.allclose(post[t].prob, log_post[t].prob), "Method mismatch"
+  for i in [0, n_batch - 1]:
+    single, single_evid = hmm.forward_backward(obs[i])
+    assert np.isclose(single_evid, log_evid[i]), "Batch log-evidence mismatch"
+    assert np.allclose(single[-1].prob, np.exp(post[-1].prob[i])), \
+        "Batch posterior mismatch"
+    path, _ = hmm.viterbi(obs[i])
+    assert np.array_equal(path, paths[i]), "Batch path mismatch"
+
+#-------------------------------------------------------------------------------
+def test_hmm_vset_order():
+  hmm, tran = gauss_hmm(3, n_states=2)
+  x = pb.RV('x', vtype=int, vset=[1, 0])
+  x.set_tran(tran) # indexed by sorted vset (see RV.eval_tran())
+  y = pb.RV('y', vtype=float, vset=[-np.inf, np.inf])
+  yx = y | x
+  yx.set_prob(lambda y, x: np.exp(-0.5 * (y - x)**2) / np.sqrt(2. * np.pi))
+  rev = pb.HMM(x, yx)
+  assert np.array_equal(rev.vals, [1, 0]), "State values not in vset order"
+  vals = {'x': rev.vals.reshape([1, -1]), "x'": rev.vals.reshape([-1, 1])}
+  assert np.allclose(np.exp(rev.log_tran), x.eval_tran(vals)), \
+      "Transitions inconsistent with RV.eval_tran()"
+  obs = np.random.default_rng(3).normal(0.5, 1., size=6)
+  post, log_evid = hmm.forward_backward(obs)
+  rev_post, rev_evid = rev.forward_backward(obs)
+  assert np.isclose(rev_evid, log_evid), "Log-evidence depends on vset order"
+  for t in range(len(obs)):
+    assert np.allclose(rev_post[t].prob, post[t].prob[::-1]), \
+        "Posterior mismatch at step {}".format(t)
+  path, _ = hmm.viterbi(obs)
+  rev_path, _ = rev.viterbi(obs)
+  assert np.array_equal(rev_path, path), "Viterbi path depends on vset order"
+
+#-------------------------------------------------------------------------------
+def test_hmm_callable_emit():
+  hmm, tran = gauss_hmm(4)
+  emit = lambda obs, state: -0.5 * (obs - state)**2 - 0.5 * np.log(2. * np.pi)
+  hmm_emit = pb.HMM(hmm.state, emit, pscale='log')
+  obs = np.random.default_rng(4).normal(1., 1., size=[2, 5])
+  _, log_emit = hmm_emit.log_emission(obs)
+  assert log_emit.shape == (2, 5, len(hmm.vals)), "Incorrect emission shape"
+  post, log_evid = hmm.forward_backward(obs)
+  emit_post, emit_evid = hmm_emit.forward_backward(obs)
+  assert np.allclose(emit_evid, log_evid), "Callable log-evidence mismatch"
+  assert np.allclose(emit_post[-1].prob, post[-1].prob), \
+      "Callable posterior mismatch"
+
+#-------------------------------------------------------------------------------
@@ -36,3 +36,16 @@ def test_inc(inp, out):
     assert close, "Output value {} not as expected {}".format(output, out)
 
 #-------------------------------------------------------------------------------
+def test_delegation():
+  x = pb.Icon('x')
+  assert x.name == 'x' and x.is_Symbol, "Icon attributes not delegated"
+  assert sympy.sympify(x) is x, "Icon not accepted by sympify"
+  assert len(vars(x)) < 10, "Icon instance dictionary too large"
+  expr = pb.Expr(x[:] + 1)
+  assert expr.is_Add and expr.free_symbols == {x[:]}, \
+      "Expr attributes not delegated"
+  assert len(vars(expr)) < 10, "Expr instance dictionary too large"
+  with pytest.raises(AttributeError):
+    x.not_an_attribute
+
+#-------------------------------------------------------------------------------
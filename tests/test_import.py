@@ -0,0 +1,47 @@
+# Module to test and benchmark lazy imports
+
+#-------------------------------------------------------------------------------
+import pytest
+import sys
+import json
+import subprocess
+
+#-------------------------------------------------------------------------------
+HEAVY_MODULES = ['sympy', 'sympy.stats', 'scipy', 'scipy.stats', 'networkx']
+IMPORT_TESTS = [
+    ('', []),
+    ('RV', ['sympy']),
+    ('SP', ['sympy', 'networkx']),
+               ]
+IMPORT_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+import probayes as pb
+import_time = time.perf_counter() - start
+if '{attr}':
+  getattr(pb, '{attr}')
+attr_time = time.perf_counter() - start - import_time
+print(json.dumps({{'import_time': import_time, 'attr_time': attr_time,
+                  'modules': [mod for mod in {heavy} if mod in sys.modules]}}))
+"""
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("attr, loaded", IMPORT_TESTS)
+def test_import(attr, loaded):
+  script = IMPORT_SCRIPT.format(attr=attr, heavy=HEAVY_MODULES)
+  output = subprocess.run([sys.executable, '-c', script], check=True,
+                          capture_output=True, text=True).stdout
+  result = json.loads(output.strip().splitlines()[-1])
+  print("Import probayes: {:.4f} s, access '{}': {:.4f} s".format(
+        result['import_time'], attr, result['attr_time']))
+  for module in loaded:
+    assert module in result['modules'], \
+        "Module {} not loaded accessing {}".format(module, attr)
+  for module in ['sympy.stats', 'scipy.stats']:
+    assert module not in result['modules'], \
+        "Module {} loaded eagerly".format(module)
+  if not attr:
+    assert not result['modules'], \
+        "Heavy modules loaded on import: {}".format(result['modules'])
+
+#-------------------------------------------------------------------------------
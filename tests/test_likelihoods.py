@@ -0,0 +1,77 @@
+# Module to test likelihood utilities
+
+#-------------------------------------------------------------------------------
+import pytest
+import numpy as np
+import probayes as pb
+from probayes.likelihoods import int_to_bin, bin_to_int
+
+#-------------------------------------------------------------------------------
+BIN_TESTS = [(np.array([0, 1, 5, 255, 256]), 0), (np.array([3, 9]), 12)]
+PERM_FREQ_TESTS = [(1000, 1, None), (1000, 3, 7), (5000, 9, 512)]
+SPARSE_TESTS = [(2000, 4, 0), (2000, 6, 1)]
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("nums, min_dim", BIN_TESTS)
+def test_bin(nums, min_dim):
+  bins = int_to_bin(nums, min_dim)
+  for num, row in zip(nums, bins):
+    assert np.array_equal(row, int_to_bin(int(num), bins.shape[1])), \
+        "Vectorised binary conversion mismatch for {}".format(num)
+    assert bin_to_int(row) == num, "Integer conversion mismatch"
+  assert np.array_equal(bin_to_int(bins), nums), \
+      "Vectorised integer conversion mismatch"
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("rows, cols, chunk", PERM_FREQ_TESTS)
+def test_bool_perm_freq(rows, cols, chunk, tmp_path):
+  bool_2d = np.random.default_rng(cols).random([rows, cols]) < 0.3
+  expected = np.zeros([2] * cols, dtype=int)
+  for row in bool_2d.astype(int).tolist():
+    expected[tuple(row)] += 1
+  counts = pb.bool_perm_freq(bool_2d, chunk=chunk)
+  assert np.array_equal(counts, expected), "Permutation counts incorrect"
+  memmap = np.memmap(tmp_path / 'bool_2d.dat', dtype=bool, mode='w+',
+                     shape=bool_2d.shape)
+  memmap[:] = bool_2d
+  memmap.flush()
+  assert np.array_equal(pb.bool_perm_freq(memmap, chunk=chunk), expected), \
+      "Memmap permutation counts incorrect"
+  blocks = (bool_2d[i:i+100] for i in range(0, rows, 100))
+  assert np.array_equal(pb.bool_perm_freq(blocks), expected), \
+      "Streamed permutation counts incorrect"
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("rows, cols, base_freq", SPARSE_TESTS)
+def test_sparse_perm_freq(rows, cols, base_freq):
+  bool_2d = np.random.default_rng(cols).random([rows, cols]) < 0.3
+  labels = ['x{}'.format(col) for col in range(cols)]
+  _, rel_freq = pb.bool_perm_freq(bool_2d, labels, base_freq=base_freq)
+  _, perm_counts = pb.bool_perm_freq(bool_2d, labels, base_freq=base_freq,
+                                     sparse=True)
+  assert np.array_equal(perm_counts.dense(), pb.bool_perm_freq(bool_2d)), \
+      "Sparse counts inconsistent with dense counts"
+  assert np.isclose(np.sum(rel_freq), 1.), "Relative frequencies not normalised"
+  vals = {label: np.array([False, True]).reshape(
+                 [2 if col == dim else 1 for dim in range(cols)]) \
+          for col, label in enumerate(labels)}
+  assert np.allclose(perm_counts.rel_freq(vals), rel_freq), \
+      "Sparse relative frequencies inconsistent with dense"
+  marg_vals = {labels[-1]: np.array([[False], [True]]), 
+               labels[0]: np.array([[False, True]])}
+  marg_freq = np.sum(rel_freq, axis=tuple(range(1, cols-1))).T
+  assert np.allclose(perm_counts.rel_freq(marg_vals), marg_freq), \
+      "Sparse marginal frequencies inconsistent with dense"
+
+#-------------------------------------------------------------------------------
+def test_sparse_high_dim():
+  bool_2d = np.random.default_rng(0).random([10000, 40]) < 0.05
+  perm_counts = pb.bool_perm_freq(bool_2d)
+  assert len(perm_counts.codes) <= len(bool_2d), "Sparse codes not compact"
+  counts = perm_counts.count(bool_2d[:10])
+  expected = [np.sum(np.all(bool_2d == row, axis=1)) for row in bool_2d[:10]]
+  assert np.array_equal(counts, expected), "Sparse lookup counts incorrect"
+  assert perm_counts.count(np.ones([1, 40], dtype=bool))[0] == 0, \
+      "Unobserved permutation count non-zero"
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,109 @@
+# Module to test loopy belief propagation
+
+#-------------------------------------------------------------------------------
+import pytest
+import itertools
+import collections
+import numpy as np
+import probayes as pb
+from probayes.sd_utils import plan_factors
+from probayes.junction_tree import JunctionTree
+from probayes.factor_utils import factor_product
+
+#-------------------------------------------------------------------------------
+CHAIN_TESTS = [
+    ('flooding', 0., {'c': True}),
+    ('residual', 0., {'c': True}),
+    ('flooding', 0.5, {'a': False}),
+    ('residual', 0.3, None),
+              ]
+GRID_TESTS = [(3, 0, 'flooding', 0.), (3, 1, 'residual', 0.),
+              (3, 2, 'flooding', 0.5)]
+
+#-------------------------------------------------------------------------------
+def chain_sd():
+  a = pb.RV('a', vtype=bool, prob=lambda a: np.where(a, 0.3, 0.7))
+  b = pb.RV('b', vtype=int, vset=[0, 1, 2])
+  c = pb.RV('c', vtype=bool)
+  ba = b | a
+  ba.set_prob(lambda b, a: np.where(a, 0.1 + 0.4 * b, 0.5 - 0.2 * b))
+  cb = c | b
+  cb.set_prob(lambda c, b: np.where(c, 0.3 * b, 1. - 0.3 * b))
+  return pb.SD(cb, ba)
+
+#-------------------------------------------------------------------------------
+def grid_factors(size, seed):
+  """ Returns unary and pairwise Dist factors of a size x size Ising grid """
+  rng = np.random.default_rng(seed)
+  keys = [['s{}{}'.format(i, j) for j in range(size)] for i in range(size)]
+  vset = np.array([-1, 1])
+  factors = []
+  for i, j in itertools.product(range(size), range(size)):
+    key = keys[i][j]
+    factors.append(pb.Dist(key, {key: vset}, {key: 0},
+                           rng.normal(scale=0.5) * vset, 'log'))
+    for nbr in [(i+1, j), (i, j+1)]:
+      if nbr[0] < size and nbr[1] < size:
+        other = keys[nbr[0]][nbr[1]]
+        vals = collections.OrderedDict([(key, vset), (other, vset)])
+        logp = rng.normal(scale=0.3) * np.outer(vset, vset)
+        factors.append(pb.Dist(','.join([key, other]), vals,
+                               {key: 0, other: 1}, logp, 'log'))
+  return factors
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("schedule, damping, evidence", CHAIN_TESTS)
+def test_loopy_bp_chain(schedule, damping, evidence):
+  sd = chain_sd()
+  bp = pb.LoopyBP(sd, schedule=schedule, damping=damping)
+  bp.set_evidence(evidence)
+  assert bp.run(max_iter=200, tol=1e-12), "BP failed to converge"
+  assert bp.n_iter == len(bp.residuals), "Mismatch in diagnostics"
+  marginals = bp.marginals()
+  for key in ['a', 'b', 'c']:
+    if evidence and key in evidence:
+      continue
+    exact = sd.posterior(key, evidence)
+    assert np.allclose(marginals[key].prob, exact.prob), \
+        "Marginal mismatch for {}".format(key)
+
+#-------------------------------------------------------------------------------
+def test_loopy_bp_max():
+  sd = chain_sd()
+  bp = pb.LoopyBP(sd, mode='max')
+  assert bp.run(), "Max-product failed to converge"
+  factors, vals = plan_factors(sd.compile_plan())
+  keys, logp = factor_product(*factors)
+  index = np.unravel_index(np.argmax(logp), logp.shape)
+  map_state = bp.map_state()
+  for key, idx in zip(keys, index):
+    assert map_state[key] == vals[key][idx], \
+        "MAP mismatch for {}".format(key)
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("size, seed, schedule, damping", GRID_TESTS)
+def test_loopy_bp_grid(size, seed, schedule, damping):
+  factors = grid_factors(size, seed)
+  bp = pb.LoopyBP(*factors, schedule=schedule, damping=damping)
+  assert bp.run(max_iter=500, tol=1e-10), "BP failed to converge"
+  assert bp.residuals[-1] <= 1e-10, "Convergence diagnostic mismatch"
+  jtree = JunctionTree(bp.factors, bp.vals)
+  beliefs = bp.beliefs()
+  for key in bp.vals.keys():
+    _, exact = jtree.query([key])
+    assert np.allclose(np.exp(beliefs[key]), np.exp(exact), atol=0.05), \
+        "Approximate marginal mismatch for {}".format(key)
+
+#-------------------------------------------------------------------------------
+def test_loopy_bp_schedules():
+  factors = grid_factors(3, 3)
+  flooding = pb.LoopyBP(*factors, schedule='flooding')
+  residual = pb.LoopyBP(*factors, schedule='residual')
+  assert flooding.run(max_iter=500, tol=1e-12), "Flooding failed to converge"
+  assert residual.run(max_iter=500, tol=1e-12), "Residual failed to converge"
+  flooding, residual = flooding.beliefs(), residual.beliefs()
+  for key in flooding.keys():
+    assert np.allclose(flooding[key], residual[key], atol=1e-8), \
+        "Fixed point mismatch for {}".format(key)
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,85 @@
+# Module to test mean-field variational inference
+
+#-------------------------------------------------------------------------------
+import pytest
+import collections
+import numpy as np
+import probayes as pb
+
+#-------------------------------------------------------------------------------
+GAUSS_TESTS = [(6, 48, 0), (8, 32, 1)]
+
+#-------------------------------------------------------------------------------
+def gauss_factors(n_dims, n_grid, seed):
+  """ Returns pairwise Dist factors of a correlated gaussian log-density with
+  its mean and precision """
+  rng = np.random.default_rng(seed)
+  mean = rng.normal(size=n_dims)
+  coef = rng.normal(size=[n_dims, n_dims]) / np.sqrt(n_dims)
+  prec = coef.dot(coef.T) + np.eye(n_dims)
+  stdv = np.sqrt(np.diag(np.linalg.inv(prec)))
+  keys = ['w{}'.format(i) for i in range(n_dims)]
+  grids = [np.linspace(mean[i] - 5. * stdv[i], mean[i] + 5. * stdv[i], n_grid)
+           for i in range(n_dims)]
+  lin = prec.dot(mean)
+  factors = []
+  for i in range(n_dims):
+    logp = lin[i] * grids[i] - 0.5 * prec[i, i] * grids[i]**2
+    factors.append(pb.Dist(keys[i], {keys[i]: grids[i]}, {keys[i]: 0}, logp,
+                           'log'))
+    for j in range(i):
+      vals = collections.OrderedDict([(keys[j], grids[j]), (keys[i], grids[i])])
+      logp = -prec[i, j] * np.outer(grids[j], grids[i])
+      factors.append(pb.Dist(','.join([keys[j], keys[i]]), vals,
+                             {keys[j]: 0, keys[i]: 1}, logp, 'log'))
+  return factors, keys, mean, prec
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("n_dims, n_grid, seed", GAUSS_TESTS)
+def test_mean_field_gauss(n_dims, n_grid, seed):
+  factors, keys, mean, prec = gauss_factors(n_dims, n_grid, seed)
+  mf = pb.MeanField(*factors)
+  dists, elbo = mf.fit(max_iter=500, tol=1e-12)
+  assert list(dists.keys()) == keys, "Mismatch in variables"
+  assert np.all(np.diff(elbo) >= -1e-9), "ELBO decreased"
+  for i, key in enumerate(keys):
+    assert dists[key].prob.shape == (n_grid,), "Incorrect marginal shape"
+    prob = dists[key].rescaled(1.).prob
+    grid = mf.vals[key]
+    delta = grid[1] - grid[0]
+    assert np.isclose(np.sum(prob * grid), mean[i], atol=delta), \
+        "Mean-field mean mismatch for {}".format(key)
+    var = np.sum(prob * (grid - mean[i])**2)
+    assert np.isclose(var, 1. / prec[i, i], rtol=0.1), \
+        "Mean-field variance mismatch for {}".format(key)
+
+#-------------------------------------------------------------------------------
+def test_mean_field_discrete():
+  a = pb.RV('a', vtype=bool, prob=lambda a: np.where(a, 0.3, 0.7))
+  b = pb.RV('b', vtype=int, vset=[0, 1, 2])
+  c = pb.RV('c', vtype=bool)
+  ba = b | a
+  ba.set_prob(lambda b, a: np.where(a, 0.1 + 0.4 * b, 0.5 - 0.2 * b))
+  cb = c | b
+  cb.set_prob(lambda c, b: np.where(c, 0.2 + 0.3 * b, 0.8 - 0.3 * b))
+  sd = pb.SD(cb, ba)
+  mf = pb.MeanField(sd)
+  assert [keys for keys, _ in mf.factors] == [('a',), ('a', 'b'), ('b', 'c')], \
+      "Incorrect factorisation"
+  dists, elbo = mf.fit(max_iter=1000, tol=1e-14, pscale='log')
+  assert np.all(np.diff(elbo) >= -1e-9), "ELBO decreased"
+  assert elbo[-1] <= sd.junction_tree().log_evidence() + 1e-9, \
+      "ELBO exceeds log-evidence"
+  assert np.isclose(dists['a'].ret_pscale(), 0j), "Incorrect pscale"
+
+  # ELBO must equal E_q[log p] + H[q] evaluated over the exact joint
+  joint = sd.posterior('a,b,c').prob
+  prob_q = np.einsum('i,j,k->ijk', *[np.exp(dists[key].prob)
+                                      for key in ['a', 'b', 'c']])
+  expected = np.sum(prob_q * (np.log(joint) - np.log(prob_q)))
+  assert np.isclose(elbo[-1], expected), "ELBO mismatch"
+  for key in ['a', 'b', 'c']:
+    assert np.allclose(mf.update(key), dists[key].prob, atol=1e-6), \
+        "Mean-field not at a fixed point for {}".format(key)
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,91 @@
+# Module to test explicit Naive Bayes classification
+
+#-------------------------------------------------------------------------------
+import pytest
+import numpy as np
+import probayes as pb
+
+#-------------------------------------------------------------------------------
+NAIVE_BAYES_TESTS = [(1000, None, 1.), (3000, 256, 0.5), (3000, 1000, 0.)]
+
+#-------------------------------------------------------------------------------
+def sim_data(rows):
+  rng = np.random.default_rng(rows)
+  c_obs = rng.integers(0, 3, size=rows)
+  x_obs = rng.random(rows) < 0.2 + 0.3 * c_obs
+  y_obs = rng.normal(loc=c_obs, scale=1. + 0.5 * c_obs)
+  return c_obs, x_obs, y_obs
+
+#-------------------------------------------------------------------------------
+def ref_log_posterior(c_obs, x_obs, y_obs, x_val, y_val, base_freq):
+  logp = np.empty(3, dtype=float)
+  for k in range(3):
+    in_class = c_obs == k
+    n_class = np.sum(in_class)
+    prior = (n_class + base_freq) / (len(c_obs) + 3 * base_freq)
+    n_x = np.sum(x_obs[in_class] == x_val)
+    lhood_x = (n_x + base_freq) / (n_class + 2 * base_freq)
+    mean, var = np.mean(y_obs[in_class]), np.var(y_obs[in_class])
+    logp[k] = np.log(prior * lhood_x) - 0.5 * (y_val - mean)**2 / var \
+              - 0.5 * np.log(2. * np.pi * var)
+  return logp - np.log(np.sum(np.exp(logp)))
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("rows, chunk, base_freq", NAIVE_BAYES_TESTS)
+def test_naive_bayes(rows, chunk, base_freq):
+  c_obs, x_obs, y_obs = sim_data(rows)
+  c = pb.RV('c', vtype=int, vset=[0, 1, 2])
+  x = pb.RV('x', vtype=bool)
+  y = pb.RV('y', vtype=float)
+  nb = pb.NaiveBayes(c, x, y, base_freq=base_freq)
+  assert nb.name == 'x,y|c', "Unexpected dependence name {}".format(nb.name)
+  assert nb.fit({'c': c_obs, 'x': x_obs, 'y': y_obs}, chunk=chunk) == rows, \
+      "Incorrect number of fitted observations"
+  post = nb.predict({'x': x_obs, 'y': y_obs}, chunk=chunk)
+  assert post.name == 'c|x,y', "Unexpected posterior name {}".format(post.name)
+  assert post.prob.shape == (rows, 3), "Incorrect posterior shape"
+  for i in range(0, rows, rows // 5):
+    expected = ref_log_posterior(c_obs, x_obs, y_obs, x_obs[i], y_obs[i],
+                                 base_freq)
+    assert np.allclose(post.prob[i], expected), "Log-posterior mismatch"
+
+  # Streamed data must reproduce the same fit and predictions
+  data = np.column_stack([c_obs, x_obs, y_obs])
+  blocks = (data[i:i+100] for i in range(0, rows, 100))
+  nb_streamed = pb.NaiveBayes(c, x, y, base_freq=base_freq)
+  nb_streamed.fit(blocks)
+  logp = nb_streamed.log_posterior(data[:, 1:])
+  assert np.allclose(logp, post.prob), "Streamed fit mismatch"
+
+  # Scalar features return a distribution over classes
+  single = nb.predict({'x': bool(x_obs[0]), 'y': float(y_obs[0])}, pscale=1.)
+  assert single.prob.shape == (3,), "Incorrect singleton posterior shape"
+  assert np.isclose(np.sum(single.prob), 1.), "Posterior not normalised"
+  assert np.allclose(np.log(single.prob), post.prob[0]), "Singleton mismatch"
+
+#-------------------------------------------------------------------------------
+def test_naive_bayes_prob():
+  c_obs, x_obs, y_obs = sim_data(1000)
+  c = pb.RV('c', vtype=int, vset=[2, 0, 1])
+  x = pb.RV('x', vtype=bool)
+  y = pb.RV('y', vtype=float)
+  nb = pb.NaiveBayes(c, x, y, base_freq=0.)
+  nb.fit({'c': c_obs, 'x': x_obs, 'y': y_obs})
+  ref = [ref_log_posterior(c_obs, x_obs, y_obs, True, y_val, 0.)
+         for y_val in [0., 1.]]
+  post = nb.predict({'x': True, 'y': 0.})
+  assert np.allclose(post.prob, ref[0][c.vset]), "Unsorted vset mismatch"
+
+  # Fitted likelihoods are returned by the conditional distribution
+  for k in range(3):
+    in_class = c_obs == k
+    mean, var = np.mean(y_obs[in_class]), np.var(y_obs[in_class])
+    expected = np.log(np.mean(x_obs[in_class])) - 0.5 * mean**2 / var \
+               - 0.5 * np.log(2. * np.pi * var)
+    lhood = nb({'x': True, 'y': 0., 'c': k})
+    assert np.isclose(lhood.prob, expected), \
+        "Likelihood mismatch for class {}".format(k)
+  lhood = nb({'x': True, 'y': np.array([0., 1.]), 'c': 0})
+  assert lhood.prob.shape == (2,), "Incorrect likelihood shape"
+
+#-------------------------------------------------------------------------------
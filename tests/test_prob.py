@@ -13,6 +13,13 @@ SCIPY_PROB_TESTS = [
     (scipy.stats.norm, np.linspace(-1, 3, 1000), {'loc': 1., 'scale': 0.5}),
     (scipy.stats.binom, np.arange(10, dtype=int), {'n': 9, 'p': 0.5})
               ]
+MVAR_PROB_TESTS = [
+    (scipy.stats.multivariate_normal, [0.5, -0.5], [[1.5, -1.], [-1., 2.]]),
+    (scipy.stats.multivariate_normal, [0.5, 0., -0.5], 
+     [[2., 0.3, -0.3], [0.3, 1., -0.5], [-0.3, -0.5, 0.5]]),
+    (scipy.stats.multivariate_normal, [0., 0.], [[1., 1.], [1., 1.]]),
+    (scipy.stats.multivariate_t, [0.5, -0.5], [[1.5, -1.], [-1., 2.]]),
+                  ]
 
 #-------------------------------------------------------------------------------
 @pytest.mark.parametrize("dist, values, kwds", SCIPY_PROB_TESTS)
@@ -66,3 +73,42 @@ def test_samp_sympy(dist, size, args):
   assert len(samp) == size, "Mismatch in samples and size specification"
 
 #-------------------------------------------------------------------------------
+SYMPY_ICDF_TESTS = [
+    (sympy.stats.Normal, (1., 0.5), scipy.stats.norm(1., 0.5), True),
+    (sympy.stats.Gamma, (2., 1.), scipy.stats.gamma(2.), False),
+              ]
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("dist, args, ref, closed", SYMPY_ICDF_TESTS)
+def test_icdf_sympy(dist, args, ref, closed):
+  x = sympy.Symbol('x')
+  expr = pb.Prob(dist(x, *args))
+  for key in ['logp', 'cdf', 'icdf']:
+    assert not expr[{}][key].built, "{} evaluated before use".format(key)
+  values = np.array([0.05, 0.5, 0.95])
+  icdf = expr.pfun[-1](values)
+  assert np.allclose(icdf, ref.ppf(values)), "Inverse CDF inconsistent"
+  assert (expr[{}]['icdf'].expr is not None) == closed, \
+      "Unexpected inverse CDF form: {}".format(expr[{}]['icdf'])
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("dist, mean, cov", MVAR_PROB_TESTS)
+def test_prob_mvar(dist, mean, cov):
+  kwds = {'allow_singular': True} if np.linalg.matrix_rank(cov) < len(mean) \
+         else {}
+  frozen = dist(mean, cov, **kwds)
+  shape = [7, 5, 3][:len(mean)]
+  vals = [np.linspace(-2., 2., size).reshape([size if i == j else 1 \
+          for j in range(len(shape))]) for i, size in enumerate(shape)]
+  points = np.stack(np.broadcast_arrays(*vals), axis=-1)
+  logp = pb.mvar_utils.mvar_eval(frozen, vals, 'logpdf', chunk=4,
+                                 factor=pb.mvar_utils.mvn_factor(frozen))
+  assert logp.shape == tuple(shape), "Broadcast shape mismatch"
+  assert np.allclose(logp, frozen.logpdf(points)), \
+      "Log densities inconsistent with {}".format(dist)
+  prob = pb.Prob(dist, mean, cov, **kwds)
+  assert np.allclose(prob(dict(zip('xyz', vals))), frozen.pdf(points)), \
+      "Probabilities inconsistent with {}".format(dist)
+  assert np.isclose(prob(dict(zip('xyz', mean))), frozen.pdf(mean)), \
+      "Scalar probability inconsistent with {}".format(dist)
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,112 @@
+# Module to test RFs
+
+#-------------------------------------------------------------------------------
+import pytest
+import numpy as np
+import scipy.stats
+import sympy
+import sympy.stats
+import probayes as pb
+from probayes.cond_cov import CondCov
+
+#-------------------------------------------------------------------------------
+LOGP_GRAD_TESTS = [
+    (np.linspace(-2., 2., 5).reshape([5, 1]), 
+     np.linspace(-1., 1., 3).reshape([1, 3]), 
+     1.5),
+                  ]
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("x_vals, mu_vals, sigma_vals", LOGP_GRAD_TESTS)
+def test_logp_grad(x_vals, mu_vals, sigma_vals):
+  x = pb.RV('x', vtype=float, vset=[-5., 5.])
+  mu = pb.RV('mu', vtype=float, vset=[-2., 2.])
+  sigma = pb.RV('sigma', vtype=float, vset=[0.5, 2.])
+  field = pb.RF(x, mu, sigma)
+  field.set_prob(sympy.stats.Normal(x[:], mean=mu[:], std=sigma[:]),
+                 pscale='log')
+  values = {'x': x_vals, 'mu': mu_vals, 'sigma': sigma_vals}
+  logp, grad = field.eval_logp_grad(values)
+  resid = x_vals - mu_vals
+  expected = {'x': -resid / sigma_vals**2,
+              'mu': resid / sigma_vals**2,
+              'sigma': -1. / sigma_vals + resid**2 / sigma_vals**3}
+  assert logp.shape == (5, 3), "Batched output shape incorrect"
+  assert np.allclose(logp, scipy.stats.norm.logpdf(x_vals, mu_vals, 
+                                                    sigma_vals)), \
+      "Log probability incorrect"
+  for key, val in expected.items():
+    assert np.allclose(grad[key], val), "Gradient for {} incorrect".format(key)
+
+  # Iconic probabilities
+  field = pb.RF(x, mu)
+  field.set_prob(sympy.exp(-(x[:]**2 + x[:]*mu[:] + mu[:]**2)))
+  logp, grad = field.eval_logp_grad({'x': x_vals, 'mu': mu_vals})
+  assert np.allclose(grad['x'], -(2.*x_vals + mu_vals)) and \
+         np.allclose(grad['mu'], -(x_vals + 2.*mu_vals)), \
+      "Iconic gradient incorrect"
+
+#-------------------------------------------------------------------------------
+FOLD_TESTS = [None, 'log']
+COND_COV_TESTS = [([0.5, -0.5], [[1.5, -1.0], [-1.0, 2.]], [-10., 10.]),
+                  ([0.5, 0., -0.5], [[2., 0.3, -0.3], [0.3, 1., -0.5], 
+                                     [-0.3, -0.5, 0.5]], [-0.5, 1.])]
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("pscale", FOLD_TESTS)
+def test_fold(pscale):
+  x = pb.RV('x', vtype=float, vset=[-3., 3.])
+  y = pb.RV('y', vtype=float, vset=[-3., 3.])
+  z = pb.RV('z', vtype=bool, prob=0.3)
+  if pscale:
+    x.set_prob(-x[:]**2, pscale=pscale)
+  else:
+    x.set_prob(sympy.exp(-x[:]**2))
+  field = pb.RF(x, y, z)
+  values = {'x': np.linspace(-2., 2., 5).reshape([5, 1, 1]),
+            'y': np.linspace(-4., 4., 3).reshape([1, 3, 1]),
+            'z': np.array([False, True]).reshape([1, 1, 2])}
+  prob = field.eval_prob(values)
+  assert field._fold[1] is not None, "Independent iconic RVs not folded"
+  expected, _ = pb.rf_utils.rv_prod_rule(values, rvs=field.varlist, 
+                                         pscale=field.pscale)
+  assert prob.shape == (5, 3, 2), "Folded probability shape incorrect"
+  assert np.allclose(prob, expected), "Folded probabilities incorrect"
+  x.set_prob(sympy.exp(-2.*x[:]**2))
+  assert not np.allclose(field.eval_prob(values), prob), \
+      "Folded probabilities not updated with RV probability"
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("mean, cov, lims", COND_COV_TESTS)
+def test_cond_cov(mean, cov, lims):
+  mean, cov = np.array(mean), np.array(cov)
+  n = len(mean)
+  cond_cov = CondCov(mean, cov, [lims] * n)
+  state = mean + 0.25
+  for i in range(n):
+    j = [k for k in range(n) if k != i]
+    coef = cov[i, j].dot(np.linalg.inv(cov[np.ix_(j, j)]))
+    assert np.isclose(cond_cov.cond_mean(i, *state), 
+                      mean[i] + coef.dot(state[j] - mean[j])), \
+        "Conditional mean incorrect"
+    assert np.isclose(cond_cov.stdv[i]**2, cov[i, i] - coef.dot(cov[j, i])), \
+        "Conditional variance incorrect"
+  states = [np.linspace(lims[0], lims[1], 7)] + list(state[1:])
+  vals, pdfs = cond_cov.interp({0}, *states[1:], cond_pdf=True)
+  assert np.ndim(vals) == 0 and pdfs > 0., "Scalar interpolation failed"
+  vals = cond_cov.interp(states[0], {-5}, *states[2:])
+  assert vals.shape == (7, 5), "Batched interpolation shape incorrect"
+  assert np.all(vals >= lims[0]) and np.all(vals <= lims[1]), \
+      "Batched interpolation outside limits"
+  chains = [np.full(4000, val) for val in mean]
+  rng = np.random.default_rng(n)
+  for _ in range(20):
+    chains = cond_cov.sweep(*chains, rng=rng)
+  samples = np.stack(chains, axis=-1)
+  assert np.all(samples >= lims[0]) and np.all(samples <= lims[1]), \
+      "Gibbs sweep outside limits"
+  if lims[1] - lims[0] > 10.:
+    assert np.allclose(np.cov(samples.T), cov, atol=0.15), \
+        "Gibbs sweep covariance inconsistent"
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,52 @@
+# Module to test RVs
+
+#-------------------------------------------------------------------------------
+import pytest
+import numpy as np
+import scipy.stats
+import probayes as pb
+
+#-------------------------------------------------------------------------------
+ITAB_TESTS = [
+    (scipy.stats.gamma, [0.01, 20.], {'a': 2.}, 1e-4),
+    (scipy.stats.beta, [0.01, 0.99], {'a': 2., 'b': 5.}, 1e-5),
+             ]
+RNG_TESTS = [(float, [-1., 1.]), (int, [0, 1, 2]), (bool, 0.3)]
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("dist, vset, kwds, tol", ITAB_TESTS)
+def test_itab(dist, vset, kwds, tol):
+  x = pb.RV('x', vtype=float, vset=vset)
+  x.set_prob(dist, **kwds)
+  exact = x({100})['x']
+  x.set_itab(tol)
+  approx = x({100})['x']
+  assert x.itab is not None, "Tabulated ICDF not built on sampling"
+  assert np.max(np.abs(approx - exact)) <= tol, \
+      "Tabulated ICDF exceeds tolerance {}".format(tol)
+  samples = x({-1000})['x']
+  assert np.all(samples >= min(vset)) and np.all(samples <= max(vset)), \
+      "Tabulated ICDF samples outside variable set {}".format(vset)
+  x.vset = [vset[0], 0.5 * (vset[0] + vset[1])]
+  assert x.itab is None, "Tabulated ICDF not reset on variable set change"
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("vtype, spec", RNG_TESTS)
+def test_rng(vtype, spec):
+  if vtype is bool:
+    x = pb.RV('x', vtype=vtype, prob=spec)
+  else:
+    x = pb.RV('x', vtype=vtype, vset=spec)
+  with pb.rng_context(42):
+    samples_0 = x({-10})['x']
+  with pb.rng_context(42):
+    samples_1 = x({-10})['x']
+  assert np.all(samples_0 == samples_1), "Contextual generator not reproducible"
+  x.set_rng(7)
+  samples_0 = x({-10})['x']
+  x.set_rng(7)
+  with pb.rng_context(42):
+    samples_1 = x({-10})['x']
+  assert np.all(samples_0 == samples_1), "Variable generator not prioritised"
+
+#-------------------------------------------------------------------------------
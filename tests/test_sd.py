@@ -0,0 +1,239 @@
+# Module to test SDs
+
+#-------------------------------------------------------------------------------
+import pytest
+import warnings
+import numpy as np
+import scipy.stats
+import probayes as pb
+
+#-------------------------------------------------------------------------------
+ANCESTRAL_TESTS = [(100000, 0.3, 0.6), (200000, 0.5, 0.2)]
+DAG_TESTS = ['fork', 'diamond']
+POSTERIOR_TESTS = [
+    ('chain', 'a', {'c': True}, 'min_fill'),
+    ('chain', 'a,c', None, 'min_degree'),
+    ('chain', 'b', {'a': False, 'c': False}, 'min_fill'),
+    ('vee', 'x', {'z': True}, 'min_fill'),
+    ('vee', 'x', {'z': True, 'y': True}, 'min_degree'),
+    ('fork', 'a', {'b': True}, 'min_fill'),
+    ('fork', 'b,c', None, 'min_degree'),
+    ('diamond', 'd', None, 'min_fill'),
+    ('diamond', 'a', {'d': True, 'c': False}, 'min_degree'),
+                  ]
+
+#-------------------------------------------------------------------------------
+def chain_sd(p_a, coef):
+  a = pb.RV('a', vtype=bool, prob=lambda a: np.where(a, p_a, 1. - p_a))
+  b = pb.RV('b', vtype=int, vset=[0, 1, 2])
+  c = pb.RV('c', vtype=bool)
+  ba = b | a
+  ba.set_prob(lambda b, a: np.where(a, 0.1 + 0.4 * b, 0.5 - 0.2 * b))
+  cb = c | b
+  cb.set_prob(lambda c, b: np.where(c, coef * b / 2., 1. - coef * b / 2.))
+  return pb.SD(cb, ba)
+
+#-------------------------------------------------------------------------------
+def vee_sd():
+  x = pb.RV('x', vtype=bool)
+  y = pb.RV('y', vtype=int, vset=[0, 1, 2])
+  z = pb.RV('z', vtype=bool)
+  zx = z | x
+  zx.set_prob(lambda z, x: np.where(z, 0.2 + 0.6 * x, 0.8 - 0.6 * x))
+  zy = z | y
+  zy.set_prob(lambda z, y: np.where(z, 0.1 + 0.3 * y, 0.9 - 0.3 * y))
+  return pb.SD(zx, zy)
+
+#-------------------------------------------------------------------------------
+def dag_sd(model, set_probs=True):
+  """ Returns a fork b<-a->c or a diamond with d conditioned by b and c """
+  a = pb.RV('a', vtype=bool, prob=lambda a: np.where(a, 0.4, 0.6))
+  b = pb.RV('b', vtype=bool)
+  c = pb.RV('c', vtype=bool)
+  ba = b | a
+  ca = c | a
+  if set_probs:
+    ba.set_prob(lambda b, a: np.where(b, 0.2 + 0.7 * a, 0.8 - 0.7 * a))
+    ca.set_prob(lambda c, a: np.where(c, 0.4 + 0.3 * a, 0.6 - 0.3 * a))
+  if model == 'fork':
+    return pb.SD(ba, ca)
+  d = pb.RV('d', vtype=bool)
+  dbc = d | (b & c)
+  dbc.set_prob(lambda d, b, c: np.where(d, 0.1 + 0.4 * b + 0.3 * c,
+                                           0.9 - 0.4 * b - 0.3 * c))
+  return pb.SD(dbc, ba, ca)
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("size, p_a, coef", ANCESTRAL_TESTS)
+def test_ancestral(size, p_a, coef):
+  sd = chain_sd(p_a, coef)
+  plan = sd.compile_plan()
+  assert list(plan.keys()) == ['a', 'b|a', 'c|b'], \
+      "Incorrect plan {}".format(list(plan.keys()))
+  assert sd.compile_plan() is plan, "Plan not cached"
+  with pb.rng_context(size):
+    draws = sd.ancestral(size)
+  for key in ['a', 'b', 'c']:
+    assert draws[key].shape == (size,), "Incorrect shape for {}".format(key)
+  tol = 5. / np.sqrt(size)
+  assert np.isclose(np.mean(draws['a']), p_a, atol=tol), "Root mismatch"
+  for a in [False, True]:
+    p_b = np.array([0.1, 0.5, 0.9]) if a else np.array([0.5, 0.3, 0.1])
+    p_b = p_b / np.sum(p_b)
+    freq = np.bincount(draws['b'][draws['a'] == a], minlength=3)
+    assert np.allclose(freq / np.sum(freq), p_b, atol=tol), \
+        "Conditional mismatch for b given a={}".format(a)
+  for b in range(3):
+    p_c = np.mean(draws['c'][draws['b'] == b])
+    assert np.isclose(p_c, coef * b / 2., atol=tol), \
+        "Conditional mismatch for c given b={}".format(b)
+  with pb.rng_context(size):
+    repeat = sd.ancestral(size)
+  assert np.array_equal(repeat['c'], draws['c']), "Irreproducible draws"
+  sd.set_prob(sd.prob)
+  assert sd.compile_plan() is not plan, "Plan not invalidated"
+
+  # Changing a component conditional must also invalidate the plan
+  plan = sd.compile_plan()
+  cb = [subarch for subarch in sd.arch if subarch.name == 'c|b'][0]
+  cb.set_prob(lambda c, b: np.where(c, 1. - coef * b / 2., coef * b / 2.))
+  assert sd.compile_plan() is not plan, "Plan not invalidated by component"
+  draws = sd.ancestral(size)
+  for b in range(3):
+    p_c = np.mean(draws['c'][draws['b'] == b])
+    assert np.isclose(p_c, 1. - coef * b / 2., atol=tol), \
+        "Stale conditional for c given b={}".format(b)
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("model", DAG_TESTS)
+def test_ancestral_dag(model):
+  size = 100000
+  sd = dag_sd(model)
+  plan = sd.compile_plan()
+  assert plan['b|a'].kind == 'table' and plan['c|a'].kind == 'table', \
+      "Dependences on a not planned"
+  draws = sd.ancestral(size)
+  tol = 5. / np.sqrt(size)
+  for a in [False, True]:
+    p_b = np.mean(draws['b'][draws['a'] == a])
+    p_c = np.mean(draws['c'][draws['a'] == a])
+    assert np.isclose(p_b, 0.2 + 0.7 * a, atol=tol), \
+        "Conditional mismatch for b given a={}".format(a)
+    assert np.isclose(p_c, 0.4 + 0.3 * a, atol=tol), \
+        "Conditional mismatch for c given a={}".format(a)
+  if model == 'diamond':
+    assert list(plan.keys())[-1] == 'd|b,c', "Incorrect plan order"
+    for b in [False, True]:
+      for c in [False, True]:
+        p_d = np.mean(draws['d'][(draws['b'] == b) & (draws['c'] == c)])
+        assert np.isclose(p_d, 0.1 + 0.4 * b + 0.3 * c, atol=2. * tol), \
+            "Conditional mismatch for d given b={}, c={}".format(b, c)
+  with pytest.raises(AssertionError, match="predecessors"):
+    dag_sd(model, set_probs=False).compile_plan()
+
+#-------------------------------------------------------------------------------
+def test_ancestral_deps():
+  x = pb.RV('x', vtype=float, vset=[0., 1.])
+  y = pb.RV('y', vtype=float, vset=[-10., 10.])
+  yx = pb.SD(y, x)
+  yx.add_deps(y, x, lambda x: {'y': 2. * x})
+  plan = yx.compile_plan()
+  assert [step.kind for step in plan.values()] == ['var', 'deps'], \
+      "Incorrect plan kinds"
+  draws = yx.ancestral(1000)
+  assert np.all((draws['x'] >= 0.) & (draws['x'] <= 1.)), "Root out of range"
+  assert np.allclose(draws['y'], 2. * draws['x']), "Dependence mismatch"
+
+#-------------------------------------------------------------------------------
+def hand_joint(model):
+  """ Returns the RV names and hand-tabulated joint probabilities of a model,
+  with bools indexed as [False, True] """
+  if model == 'chain':
+    p_a = np.array([0.7, 0.3])
+    p_ba = np.array([[0.5, 0.3, 0.1], [0.1, 0.5, 0.9]]) # [a, b]
+    p_ba = p_ba / np.sum(p_ba, axis=1, keepdims=True)
+    p_cb = np.array([[1., 0.7, 0.4], [0., 0.3, 0.6]]) # [c, b]
+    return ['a', 'b', 'c'], p_a[:, None, None] * p_ba[:, :, None] * p_cb.T
+  if model in DAG_TESTS:
+    p_a = np.array([0.6, 0.4])
+    p_ba = np.array([[0.8, 0.2], [0.1, 0.9]]) # [a, b]
+    p_ca = np.array([[0.6, 0.4], [0.3, 0.7]]) # [a, c]
+    joint = p_a[:, None, None] * p_ba[:, :, None] * p_ca[:, None, :]
+    if model == 'fork':
+      return ['a', 'b', 'c'], joint
+    p_d = np.array([[0.1, 0.4], [0.5, 0.8]]) # p(d=True|b, c) as [b, c]
+    p_dbc = np.stack([1. - p_d, p_d], axis=-1) # [b, c, d]
+    return ['a', 'b', 'c', 'd'], joint[:, :, :, None] * p_dbc
+  p_zx = np.array([[0.8, 0.2], [0.2, 0.8]]) # [z, x]
+  p_zy = np.array([[0.9, 0.6, 0.3], [0.1, 0.4, 0.7]]) # [z, y]
+  p_zxy = p_zx[:, :, None] * p_zy[:, None, :]
+  p_zxy = p_zxy / np.sum(p_zxy, axis=0)
+  return ['x', 'y', 'z'], np.moveaxis(p_zxy, 0, -1) / 6.
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("model, query, evidence, heuristic", POSTERIOR_TESTS)
+def test_posterior(model, query, evidence, heuristic):
+  sd = chain_sd(0.3, 0.6) if model == 'chain' else \
+       vee_sd() if model == 'vee' else dag_sd(model)
+  jtree = sd.junction_tree(heuristic)
+  post = sd.posterior(query, evidence)
+  keys = query.split(',')
+
+  # Reference by conditioning and marginalising the hand-tabulated joint
+  names, joint = hand_joint(model)
+  evidence = evidence or {}
+  index = tuple(int(evidence[name]) if name in evidence else slice(None)
+                for name in names)
+  joint = joint[index]
+  names = [name for name in names if name not in evidence]
+  axes = tuple(i for i, name in enumerate(names) if name not in keys)
+  expected = np.sum(joint, axis=axes)
+  expected = np.transpose(expected, [[name for name in names
+                                      if name in keys].index(key)
+                                     for key in keys])
+  assert np.allclose(post.prob, expected / np.sum(expected)), \
+      "Posterior mismatch"
+  assert np.isclose(jtree.log_evidence(evidence), np.log(np.sum(joint))), \
+      "Log-evidence mismatch"
+  assert jtree.calibrate(evidence) is jtree.calibrate(evidence), \
+      "Calibration not reused"
+  assert sd.junction_tree(heuristic) is jtree, "Junction tree not cached"
+
+#-------------------------------------------------------------------------------
+def test_posterior_invalidation():
+  sd = chain_sd(0.3, 0.6)
+  jtree = sd.junction_tree()
+  cb = [subarch for subarch in sd.arch if subarch.name == 'c|b'][0]
+  cb.set_prob(lambda c, b: np.where(c, 0.2 + 0.3 * b, 0.8 - 0.3 * b))
+  assert sd.junction_tree() is not jtree, "Junction tree not invalidated"
+  post = sd.posterior('a', {'c': True})
+  expected = np.array([0.7 * 3.3 / 9., 0.3 * 9.9 / 15.]) # p(a) * p(c|a)
+  assert np.allclose(post.prob, expected / np.sum(expected)), "Stale posterior"
+  sd = chain_sd(0.3, 0.6)
+  with warnings.catch_warnings():
+    warnings.simplefilter('error', RuntimeWarning)
+    with pytest.raises(AssertionError, match="zero probability"):
+      sd.posterior('a', {'b': 0, 'c': True})
+  with pytest.raises(AssertionError, match="predecessors"):
+    dag_sd('diamond', set_probs=False).posterior('d')
+
+#-------------------------------------------------------------------------------
+def test_ancestral_unbounded():
+  size = 100000
+  x = pb.RV('x', vtype=float, vset=[-np.inf, np.inf], prob=scipy.stats.norm)
+  y = pb.RV('y', vtype=float, vset=[-np.inf, np.inf])
+  yx = pb.SD(y, x)
+  yx.add_deps(y, x, lambda x: {'y': x + 1.})
+  with pb.rng_context(size):
+    draws = yx.ancestral(size)
+  tol = 5. / np.sqrt(size)
+  assert np.isclose(np.mean(draws['x']), 0., atol=tol), "Root mean mismatch"
+  assert np.isclose(np.std(draws['x']), 1., atol=tol), "Root stdv mismatch"
+  assert np.allclose(draws['y'], draws['x'] + 1.), "Dependence mismatch"
+  z = pb.RV('z', vtype=float, vset=[0., np.inf])
+  yz = pb.SD(y, z)
+  yz.add_deps(y, z, lambda z: {'y': z})
+  with pytest.raises(AssertionError, match="pfun"):
+    yz.compile_plan()
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,126 @@
+# Module to test sequential Monte Carlo particle filtering
+
+#-------------------------------------------------------------------------------
+import pytest
+import numpy as np
+import scipy.stats
+import probayes as pb
+from probayes.sp_utils import RESAMPLERS
+
+#-------------------------------------------------------------------------------
+RESAMPLE_TESTS = [('systematic', 100000), ('stratified', 100000)]
+KALMAN_TESTS = [(0.3, 0.5, 30, 'systematic'), (0.1, 1.0, 20, 'stratified')]
+HMM_TESTS = [('systematic', 0.5), ('stratified', 1.)]
+
+#-------------------------------------------------------------------------------
+def kalman_filter(obs, q, r):
+  """ Returns filtering means and log-evidence of a gaussian random walk with
+  unit-normal initial state """
+  mean, var, log_evid = 0., 1., 0.
+  means = np.empty(len(obs), dtype=float)
+  for t, y in enumerate(obs):
+    if t:
+      var += q
+    log_evid += scipy.stats.norm.logpdf(y, mean, np.sqrt(var + r))
+    gain = var / (var + r)
+    mean += gain * (y - mean)
+    var *= 1. - gain
+    means[t] = mean
+  return means, log_evid
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("resampler, size", RESAMPLE_TESTS)
+def test_resamplers(resampler, size):
+  weights = np.array([0.1, 0.0, 0.6, 0.3])
+  with np.errstate(divide='ignore'):
+    logw = np.log(weights)
+  index = RESAMPLERS[resampler](logw, size, np.random.default_rng(0))
+  assert index.shape == (size,), "Incorrect number of resampled indices"
+  freq = np.bincount(index, minlength=len(weights)) / size
+  assert np.allclose(freq, weights, atol=5. / np.sqrt(size)), \
+      "Resampled frequencies {} inconsistent with weights".format(freq)
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("q, r, n_steps, resampler", KALMAN_TESTS)
+def test_smc_kalman(q, r, n_steps, resampler):
+  size = 100000
+  rng = np.random.default_rng(n_steps)
+  obs = np.cumsum(rng.normal(scale=np.sqrt(q), size=n_steps)) + \
+        rng.normal(scale=np.sqrt(r), size=n_steps)
+  x = pb.RV('x', [-20., 20.], prob=scipy.stats.norm)
+  process = pb.SP(pb.RF(x))
+  process.set_tran(np.array([[q]]))
+  y = pb.RV('y', [-20., 20.])
+  yx = y | x
+  yx.set_prob(lambda y, x: scipy.stats.norm.logpdf(y, loc=x, scale=np.sqrt(r)),
+              pscale='log')
+  smc = pb.SMC(process, yx, size=size, resampler=resampler, rng=1)
+  particles = smc.particles
+  dists, log_evid = smc.filter({'y': obs})
+  assert len(dists) == n_steps, "Incorrect number of filtering Dists"
+  assert smc.particles is particles, "Particle arrays reallocated"
+  assert any(smc.resampled), "No resampling performed"
+  assert all(ess > 0. for ess in smc.ess), "Invalid ESS diagnostics"
+  means, exact_evid = kalman_filter(obs, q, r)
+  filt = np.array([dist.expectation()['x'] for dist in dists])
+  assert np.allclose(filt, means, atol=0.02), "Filtering mean mismatch"
+  assert np.isclose(log_evid, exact_evid, atol=0.1), "Log-evidence mismatch"
+  repeat, repeat_evid = pb.SMC(process, yx, size=size, resampler=resampler,
+                               rng=1).filter(obs)
+  assert np.isclose(repeat_evid, log_evid), "Irreproducible filtering"
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("resampler, ess_frac", HMM_TESTS)
+def test_smc_hmm(resampler, ess_frac):
+  size = 100000
+  tran = np.array([[.8, .1, .2], [.1, .8, .2], [.1, .1, .6]])
+  z = pb.RV('z', vtype=int, vset=[0, 1, 2])
+  z.set_tran(tran)
+  w = pb.RV('w', [-20., 20.])
+  wz = w | z
+  wz.set_prob(lambda w, z: np.exp(-0.5 * (w - z)**2) / np.sqrt(2. * np.pi))
+  obs = np.random.default_rng(1).normal(1., 1., size=12)
+  exact, exact_evid = pb.HMM(z, wz).filter(obs)
+  smc = pb.SMC(z, wz, size=size, resampler=resampler, ess_frac=ess_frac,
+               rng=2)
+  dists, log_evid = smc.filter(obs)
+  assert np.isclose(log_evid, exact_evid, atol=0.05), "Log-evidence mismatch"
+  for t, dist in enumerate(dists):
+    prob = np.bincount(dist.vals['z'], weights=np.exp(dist.prob), minlength=3)
+    assert np.allclose(prob, exact[t].prob, atol=0.02), \
+        "Filtering mismatch at step {}".format(t)
+
+#-------------------------------------------------------------------------------
+def test_smc_tfun():
+  size = 100000
+  scale = 0.5
+  x = pb.RV('x', [-10., 10.], prob=scipy.stats.norm)
+  x.set_tran(lambda x, xp: scipy.stats.norm.pdf(xp, loc=x, scale=scale),
+             order={'x': 'x', "x'": 'xp'})
+  x.set_tfun((lambda x, xp: scipy.stats.norm.cdf(xp, loc=x, scale=scale),
+              lambda x, xp: scipy.stats.norm.ppf(xp, loc=x, scale=scale)),
+             order={'x': 'x', "x'": 'xp'})
+  y = pb.RV('y', [-10., 10.])
+  yx = y | x
+  yx.set_prob(lambda y, x: scipy.stats.norm.pdf(y, loc=x))
+  obs = np.array([0.5, 1.0, 0.2, -0.4])
+  dists, log_evid = pb.SMC(x, yx, size=size, rng=3).filter(obs)
+  means, exact_evid = kalman_filter(obs, scale**2, 1.)
+  filt = np.array([dist.expectation()['x'] for dist in dists])
+  assert np.allclose(filt, means, atol=0.02), "Filtering mean mismatch"
+  assert np.isclose(log_evid, exact_evid, atol=0.05), "Log-evidence mismatch"
+
+#-------------------------------------------------------------------------------
+def test_smc_vset_order():
+  z = pb.RV('z', vtype=int, vset=[1, 0])
+  z.set_tran(np.array([[1., 1.], [0., 0.]])) # always to sorted vset[0] i.e. 0
+  vals = {'z': np.array([1, 0]), "z'": np.array([0, 0])}
+  assert np.allclose(z.eval_tran(vals), 1.), "Unexpected RV transitional"
+  w = pb.RV('w', [-20., 20.])
+  wz = w | z
+  wz.set_prob(lambda w, z: np.exp(-0.5 * (w - z)**2) / np.sqrt(2. * np.pi))
+  dists, _ = pb.SMC(z, wz, size=1000, rng=4).filter(np.zeros(3))
+  for dist in dists[1:]:
+    assert np.all(dist.vals['z'] == 0), "Transition inconsistent with RV"
+
+#-------------------------------------------------------------------------------
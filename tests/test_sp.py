@@ -0,0 +1,88 @@
+# Module to test SPs
+
+#-------------------------------------------------------------------------------
+import pytest
+import numpy as np
+import scipy.stats
+from concurrent.futures import ThreadPoolExecutor
+import probayes as pb
+
+#-------------------------------------------------------------------------------
+REJECTION_TESTS = [(1000, None), (2000, 16.1)]
+IMPORTANCE_TESTS = [(20000, 1., 0.8)]
+CONCURRENT_TESTS = [([0.5, -0.5], [[1.5, -1.0], [-1.0, 2.]], 100, [1, 2, 1, 2])]
+
+#-------------------------------------------------------------------------------
+def norm_sp():
+  x = pb.RV('x', [-4., 4.], prob=scipy.stats.norm)
+  y = pb.RV('y', [-4., 4.])
+  process = pb.SP(x & y)
+  process.set_prob(lambda x, y: scipy.stats.norm.pdf(x, scale=0.5) * \
+                                np.array(np.abs(y) < 1., dtype=float))
+  process.set_prop(lambda x, y: scipy.stats.norm.pdf(x) / 8.)
+  return process
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("n, envelope", REJECTION_TESTS)
+def test_rejection_sample(n, envelope):
+  process = norm_sp()
+  dist = process.rejection_sample(n, envelope=envelope, batch=n//10)
+  assert dist.prob.shape == (n,), "Mismatch in number of samples"
+  assert np.all(dist.prob > 0.), "Samples accepted outside target support"
+  assert np.all(np.abs(dist.vals['y']) < 1.), \
+      "Samples accepted outside target support"
+  if envelope is not None:
+    assert np.isclose(np.std(dist.vals['x']), 0.5, rtol=0.1), \
+        "Accepted samples inconsistent with target distribution"
+
+#-------------------------------------------------------------------------------
+def test_rejection_envelope_update():
+  x = pb.RV('x', [-4., 4.], prob=scipy.stats.norm)
+  process = pb.SP(pb.RF(x))
+  process.set_prob(lambda x: scipy.stats.norm.pdf(x, scale=2.))
+  process.set_prop(lambda x: scipy.stats.norm.pdf(x) / 8.)
+  with pytest.warns(UserWarning, match="envelope"):
+    process.rejection_sample(1000, batch=2)
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("n, loc, scale", IMPORTANCE_TESTS)
+def test_importance_sample(n, loc, scale):
+  x = pb.RV('x', [-6., 6.], prob=scipy.stats.norm)
+  process = pb.SP(pb.RF(x))
+  process.set_prob(scipy.stats.norm.pdf, loc=loc, scale=scale)
+  process.set_prop(scipy.stats.norm.pdf)
+  dist, ess = process.importance_sample(n)
+  assert 0. < ess <= n, "Effective sample size {} out of range".format(ess)
+  assert np.isclose(np.sum(np.exp(dist.prob)), 1.), \
+      "Log-weights not normalised"
+  mean = dist.expectation()['x']
+  assert np.isclose(mean, loc, atol=0.05), \
+      "Weighted mean {} inconsistent with {}".format(mean, loc)
+  median = dist.quantile(0.5)['x']
+  assert np.isclose(median, loc, atol=0.05), \
+      "Weighted median {} inconsistent with {}".format(median, loc)
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize("means, covar, stop, seeds", CONCURRENT_TESTS)
+def test_concurrent_samplers(means, covar, stop, seeds):
+  x = pb.RV('x', vtype=float, vset=[-10., 10.])
+  y = pb.RV('y', vtype=float, vset=[-10., 10.])
+  process = pb.SP(x & y)
+  process.set_prob(scipy.stats.multivariate_normal, means, covar)
+  process.set_tran(scipy.stats.multivariate_normal, means, covar, tsteps=1)
+  process.set_scores('gibbs')
+  def _walk(seed):
+    sampler = process.sampler({'x': 0., 'y': 1.}, stop=stop, rng=seed)
+    return np.array([[sample.p.vals['x'], sample.p.vals['y']] \
+                     for sample in sampler])
+  serial = [_walk(seed) for seed in seeds]
+  with ThreadPoolExecutor(len(seeds)) as executor:
+    threaded = list(executor.map(_walk, seeds))
+  for i in range(len(seeds)):
+    assert np.allclose(serial[i], threaded[i]), \
+        "Concurrent sampler outputs differ from serial outputs"
+  steps = np.diff(serial[0], axis=0) != 0.
+  assert np.all(np.sum(steps, axis=1) == 1), \
+      "Gibbs sampling not one variable at a time"
+
+#-------------------------------------------------------------------------------